@@ -0,0 +1,57 @@
+"""Application factory
+
+    flask --app "app:create_app('development')" run
+    flask --app app:create_app invoice sweep-overdue      # FLASK_CONFIG picks the config
+
+Startup does only what every process needs: load .env, build the config,
+bind the models, register the configured blueprints (routes.init_routes
+imports their modules then) and warm up the database. Heavier modules
+(statement rendering, the process pool, the profiler) are imported when
+first used. python -m benchmarks.cold_start measures import-to-first-response.
+"""
+import logging
+import os
+from dotenv import load_dotenv
+from flask import Flask
+
+logger = logging.getLogger(__name__)
+
+def create_app(config_name=None):
+    """Build the app for config_name (default: FLASK_CONFIG, else 'development')"""
+    # Before config is imported: its settings are read from the environment
+    load_dotenv()
+    from config import config
+    from models import db
+    from routes import init_routes
+    
+    app = Flask(__name__)
+    app.config.from_object(config[config_name or os.getenv('FLASK_CONFIG', 'development')])
+    db.init_app(app)
+    init_routes(app)
+    init_database(app)
+    return app
+
+def init_database(app):
+    """Configure mappers and, with DB_WARMUP, open one pooled connection per engine
+
+    Both would otherwise happen inside the first request. A database that is
+    not reachable yet is logged, not fatal: the pool connects on demand.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.orm import configure_mappers
+    from models import db
+    
+    configure_mappers()
+    if not app.config.get('DB_WARMUP'):
+        return
+    
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+            except Exception as e:
+                logger.warning('Database warm-up failed for %s: %s', bind or 'default', e)
+
+if __name__ == '__main__':
+    create_app().run()
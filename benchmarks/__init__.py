@@ -0,0 +1,18 @@
+"""Benchmarks that run against a throwaway SQLite database (python -m benchmarks.<name>)"""
+from flask import Flask
+from config import TestingConfig
+from models import db
+
+def make_app(database_uri='sqlite:///:memory:', **settings):
+    """Minimal app with the models bound to database_uri"""
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    app.config.update(SQLALCHEMY_DATABASE_URI=database_uri, **settings)
+    db.init_app(app)
+    return app
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,82 @@
+"""Cold start: import of the app factory to the first response, in fresh processes
+
+    python -m benchmarks.cold_start                     # median of 5 runs, all blueprints
+    python -m benchmarks.cold_start --blueprints api_v1 --path /api/v1/invoices --budget-ms 800
+
+Each run is a new interpreter that imports app, calls create_app('testing')
+and serves GET --path (default /metrics) through the test client, the same path a new
+serverless instance takes before its first answer. Exits with status 1 when
+the median exceeds --budget-ms, or when a module that should be imported
+lazily (DEFERRED_MODULES) was loaded by then.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from . import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed by statement runs, the profiler or PDF rendering; never at startup
+DEFERRED_MODULES = ('multiprocessing', 'concurrent.futures.process', 'cProfile', 'pstats', 'weasyprint')
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app('testing')
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[2])
+answered = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'import_ms': (imported - started) * 1000,
+    'create_ms': (created - imported) * 1000,
+    'first_response_ms': (answered - created) * 1000,
+    'total_ms': (answered - started) * 1000,
+    'loaded': [name for name in json.loads(sys.argv[1]) if name in sys.modules]
+}))
+'''
+
+def run_once(path, blueprints=None):
+    """Timings (ms) of one fresh process, plus deferred modules it loaded"""
+    env = dict(os.environ, BLUEPRINTS=','.join(blueprints or ()), DB_WARMUP='1')
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, json.dumps(DEFERRED_MODULES), path],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--blueprints', nargs='+', help='Register only these (default: all)')
+    parser.add_argument('--path', default='/metrics', help='First request; any answer below HTTP 500 counts')
+    parser.add_argument('--budget-ms', type=float, default=1500, help='Allowed median import-to-first-response time')
+    args = parser.parse_args()
+    
+    results = [run_once(args.path, args.blueprints) for _ in range(args.runs)]
+    print(f'{"fase":<20} {"p50 ms":>9} {"max ms":>9}')
+    for phase in ('import_ms', 'create_ms', 'first_response_ms', 'total_ms'):
+        samples = [result[phase] for result in results]
+        print(f'{phase:<20} {percentile(samples, 50):>9.1f} {max(samples):>9.1f}')
+    
+    problems = []
+    total = percentile([result['total_ms'] for result in results], 50)
+    if total > args.budget_ms:
+        problems.append(f'cold start {total:.0f} ms melebihi anggaran {args.budget_ms:.0f} ms')
+    statuses = sorted({result['status'] for result in results})
+    if max(statuses) >= 500:
+        problems.append(f'respons pertama HTTP {statuses}')
+    loaded = sorted({name for result in results for name in result['loaded']})
+    if loaded:
+        problems.append(f'modul yang seharusnya dimuat belakangan sudah dimuat: {", ".join(loaded)}')
+    
+    for problem in problems:
+        print(f'REGRESI {problem}')
+    sys.exit(1 if problems else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Concurrent payments, invoice edits and deletes on the same rows, then consistency checks
+
+    python -m benchmarks.concurrency --threads 8 --requests 200 --hot 20
+
+Every thread logs in with its own test client and keeps hitting a small set
+of "hot" invoices: recording payments (POST /payments/), changing the amount
+(POST /invoices/edit/<id>) or deleting the invoice (POST /invoices/delete/<id>).
+The database is a file-backed SQLite, so the threads really share it. A
+write that lost the race must end as a conflict (HTTP 409, or the
+"Data telah diubah" flash) and never as a silent overwrite. Afterwards:
+
+- stored invoice totals match their payments (check_invoice_totals)
+- invoices agree with the ledger (check_invoice_ledger)
+- no payment points at a deleted invoice
+- no invoice amount was changed after its first payment
+
+Exits with status 1 when an invariant is broken or a request failed.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import func, select
+from models import db, Invoice, LedgerEntry, Payment, check_invoice_totals
+from routes import CONFLICT_MESSAGE
+from services.ledger import check_invoice_ledger
+from . import make_app
+from .datagen import BENCH_EMAIL, BENCH_PASSWORD, generate
+from .suite import build_app
+
+# action -> weight; payments dominate, as in production
+ACTIONS = (('pay', 6), ('edit', 3), ('delete', 1))
+ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}  # wait for SQLite's write lock instead of failing
+
+def _flash_outcome(client):
+    """Outcome of a form route from the flash it left: ok, conflict, rejected or error"""
+    with client.session_transaction() as session:
+        flashes = session.pop('_flashes', [])
+    if not flashes:
+        return 'error'
+    category, message = flashes[-1]
+    if category == 'success':
+        return 'ok'
+    if message == CONFLICT_MESSAGE:
+        return 'conflict'
+    return 'rejected' if category == 'warning' else 'error'
+
+def _pay(client, invoice_id, rng):
+    response = client.post('/payments/', json={
+        'invoice_id': invoice_id,
+        'amount': rng.randint(1, 50) * 1000,
+        'method': 'transfer'
+    })
+    return {201: 'ok', 409: 'conflict', 404: 'gone'}.get(response.status_code, 'error')
+
+def _edit(client, invoice_id, rng):
+    response = client.post(f'/invoices/edit/{invoice_id}', data={
+        'amount': rng.randint(100, 900) * 1000,
+        'due_date': '2030-01-31',
+        'description': 'Diubah bersamaan'
+    })
+    return 'gone' if response.status_code == 404 else _flash_outcome(client)
+
+def _delete(client, invoice_id, rng):
+    response = client.post(f'/invoices/delete/{invoice_id}')
+    return 'gone' if response.status_code == 404 else _flash_outcome(client)
+
+HANDLERS = {'pay': _pay, 'edit': _edit, 'delete': _delete}
+
+def run_threads(app, invoice_ids, threads, requests, seed):
+    """Run the mixed workload; returns Counter of (action, outcome) and wall time"""
+    outcomes = Counter()
+    lock = threading.Lock()
+    actions, weights = zip(*ACTIONS)
+    
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = app.test_client()
+        response = client.post('/auth/login', data={'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})
+        if response.status_code != 302:
+            raise RuntimeError(f'Login as {BENCH_EMAIL} failed ({response.status_code})')
+        
+        local = Counter()
+        for _ in range(requests):
+            action = rng.choices(actions, weights=weights)[0]
+            local[action, HANDLERS[action](client, rng.choice(invoice_ids), rng)] += 1
+        with lock:
+            outcomes.update(local)
+    
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return outcomes, time.perf_counter() - started
+
+def check_invariants():
+    """Messages for every broken invariant"""
+    problems = [f'invoice {row.invoice_number}: paid_total {row.paid_total}, payments {row.actual_paid}'
+                for row in check_invoice_totals()]
+    problems += [f'invoice {row.invoice_number}: {row.amount}/{row.paid_total}/{row.status}, ledger '
+                 f'{row.ledger_amount}/{row.ledger_paid}/{row.ledger_status}' for row in check_invoice_ledger()]
+    
+    orphans = db.session.execute(
+        select(func.count()).select_from(Payment).outerjoin(Invoice, Payment.invoice_id == Invoice.id)
+        .where(Invoice.id.is_(None))
+    ).scalar()
+    if orphans:
+        problems.append(f'{orphans} payments of deleted invoices')
+    
+    first_payment = (
+        select(LedgerEntry.invoice_id, func.min(LedgerEntry.id).label('entry_id'))
+        .where(LedgerEntry.source == 'payment', LedgerEntry.action == 'create')
+        .group_by(LedgerEntry.invoice_id)
+        .subquery()
+    )
+    edited = db.session.execute(
+        select(func.count(func.distinct(LedgerEntry.invoice_id)))
+        .join(first_payment, first_payment.c.invoice_id == LedgerEntry.invoice_id)
+        .where(LedgerEntry.source == 'invoice', LedgerEntry.action == 'update',
+               LedgerEntry.id > first_payment.c.entry_id)
+    ).scalar()
+    if edited:
+        problems.append(f'{edited} invoices changed after their first payment')
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per thread')
+    parser.add_argument('--invoices', type=int, default=500)
+    parser.add_argument('--hot', type=int, default=20, help='Invoices the threads compete for')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database = f'sqlite:///{os.path.join(tmp, "concurrency.db")}'
+        app = make_app(database)
+        with app.app_context():
+            db.create_all()
+            # No payments yet: every hot invoice starts editable and deletable
+            generate(max(1, args.invoices // 10), args.invoices, 0, seed=args.seed, anchor=datetime(2024, 6, 1, 12))
+            invoice_ids = random.Random(args.seed).sample(
+                db.session.execute(select(Invoice.id)).scalars().all(), min(args.hot, args.invoices)
+            )
+            db.engine.dispose()
+        
+        app = build_app(database, SQLALCHEMY_ENGINE_OPTIONS=ENGINE_OPTIONS)
+        outcomes, seconds = run_threads(app, invoice_ids, args.threads, args.requests, args.seed)
+        with app.app_context():
+            problems = check_invariants()
+            db.engine.dispose()
+    
+    total = sum(outcomes.values())
+    print(f'{total} permintaan dari {args.threads} thread dalam {seconds:.2f} detik '
+          f'({total / seconds:.0f}/detik) pada {len(invoice_ids)} invoice\n')
+    print(f'{"aksi":<8} {"hasil":<10} {"jumlah":>7}')
+    for (action, outcome), count in sorted(outcomes.items()):
+        print(f'{action:<8} {outcome:<10} {count:>7}')
+    
+    problems += [f'{count} {action} requests failed' for (action, outcome), count in outcomes.items()
+                 if outcome == 'error']
+    for problem in problems:
+        print(f'PELANGGARAN {problem}')
+    sys.exit(1 if problems else 0)
+
+if __name__ == '__main__':
+    main()
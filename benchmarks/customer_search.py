@@ -0,0 +1,82 @@
+"""Customer search latency per backend at growing table sizes
+
+    python -m benchmarks.customer_search --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from models import db, Customer, normalize_email, normalize_phone
+from services.customer_search import LikeSearchBackend, SQLiteFTSSearchBackend
+from . import make_app, percentile
+
+FIRST_NAMES = ['Budi', 'Siti', 'Agus', 'Dewi', 'Rudi', 'Putri', 'Eko', 'Rina', 'Joko', 'Wati']
+LAST_NAMES = ['Santoso', 'Wijaya', 'Saputra', 'Lestari', 'Hidayat', 'Kusuma', 'Pratama', 'Nugroho']
+
+def seed_customers(count, batch_size=10000, seed=42):
+    """Bulk insert count synthetic customers"""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    
+    for offset in range(0, count, batch_size):
+        rows = []
+        for i in range(offset, min(offset + batch_size, count)):
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}'
+            email = f'{name.lower().replace(" ", ".")}@example.com'
+            phone = f'08{rng.randint(10, 99)}-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}'
+            rows.append({
+                'name': name,
+                'email': email,
+                'phone': phone,
+                'email_normalized': normalize_email(email),
+                'phone_normalized': normalize_phone(phone),
+                'status': 'active',
+                'created_at': start + timedelta(minutes=i)
+            })
+        db.session.execute(insert(Customer), rows)
+    db.session.commit()
+
+def search_terms(count, seed=7):
+    """Mix of name, email and phone fragments plus misses"""
+    rng = random.Random(seed)
+    terms = []
+    for _ in range(10):
+        i = rng.randrange(count)
+        terms.extend([rng.choice(LAST_NAMES).lower(), f'{i}@example', f'0812-{rng.randint(1000, 9999)}', f'zz{i}'])
+    return terms
+
+def time_backend(backend, terms):
+    """p50/p95 latency in ms of the first listing page for each term"""
+    samples = []
+    for term in terms:
+        started = time.perf_counter()
+        backend.filter(Customer.query, term).order_by(Customer.created_at.desc()).limit(10).all()
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentile(samples, 50), percentile(samples, 95)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+    
+    backends = {'like': LikeSearchBackend(), 'fts5': SQLiteFTSSearchBackend()}
+    print(f'{"customers":>10} {"backend":>8} {"p50 ms":>9} {"p95 ms":>9}')
+    
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = make_app(f'sqlite:///{os.path.join(tmp, "search.db")}')
+            with app.app_context():
+                db.create_all()
+                seed_customers(size)
+                terms = search_terms(size)
+                for name, backend in backends.items():
+                    p50, p95 = time_backend(backend, terms)
+                    print(f'{size:>10} {name:>8} {p50:>9.2f} {p95:>9.2f}')
+                db.session.remove()
+                db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
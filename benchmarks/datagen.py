@@ -0,0 +1,198 @@
+"""Reproducible synthetic customers, invoices and payments
+
+    python -m benchmarks.datagen --database sqlite:///bench.db --customers 5000 --invoices 50000 --payments 40000
+
+The same --seed and --anchor always produce the same rows. Invoice totals,
+status and overdue flags are computed here, as every bulk insert must.
+"""
+import argparse
+import math
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import accumulate
+from sqlalchemy import func, insert, select
+from models import db, Customer, Invoice, Payment, SweepState, User, normalize_email, normalize_phone, overdue_cutoff
+from models.money import from_cents
+from services.ledger import backfill_ledger
+from . import make_app
+from .customer_search import FIRST_NAMES, LAST_NAMES
+
+BENCH_EMAIL = 'bench@example.com'
+BENCH_PASSWORD = 'bench-123'
+
+PAYMENT_METHODS = (('transfer', 60), ('qris', 25), ('cash', 15))
+PAYMENT_TERMS = ((14, 20), (30, 60), (60, 20))  # days until due, weight
+DESCRIPTIONS = ['Langganan internet', 'Biaya pemasangan', 'Sewa perangkat', 'Layanan bulanan', None]
+HISTORY_DAYS = 730
+SETTLED_SHARE = 0.8  # invoices with payments that are paid in full
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+def _split(rng, total, parts):
+    """Split total cents into parts positive amounts, rounded to whole rupiah except the last"""
+    if parts == 1:
+        return [total]
+    cuts = sorted(rng.sample(range(1, total // 100), parts - 1))
+    amounts = [(b - a) * 100 for a, b in zip([0] + cuts, cuts)]
+    return amounts + [total - sum(amounts)]
+
+def _next_id(model):
+    return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+def create_user(email=BENCH_EMAIL, password=BENCH_PASSWORD, role='admin'):
+    """Login for benchmarks; kept when it already exists"""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        user = User(name='Benchmark', email=email, role=role, is_active=True)
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+    return user
+
+def generate_customers(rng, count, anchor, batch_size):
+    """Insert count customers created over the history window; returns their ids"""
+    first_id = _next_id(Customer)
+    start = anchor - timedelta(days=HISTORY_DAYS)
+    for offset in range(0, count, batch_size):
+        rows = []
+        for index in range(offset, min(offset + batch_size, count)):
+            customer_id = first_id + index
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {customer_id}'
+            email = f'{name.lower().replace(" ", ".")}@example.com'
+            phone = f'08{rng.randint(11, 99)}-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}'
+            rows.append({
+                'id': customer_id,
+                'name': name,
+                'email': email,
+                'phone': phone,
+                'email_normalized': normalize_email(email),
+                'phone_normalized': normalize_phone(phone),
+                'address': f'Jl. {rng.choice(LAST_NAMES)} No. {rng.randint(1, 200)}',
+                'status': 'active' if rng.random() < 0.92 else 'inactive',
+                'created_at': start + timedelta(days=HISTORY_DAYS * index / count)
+            })
+        db.session.execute(insert(Customer), rows)
+    db.session.commit()
+    return list(range(first_id, first_id + count))
+
+def _payments_for(rng, invoice_id, amount, issued, count, anchor):
+    """count payment rows for one invoice, settling it in most cases; returns (rows, paid cents)"""
+    if not count:
+        return [], 0
+    paid = amount if rng.random() < SETTLED_SHARE else int(amount * rng.uniform(0.2, 0.9))
+    paid = max(paid, count * 100)
+    window = max(1, min((anchor - issued).days, 90))
+    dates = sorted(
+        min(anchor, issued + timedelta(days=rng.randrange(window), minutes=rng.randrange(1440))) for _ in range(count)
+    )
+    rows = [{
+        'invoice_id': invoice_id,
+        'payment_date': payment_date,
+        'amount': from_cents(cents),
+        'method': _weighted(rng, PAYMENT_METHODS),
+        'created_at': payment_date
+    } for payment_date, cents in zip(dates, _split(rng, paid, count))]
+    return rows, paid
+
+def generate_invoices(rng, customer_ids, count, payments, anchor, batch_size):
+    """Insert count invoices and payments spread over them; returns (invoices, payments) inserted
+
+    Invoices per customer follow a Pareto distribution (a few large accounts),
+    amounts are log-normal around Rp 350.000 and older invoices collect more
+    payments, so recent ones are the open and overdue ones.
+    """
+    cum_weights = list(accumulate(rng.paretovariate(1.5) for _ in customer_ids))
+    ages = [rng.randrange(HISTORY_DAYS) for _ in range(count)]
+    payment_counts = Counter(rng.choices(range(count), weights=[1 + age / 30 for age in ages], k=payments))
+    cutoff = overdue_cutoff(anchor.date())
+    first_id = _next_id(Invoice)
+    inserted_payments = 0
+    
+    for offset in range(0, count, batch_size):
+        invoice_rows, payment_rows = [], []
+        for index in range(offset, min(offset + batch_size, count)):
+            invoice_id = first_id + index
+            issued = anchor - timedelta(days=ages[index], minutes=rng.randrange(1440))
+            due_date = issued + timedelta(days=_weighted(rng, PAYMENT_TERMS))
+            amount = int(max(10000, round(rng.lognormvariate(math.log(350000), 0.7), -3))) * 100
+            
+            rows, paid = _payments_for(rng, invoice_id, amount, issued, payment_counts[index], anchor)
+            status = 'unpaid' if not paid else 'partial' if paid < amount else 'paid'
+            overdue = status != 'paid' and due_date < cutoff
+            invoice_rows.append({
+                'id': invoice_id,
+                'invoice_number': f'INV-{issued:%Y%m%d}-{invoice_id:08d}',
+                'customer_id': rng.choices(customer_ids, cum_weights=cum_weights)[0],
+                'date': issued,
+                'due_date': due_date,
+                'description': rng.choice(DESCRIPTIONS),
+                'amount': from_cents(amount),
+                'paid_total': from_cents(paid),
+                'remaining': from_cents(amount - paid),
+                'status': status,
+                'is_overdue': overdue,
+                'overdue_since': due_date if overdue else None,
+                'created_at': issued
+            })
+            payment_rows.extend(rows)
+        
+        db.session.execute(insert(Invoice), invoice_rows)
+        if payment_rows:
+            db.session.execute(insert(Payment), payment_rows)
+        inserted_payments += len(payment_rows)
+        db.session.commit()
+    
+    # The flags above are correct as of anchor; let the incremental sweep start there
+    db.session.merge(SweepState(name='overdue', last_cutoff=cutoff))
+    db.session.commit()
+    backfill_ledger()
+    return count, inserted_payments
+
+def generate(customers, invoices, payments, seed=42, anchor=None, batch_size=5000):
+    """Populate the bound database; returns counts and seconds taken"""
+    if invoices and not customers:
+        raise ValueError('Invoices need at least one customer.')
+    
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    anchor = anchor or datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    
+    create_user()
+    customer_ids = generate_customers(rng, customers, anchor, batch_size)
+    invoice_count, payment_count = generate_invoices(rng, customer_ids, invoices, payments, anchor, batch_size)
+    return {
+        'customers': len(customer_ids),
+        'invoices': invoice_count,
+        'payments': payment_count,
+        'seconds': round(time.perf_counter() - started, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='sqlite:///bench.db', help='SQLAlchemy URI, e.g. a file-backed SQLite DB')
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--invoices', type=int, default=50000)
+    parser.add_argument('--payments', type=int, default=40000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--anchor', type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        help='"Today" of the data set (YYYY-MM-DD); default today')
+    parser.add_argument('--reset', action='store_true', help='Drop and recreate all tables first')
+    args = parser.parse_args()
+    
+    app = make_app(args.database)
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        stats = generate(args.customers, args.invoices, args.payments, seed=args.seed, anchor=args.anchor)
+    print(
+        f'{stats["customers"]} pelanggan, {stats["invoices"]} invoice, {stats["payments"]} pembayaran '
+        f'dibuat dalam {stats["seconds"]} detik ({args.database})'
+    )
+
+if __name__ == '__main__':
+    main()
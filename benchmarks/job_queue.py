@@ -0,0 +1,99 @@
+"""Background jobs on SQLite end to end: an export job and a worker that outlives a locked database
+
+    python -m benchmarks.job_queue
+
+Runs a Worker in burst mode against a file-backed SQLite database, the
+backend a local setup uses without any queue server. The busy timeout is
+cut to JOB_LOCK_TIMEOUT seconds so lock conflicts fail fast instead of
+hiding behind the default five second wait. Exits with status 1 when a
+check fails.
+"""
+import csv
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from flask import current_app
+from models import db, Job
+from services.jobs import Worker, enqueue
+from .datagen import generate
+from .suite import build_app
+
+JOB_LOCK_TIMEOUT = 0.5
+EXPORT_INVOICES = 5000
+
+def _run_worker(app, outcome):
+    try:
+        outcome['processed'] = Worker(app, concurrency=2, poll_interval=0.2).run(burst=True)
+    except Exception as e:
+        outcome['error'] = repr(e)
+
+def check_export(app, tmp):
+    """A CSV export streams its rows while the job reports progress"""
+    with app.app_context():
+        job_id = enqueue('report.export', {'entity': 'invoices', 'fmt': 'csv', 'args': {}}).id
+    
+    outcome = {}
+    _run_worker(app, outcome)
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        status, done, total, result, error = job.status, job.progress_done, job.progress_total, job.result, job.error
+    
+    rows = 0
+    if result:
+        with open(os.path.join(tmp, result['file']), newline='') as f:
+            rows = sum(1 for _ in csv.reader(f)) - 1
+    return [
+        ('worker finishes the export', 'error' not in outcome and outcome.get('processed') == 1, outcome),
+        ('export job succeeds', status == 'succeeded', f'{status}: {(error or "").splitlines()[-1:]}'),
+        ('progress reaches the row count', done == total == EXPORT_INVOICES, f'{done}/{total}'),
+        ('file holds every row', rows == EXPORT_INVOICES, f'{rows} rows')
+    ]
+
+def check_locked_database(app, path):
+    """The worker retries its housekeeping while another process holds the database"""
+    with app.app_context():
+        job_id = enqueue('report.export', {'entity': 'customers', 'fmt': 'csv', 'args': {}}).id
+    
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute('BEGIN EXCLUSIVE')
+    outcome = {}
+    worker = threading.Thread(target=_run_worker, args=(app, outcome))
+    worker.start()
+    time.sleep(JOB_LOCK_TIMEOUT * 3)
+    blocker.execute('COMMIT')
+    blocker.close()
+    worker.join(60)
+    
+    with app.app_context():
+        status = db.session.get(Job, job_id).status
+    return [
+        ('worker survives a locked database', not worker.is_alive() and 'error' not in outcome, outcome),
+        ('job runs once the lock is released', status == 'succeeded', status)
+    ]
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'jobs.db')
+        app = build_app(
+            f'sqlite:///{path}',
+            JOB_FILES_DIR=tmp,
+            SQLALCHEMY_ENGINE_OPTIONS={'connect_args': {'timeout': JOB_LOCK_TIMEOUT}}
+        )
+        with app.app_context():
+            db.create_all()
+            generate(500, EXPORT_INVOICES, 1000, seed=1)
+        
+        results = check_export(app, tmp) + check_locked_database(app, path)
+        with app.app_context():
+            for engine in current_app.extensions['sqlalchemy'].engines.values():
+                engine.dispose()
+    
+    for name, passed, detail in results:
+        print(f'{"OK   " if passed else "GAGAL"} {name}{"" if passed else f" ({detail})"}')
+    sys.exit(0 if all(passed for _, passed, _ in results) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Login throughput per password hash method, and the cost of the session user loader
+
+    python -m benchmarks.login_throughput --methods scrypt pbkdf2:sha256:600000 --threads 4
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from models import db, User
+from . import make_app, percentile
+
+PASSWORD = 'rahasia-123'
+
+def seed_users(count, method):
+    """count staff users sharing one password hash made with method"""
+    password_hash = generate_password_hash(PASSWORD, method=method)
+    db.session.execute(insert(User), [{
+        'name': f'Staff {i}',
+        'email': f'staff{i}@example.com',
+        'password_hash': password_hash,
+        'role': 'staff',
+        'is_active': True
+    } for i in range(count)])
+    db.session.commit()
+
+def run_threads(app, threads, work):
+    """Run work(client, index) on one test client per thread; return latencies (s) and wall time"""
+    samples = []
+    lock = threading.Lock()
+    
+    def worker(index):
+        client = app.test_client()
+        local = work(client, index)
+        with lock:
+            samples.extend(local)
+    
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+def time_logins(app, users, threads):
+    """Each thread logs in its share of users once"""
+    def work(client, index):
+        local = []
+        for i in range(index, users, threads):
+            started = time.perf_counter()
+            response = client.post('/auth/login', data={'email': f'staff{i}@example.com', 'password': PASSWORD})
+            local.append(time.perf_counter() - started)
+            assert response.status_code == 302, response.status_code
+            client.get('/auth/logout')
+        return local
+    
+    return run_threads(app, threads, work)
+
+def time_authenticated_requests(app, requests, threads):
+    """Logged-in JSON requests; returns latencies, wall time and SQL statements per request"""
+    query_counts = []
+    
+    def work(client, index):
+        client.post('/auth/login', data={'email': f'staff{index}@example.com', 'password': PASSWORD})
+        local = []
+        for _ in range(requests // threads):
+            started = time.perf_counter()
+            response = client.get('/payments/?per_page=1')
+            assert response.status_code == 200, response.status_code
+            local.append(time.perf_counter() - started)
+            query_counts.append(int(response.headers['X-Query-Count']))
+        return local
+    
+    samples, elapsed = run_threads(app, threads, work)
+    return samples, elapsed, sum(query_counts) / max(len(query_counts), 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--methods', nargs='+', default=['scrypt', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000'])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+    
+    import routes
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'{"method":>24} {"logins/s":>9} {"p50 ms":>9} {"p95 ms":>9}')
+        for method in args.methods:
+            app = make_app(f'sqlite:///{os.path.join(tmp, "login.db")}', PASSWORD_HASH_METHOD=method)
+            routes.init_routes(app)
+            with app.app_context():
+                db.drop_all()
+                db.create_all()
+                seed_users(args.users, method)
+            
+            samples, elapsed = time_logins(app, args.users, args.threads)
+            print(
+                f'{method:>24} {len(samples) / elapsed:>9.1f} '
+                f'{percentile(samples, 50) * 1000:>9.2f} {percentile(samples, 95) * 1000:>9.2f}'
+            )
+        
+        print(f'\n{"user cache ttl":>24} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"queries":>9}')
+        for ttl in (0, 60):
+            app.config['USER_CACHE_TTL'] = ttl
+            samples, elapsed, queries = time_authenticated_requests(app, args.requests, args.threads)
+            print(
+                f'{ttl:>24} {len(samples) / elapsed:>9.1f} {percentile(samples, 50) * 1000:>9.2f} '
+                f'{percentile(samples, 95) * 1000:>9.2f} {queries:>9.1f}'
+            )
+
+if __name__ == '__main__':
+    main()
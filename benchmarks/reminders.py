@@ -0,0 +1,54 @@
+"""Reminder run over a large data set: throughput and peak Python memory
+
+    python -m benchmarks.reminders --invoices 100000 --batch-size 500
+
+Generates customers and invoices with benchmarks.datagen (few payments, so
+many invoices are open), then sends every due reminder through the outbox
+sender into a temp directory. Peak memory is measured with tracemalloc: it
+should stay flat as --invoices grows, since candidates are streamed.
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime
+from models import db
+from services.reminders import OutboxSender, send_reminders
+from . import make_app
+from .datagen import generate
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--invoices', type=int, default=100000)
+    parser.add_argument('--payments', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    anchor = datetime(2024, 6, 1, 12)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(f'sqlite:///{os.path.join(tmp, "reminders.db")}',
+                       REMINDER_OUTBOX_DIR=os.path.join(tmp, 'outbox'))
+        with app.app_context():
+            db.create_all()
+            stats = generate(args.customers, args.invoices, args.payments, seed=args.seed, anchor=anchor)
+            print(f'Data: {stats["customers"]} pelanggan, {stats["invoices"]} invoice, '
+                  f'{stats["payments"]} pembayaran ({stats["seconds"]} detik)')
+            
+            tracemalloc.start()
+            result = send_reminders(OutboxSender(app.config), today=anchor.date(), batch_size=args.batch_size)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            
+            rerun = send_reminders(OutboxSender(app.config), today=anchor.date(), batch_size=args.batch_size)
+            batches = len(os.listdir(app.config['REMINDER_OUTBOX_DIR']))
+            db.engine.dispose()
+    
+    print(f'{result["sent"]} pengingat ({result["kinds"]["overdue"]} jatuh tempo, '
+          f'{result["kinds"]["due_soon"]} segera jatuh tempo) dalam {result["seconds"]} detik '
+          f'({result["per_second"]}/detik), puncak memori {peak / 1024 / 1024:.1f} MiB')
+    print(f'Jalankan ulang: {rerun["sent"]} dikirim; {batches} batch di outbox')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Read replica routing: @read_replica reads go to the replica, everything else to the primary
+
+    python -m benchmarks.replica_routing
+
+Binds 'replica' to a second SQLite file and seeds the two files with
+different rows, then records which engine ran each statement. Read-only
+views (invoice listing, a JSON getter, the CSV export) must read the
+replica; writes, flushes inside a read-only view and the Flask-Login user
+loader must use the primary. Exits with status 1 when a check fails.
+"""
+import os
+import sys
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event, insert
+from models import db, Customer, Invoice, read_replica
+from .datagen import BENCH_EMAIL, BENCH_PASSWORD, create_user
+from .suite import build_app
+
+def _invoice_row(invoice_id, number, customer_id):
+    return {
+        'id': invoice_id,
+        'invoice_number': number,
+        'customer_id': customer_id,
+        'date': datetime(2024, 5, 1),
+        'due_date': datetime(2024, 5, 15),
+        'amount': 100000,
+        'paid_total': 0,
+        'remaining': 100000,
+        'status': 'unpaid',
+        'is_overdue': False
+    }
+
+def seed(app):
+    """Primary: the login user, customer 1 and invoice 1. Replica: customer 2 and invoice 2, no users"""
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines['replica'])
+        create_user()
+        with db.engines[None].begin() as connection:
+            connection.execute(insert(Customer), [{'id': 1, 'name': 'Pelanggan Primer', 'phone': '0811',
+                                                   'email': 'primer@example.com', 'status': 'active'}])
+            connection.execute(insert(Invoice), [_invoice_row(1, 'INV-PRIMER', 1)])
+        with db.engines['replica'].begin() as connection:
+            connection.execute(insert(Customer), [{'id': 2, 'name': 'Pelanggan Replika', 'phone': '0812',
+                                                   'email': 'replika@example.com', 'status': 'active'}])
+            connection.execute(insert(Invoice), [_invoice_row(2, 'INV-REPLIKA', 2)])
+
+def record_statements(app):
+    """{'primary'|'replica': [SQL, ...]} filled by every statement either engine runs"""
+    statements = defaultdict(list)
+    with app.app_context():
+        for bind, name in ((None, 'primary'), ('replica', 'replica')):
+            def record(conn, cursor, statement, parameters, context, executemany, name=name):
+                statements[name].append(' '.join(statement.split()))
+            event.listen(db.engines[bind], 'before_cursor_execute', record)
+    return statements
+
+def _touching(statements, table):
+    return [sql for sql in statements if f'FROM {table}' in sql or f'INTO {table}' in sql or f'UPDATE {table}' in sql]
+
+def run_checks(app, statements):
+    """List of (check, passed, detail)"""
+    results = []
+    
+    def check(name, passed, detail=''):
+        results.append((name, bool(passed), detail))
+    
+    client = app.test_client()
+    response = client.post('/auth/login', data={'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})
+    check('login reads users on the primary', response.status_code == 302, f'HTTP {response.status_code}')
+    
+    statements.clear()
+    response = client.get('/invoices/')
+    check('invoice listing reads invoices on the replica',
+          response.status_code == 200 and _touching(statements['replica'], 'invoices')
+          and not _touching(statements['primary'], 'invoices'),
+          f'HTTP {response.status_code}, primary {_touching(statements["primary"], "invoices")}')
+    check('user loader reads users on the primary',
+          _touching(statements['primary'], 'users') and not _touching(statements['replica'], 'users'),
+          f'replica {_touching(statements["replica"], "users")}')
+    
+    response = client.get('/customers/api/2')
+    check('JSON getter returns the replica-only customer',
+          response.status_code == 200 and response.get_json()['name'] == 'Pelanggan Replika',
+          f'HTTP {response.status_code}')
+    
+    response = client.get('/report/export/customers.csv')
+    body = response.get_data(as_text=True)
+    check('CSV export streams replica rows',
+          response.status_code == 200 and 'Pelanggan Replika' in body and 'Pelanggan Primer' not in body,
+          f'HTTP {response.status_code}')
+    
+    statements.clear()
+    response = client.post('/payments/', json={'invoice_id': 1, 'amount': 25000, 'method': 'cash'})
+    check('payment write goes to the primary',
+          response.status_code == 201 and _touching(statements['primary'], 'payments')
+          and not statements['replica'],
+          f'HTTP {response.status_code}, replica {statements["replica"]}')
+    
+    statements.clear()
+    with app.test_request_context():
+        @read_replica
+        def flush_in_read_only_view():
+            db.session.add(Customer(name='Flush', phone='0813', email='flush@example.com'))
+            db.session.flush()
+            db.session.rollback()
+        flush_in_read_only_view()
+        db.session.remove()
+    check('flush inside a read-only view goes to the primary',
+          _touching(statements['primary'], 'customers') and not _touching(statements['replica'], 'customers'),
+          f'replica {statements["replica"]}')
+    return results
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(
+            f'sqlite:///{os.path.join(tmp, "primary.db")}',
+            SQLALCHEMY_BINDS={'replica': f'sqlite:///{os.path.join(tmp, "replica.db")}'},
+            USER_CACHE_TTL=0  # the user loader queries on every request
+        )
+        seed(app)
+        statements = record_statements(app)
+        results = run_checks(app, statements)
+        with app.app_context():
+            for engine in current_app.extensions['sqlalchemy'].engines.values():
+                engine.dispose()
+    
+    for name, passed, detail in results:
+        print(f'{"OK   " if passed else "GAGAL"} {name}{"" if passed else f" ({detail})"}')
+    sys.exit(0 if all(passed for _, passed, _ in results) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Latency and SQL statements per page and JSON endpoint, compared with a stored baseline
+
+    python -m benchmarks.suite                      # compare with benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline      # record a new baseline after an intended change
+    python -m benchmarks.suite --queries-only       # ignore latency, e.g. on shared CI runners
+
+Requests go through the Flask test client with all blueprints registered,
+logged in as the benchmark admin, against a file-backed SQLite database
+filled by benchmarks.datagen. The dashboard cache is off so every request
+runs its queries. Templates that are not in the tree render as an empty
+page: the HTML views then measure routing, queries and view code only.
+Query budgets raise (SQL_QUERY_BUDGET_RAISE), and every view with a
+@query_budget must be covered by a scenario.
+Exits with status 1 when a scenario regresses against the baseline or its budget.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from jinja2 import ChoiceLoader, FileSystemLoader, FunctionLoader
+from sqlalchemy import select
+from models import db, Customer, Invoice
+from services.query_counter import QueryBudgetExceeded
+from . import make_app, percentile
+from .datagen import BENCH_EMAIL, BENCH_PASSWORD, generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# name -> url(sample), where sample holds random ids and search terms from the data set
+SCENARIOS = {
+    'dashboard': lambda s: '/dashboard/',
+    'customers.list': lambda s: '/customers/',
+    'customers.list_page_50': lambda s: '/customers/?page=50',
+    'customers.search': lambda s: f'/customers/?search={s.term}',
+    'customers.api_list': lambda s: f'/customers/api/list?search={s.term}',
+    'customers.lookup': lambda s: f'/customers/api/lookup?q={s.prefix}',
+    'customers.get': lambda s: f'/customers/api/{s.customer_id}',
+    'invoices.list': lambda s: '/invoices/',
+    'invoices.list_unpaid': lambda s: '/invoices/?status=unpaid',
+    'invoices.list_overdue': lambda s: '/invoices/?overdue=1',
+    'invoices.list_customer': lambda s: f'/invoices/?customer_id={s.customer_id}',
+    'invoices.view': lambda s: f'/invoices/{s.invoice_id}',
+    'invoices.api_list': lambda s: '/invoices/api/list?status=partial',
+    'invoices.by_customer': lambda s: f'/invoices/api/by-customer/{s.customer_id}',
+    'payments.list': lambda s: f'/payments/?invoice_id={s.invoice_id}',
+    'api.invoices': lambda s: '/api/v1/invoices?per_page=100&fields=id,invoice_number,amount,status',
+    'api.invoices_batch': lambda s: f'/api/v1/invoices?ids={s.invoice_ids}',
+    'api.customer': lambda s: f'/api/v1/customers/{s.customer_id}',
+    'report.aging': lambda s: '/report/api/aging',
+    'report.statement': lambda s: f'/report/statement/{s.billed_customer_id}?period=2024-05&format=html'
+}
+
+class Sample:
+    """Random ids and search terms for one request"""
+    
+    def __init__(self, rng, customer_ids, invoice_ids, names, billed_customer_ids):
+        name = rng.choice(names)
+        self.customer_id = rng.choice(customer_ids)
+        self.billed_customer_id = rng.choice(billed_customer_ids)
+        self.invoice_id = rng.choice(invoice_ids)
+        self.invoice_ids = ','.join(str(i) for i in rng.sample(invoice_ids, min(50, len(invoice_ids))))
+        self.term = name.split()[1].lower()
+        self.prefix = name[:3]
+
+def build_app(database_uri, **settings):
+    """App with every blueprint, as served, minus caches that would hide the queries"""
+    import routes
+    
+    settings.setdefault('SQL_QUERY_BUDGET_RAISE', True)
+    app = make_app(database_uri, DASHBOARD_CACHE_TTL=0, **settings)
+    routes.init_routes(app)
+    app.jinja_loader = ChoiceLoader([
+        FileSystemLoader(os.path.join(ROOT, 'templates')),
+        FunctionLoader(lambda name: '')
+    ])
+    return app
+
+def run_scenarios(app, names, iterations, warmup=3, seed=7):
+    """p50/p95 latency (ms), median SQL statements, status codes and budget overruns per scenario"""
+    rng = random.Random(seed)
+    with app.app_context():
+        customer_ids = db.session.execute(select(Customer.id)).scalars().all()
+        invoice_ids = db.session.execute(select(Invoice.id)).scalars().all()
+        customer_names = db.session.execute(select(Customer.name).limit(1000)).scalars().all()
+        billed_customer_ids = db.session.execute(
+            select(Invoice.customer_id).where(Invoice.date.between(datetime(2024, 5, 1), datetime(2024, 5, 31))).distinct()
+        ).scalars().all()
+    
+    client = app.test_client()
+    response = client.post('/auth/login', data={'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'Login as {BENCH_EMAIL} failed ({response.status_code})')
+    
+    results = {}
+    for name in names:
+        url = SCENARIOS[name]
+        samples, queries, statuses, over_budget = [], [], set(), None
+        for i in range(warmup + iterations):
+            path = url(Sample(rng, customer_ids, invoice_ids, customer_names, billed_customer_ids))
+            started = time.perf_counter()
+            try:
+                response = client.get(path)
+            except QueryBudgetExceeded as e:
+                over_budget = str(e)
+                continue
+            elapsed = time.perf_counter() - started
+            if i < warmup:
+                continue
+            samples.append(elapsed * 1000)
+            queries.append(int(response.headers.get('X-Query-Count', 0)))
+            statuses.add(response.status_code)
+        results[name] = {
+            'endpoint': app.url_map.bind('localhost').match(path.split('?')[0])[0],
+            'p50_ms': round(percentile(samples, 50), 3) if samples else None,
+            'p95_ms': round(percentile(samples, 95), 3) if samples else None,
+            'queries': percentile(queries, 50) if queries else None,
+            'status': sorted(statuses)
+        }
+        if over_budget:
+            results[name]['over_budget'] = over_budget
+    return results
+
+def unbudgeted_scenarios(app, results):
+    """Endpoints with a @query_budget that no scenario requested"""
+    budgeted = {endpoint for endpoint, view in app.view_functions.items() if hasattr(view, 'query_budget')}
+    return sorted(budgeted - {result['endpoint'] for result in results.values()})
+
+def compare(results, baseline, tolerance, queries_only=False):
+    """Regression messages: more SQL statements, or p95 above baseline * (1 + tolerance)"""
+    problems = []
+    for name, result in results.items():
+        if result.get('over_budget'):
+            problems.append(f'{name}: {result["over_budget"]}')
+            continue
+        if max(result['status']) >= 400:
+            problems.append(f'{name}: HTTP {result["status"]}')
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            problems.append(f'{name}: {result["queries"]} SQL statements (baseline {expected["queries"]})')
+        if not queries_only and result['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+            problems.append(f'{name}: p95 {result["p95_ms"]:.2f} ms (baseline {expected["p95_ms"]:.2f} ms)')
+    return problems
+
+def print_results(results, baseline):
+    print(f'{"scenario":<26} {"p50 ms":>9} {"p95 ms":>9} {"base p95":>9} {"queries":>8} {"base":>5} {"status":>8}')
+    for name, result in results.items():
+        expected = baseline.get(name, {})
+        if result.get('over_budget'):
+            print(f'{name:<26} {result["over_budget"]}')
+            continue
+        print(
+            f'{name:<26} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+            f'{expected.get("p95_ms", float("nan")):>9.2f} {result["queries"]:>8} '
+            f'{expected.get("queries", "-"):>5} {",".join(map(str, result["status"])):>8}'
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='Existing data set (SQLAlchemy URI); default: generate one in a temp file')
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--payments', type=int, default=16000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed p95 increase over the baseline (0.5 = 50%%)')
+    parser.add_argument('--queries-only', action='store_true', help='Compare SQL statement counts only')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database = args.database
+        if database is None:
+            database = f'sqlite:///{os.path.join(tmp, "suite.db")}'
+            app = make_app(database)
+            with app.app_context():
+                db.create_all()
+                # A fixed anchor keeps the data set, and so the query plans, identical between runs
+                stats = generate(args.customers, args.invoices, args.payments, seed=args.seed,
+                                 anchor=datetime(2024, 6, 1, 12))
+                db.engine.dispose()
+            print(f'Data: {stats["customers"]} pelanggan, {stats["invoices"]} invoice, '
+                  f'{stats["payments"]} pembayaran ({stats["seconds"]} detik)\n')
+        
+        app = build_app(database, STATEMENT_CACHE_DIR=os.path.join(tmp, 'statements'))
+        results = run_scenarios(app, args.scenarios, args.iterations)
+        uncovered = unbudgeted_scenarios(app, results) if set(args.scenarios) == set(SCENARIOS) else []
+        with app.app_context():
+            db.engine.dispose()
+    
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['scenarios']
+    print_results(results, baseline)
+    
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'data': {'customers': args.customers, 'invoices': args.invoices,
+                         'payments': args.payments, 'seed': args.seed},
+                'scenarios': results
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'\nBaseline disimpan ke {args.baseline}')
+        return
+    
+    problems = compare(results, baseline, args.tolerance, args.queries_only)
+    problems += [f'{endpoint}: @query_budget view not covered by any scenario' for endpoint in uncovered]
+    for problem in problems:
+        print(f'REGRESI {problem}')
+    sys.exit(1 if problems else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,47 @@
 import os
-from dotenv import load_dotenv
+import tempfile
 
-load_dotenv()
+# Settings are read from the environment when this module is imported;
+# app.create_app loads .env first (see there).
 
 class Config:
     """Base configuration"""
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     WTF_CSRF_ENABLED = True
-    
+    DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 30))  # seconds, 0 disables
+    CUSTOMER_SEARCH_BACKEND = os.getenv('CUSTOMER_SEARCH_BACKEND', 'like')  # like, fulltext, fts5
+    PAYMENT_BULK_MAX_ROWS = int(os.getenv('PAYMENT_BULK_MAX_ROWS', 50000))
+    SQL_QUERY_BUDGET = None  # default per-request statement budget; routes set their own
+    SQL_QUERY_BUDGET_RAISE = False  # log by default, raise QueryBudgetExceeded when True
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # bearer token for /metrics scrapers; admins only when unset
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', '1') == '1'  # ?_profile=1 for admins
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))  # seconds, 0 disables
+    # werkzeug method string; existing hashes are upgraded on the next successful login
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    # Background jobs: flask job worker
+    JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', 4))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', 30))  # seconds, doubled per attempt
+    JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', 600))  # requeue running jobs without heartbeat
+    JOB_FILES_DIR = os.getenv('JOB_FILES_DIR', os.path.join(tempfile.gettempdir(), 'billing-jobs'))
+    API_GZIP_MIN_SIZE = int(os.getenv('API_GZIP_MIN_SIZE', 500))  # bytes; smaller /api/v1 bodies stay plain
+    # Rendered customer statements, keyed by customer, period and data version
+    STATEMENT_CACHE_DIR = os.getenv('STATEMENT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'billing-statements'))
+    STATEMENT_WORKERS = int(os.getenv('STATEMENT_WORKERS', 0))  # render processes, 0 = one per CPU
+    # Payment reminders: flask invoice send-reminders
+    REMINDER_DAYS_BEFORE_DUE = int(os.getenv('REMINDER_DAYS_BEFORE_DUE', 3))
+    REMINDER_INTERVAL_DAYS = int(os.getenv('REMINDER_INTERVAL_DAYS', 7))  # at most one reminder per invoice per interval
+    REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', 100))
+    REMINDER_RATE_LIMIT = float(os.getenv('REMINDER_RATE_LIMIT', 0))  # messages per second, 0 = unlimited
+    REMINDER_SENDER = os.getenv('REMINDER_SENDER', 'outbox')  # or 'package.module:Class', built with the config
+    REMINDER_OUTBOX_DIR = os.getenv('REMINDER_OUTBOX_DIR', os.path.join(tempfile.gettempdir(), 'billing-outbox'))
+    REMINDER_FROM = os.getenv('REMINDER_FROM', 'tagihan@example.com')
+    # Blueprints to register (comma separated names from routes.BLUEPRINT_MODULES), all when unset.
+    # A process serving only the API skips importing the other route modules; job workers need all.
+    BLUEPRINTS = [name.strip() for name in os.getenv('BLUEPRINTS', '').split(',') if name.strip()] or None
+    DB_WARMUP = os.getenv('DB_WARMUP', '1') == '1'  # open a pooled connection at startup, not on the first request
+
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
@@ -23,12 +56,29 @@ class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),  # seconds to wait for a connection
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 280)),  # below MySQL wait_timeout
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1',
+        'connect_args': {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 10)),
+            'read_timeout': int(os.getenv('DB_READ_TIMEOUT', 30)),
+            'write_timeout': int(os.getenv('DB_WRITE_TIMEOUT', 30))
+        }
+    }
+    # Optional read replica for @read_replica views (listings, dashboard, reports, lookups)
+    SQLALCHEMY_BINDS = {'replica': os.getenv('DATABASE_REPLICA_URL')} if os.getenv('DATABASE_REPLICA_URL') else {}
 
 class TestingConfig(Config):
     """Testing configuration"""
     DEBUG = True
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    CUSTOMER_SEARCH_BACKEND = 'fts5'
+    SQL_QUERY_BUDGET_RAISE = True
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'  # cheap hashes keep test logins fast
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,5 @@
+-- Stored payment totals on invoices (Invoice.paid_total / Invoice.remaining).
+-- Backfill after applying: flask invoice reconcile-totals
+ALTER TABLE invoices
+    ADD COLUMN paid_total FLOAT NOT NULL DEFAULT 0,
+    ADD COLUMN remaining FLOAT NOT NULL DEFAULT 0;
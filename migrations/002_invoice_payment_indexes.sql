@@ -0,0 +1,12 @@
+-- Indexes for the dashboard, invoice listings and overdue queries.
+-- Verify the plans afterwards with: flask invoice check-indexes
+CREATE INDEX ix_customers_created_at ON customers (created_at);
+
+CREATE INDEX ix_invoices_status_due_date ON invoices (status, due_date);
+CREATE INDEX ix_invoices_customer_id_status ON invoices (customer_id, status);
+CREATE INDEX ix_invoices_created_at ON invoices (created_at);
+CREATE INDEX ix_invoices_date ON invoices (date);
+
+CREATE INDEX ix_payments_invoice_id ON payments (invoice_id);
+CREATE INDEX ix_payments_payment_date ON payments (payment_date);
+CREATE INDEX ix_payments_created_at ON payments (created_at);
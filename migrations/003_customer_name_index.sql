@@ -0,0 +1,2 @@
+-- Prefix index for the customer typeahead (/customers/api/lookup).
+CREATE INDEX ix_customers_name ON customers (name);
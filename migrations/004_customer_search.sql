@@ -0,0 +1,14 @@
+-- Normalized contact columns and n-gram FULLTEXT index for customer search.
+-- Enable with CUSTOMER_SEARCH_BACKEND=fulltext (MySQL 8.0+).
+ALTER TABLE customers
+    ADD COLUMN phone_normalized VARCHAR(20) NULL,
+    ADD COLUMN email_normalized VARCHAR(120) NULL;
+
+UPDATE customers
+SET phone_normalized = REGEXP_REPLACE(phone, '[^0-9]', ''),
+    email_normalized = LOWER(TRIM(email));
+
+CREATE INDEX ix_customers_phone_normalized ON customers (phone_normalized);
+CREATE INDEX ix_customers_email_normalized ON customers (email_normalized);
+
+ALTER TABLE customers ADD FULLTEXT INDEX ft_customers_search (name, email, phone) WITH PARSER ngram;
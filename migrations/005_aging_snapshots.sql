@@ -0,0 +1,17 @@
+-- Nightly receivables aging snapshots: flask report snapshot-aging
+CREATE TABLE aging_snapshots (
+    id INTEGER NOT NULL AUTO_INCREMENT,
+    snapshot_date DATE NOT NULL,
+    customer_id INTEGER NULL,
+    current_amount FLOAT NOT NULL DEFAULT 0,
+    days_1_30 FLOAT NOT NULL DEFAULT 0,
+    days_31_60 FLOAT NOT NULL DEFAULT 0,
+    days_61_90 FLOAT NOT NULL DEFAULT 0,
+    days_over_90 FLOAT NOT NULL DEFAULT 0,
+    total FLOAT NOT NULL DEFAULT 0,
+    created_at DATETIME NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY (customer_id) REFERENCES customers (id) ON DELETE CASCADE
+);
+
+CREATE INDEX ix_aging_snapshots_date_customer ON aging_snapshots (snapshot_date, customer_id);
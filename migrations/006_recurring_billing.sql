@@ -0,0 +1,9 @@
+-- Recurring billing runs: flask invoice bill --period YYYY-MM --amount ...
+ALTER TABLE invoices ADD COLUMN billing_period VARCHAR(7) NULL;
+ALTER TABLE invoices ADD CONSTRAINT uq_invoices_customer_period UNIQUE (customer_id, billing_period);
+
+CREATE TABLE invoice_sequences (
+    name VARCHAR(50) NOT NULL,
+    next_value BIGINT NOT NULL DEFAULT 1,
+    PRIMARY KEY (name)
+);
@@ -0,0 +1,44 @@
+-- Money columns as exact integer cents (models.money.Money): FLOAT -> BIGINT.
+-- Amounts are rounded to the nearest cent. Recompute the stored totals from
+-- the converted payments afterwards: flask invoice reconcile-totals
+ALTER TABLE invoices
+    ADD COLUMN amount_cents BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN paid_total_cents BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN remaining_cents BIGINT NOT NULL DEFAULT 0;
+UPDATE invoices SET
+    amount_cents = ROUND(amount * 100),
+    paid_total_cents = ROUND(paid_total * 100),
+    remaining_cents = ROUND(remaining * 100);
+ALTER TABLE invoices DROP COLUMN amount, DROP COLUMN paid_total, DROP COLUMN remaining;
+ALTER TABLE invoices
+    CHANGE amount_cents amount BIGINT NOT NULL,
+    CHANGE paid_total_cents paid_total BIGINT NOT NULL DEFAULT 0,
+    CHANGE remaining_cents remaining BIGINT NOT NULL;
+
+ALTER TABLE payments ADD COLUMN amount_cents BIGINT NOT NULL DEFAULT 0;
+UPDATE payments SET amount_cents = ROUND(amount * 100);
+ALTER TABLE payments DROP COLUMN amount;
+ALTER TABLE payments CHANGE amount_cents amount BIGINT NOT NULL;
+
+-- Snapshots are scaled in DOUBLE first so the cents survive the integer cast
+ALTER TABLE aging_snapshots
+    MODIFY current_amount DOUBLE NOT NULL DEFAULT 0,
+    MODIFY days_1_30 DOUBLE NOT NULL DEFAULT 0,
+    MODIFY days_31_60 DOUBLE NOT NULL DEFAULT 0,
+    MODIFY days_61_90 DOUBLE NOT NULL DEFAULT 0,
+    MODIFY days_over_90 DOUBLE NOT NULL DEFAULT 0,
+    MODIFY total DOUBLE NOT NULL DEFAULT 0;
+UPDATE aging_snapshots SET
+    current_amount = ROUND(current_amount * 100),
+    days_1_30 = ROUND(days_1_30 * 100),
+    days_31_60 = ROUND(days_31_60 * 100),
+    days_61_90 = ROUND(days_61_90 * 100),
+    days_over_90 = ROUND(days_over_90 * 100),
+    total = ROUND(total * 100);
+ALTER TABLE aging_snapshots
+    MODIFY current_amount BIGINT NOT NULL DEFAULT 0,
+    MODIFY days_1_30 BIGINT NOT NULL DEFAULT 0,
+    MODIFY days_31_60 BIGINT NOT NULL DEFAULT 0,
+    MODIFY days_61_90 BIGINT NOT NULL DEFAULT 0,
+    MODIFY days_over_90 BIGINT NOT NULL DEFAULT 0,
+    MODIFY total BIGINT NOT NULL DEFAULT 0;
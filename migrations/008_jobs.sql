@@ -0,0 +1,25 @@
+-- DB-backed background job queue: flask job worker
+CREATE TABLE jobs (
+    id INTEGER NOT NULL AUTO_INCREMENT,
+    name VARCHAR(100) NOT NULL,
+    params JSON NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after DATETIME NOT NULL,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER NULL,
+    message VARCHAR(255) NULL,
+    result JSON NULL,
+    error TEXT NULL,
+    worker VARCHAR(100) NULL,
+    heartbeat_at DATETIME NULL,
+    created_by INTEGER NULL,
+    created_at DATETIME NULL,
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY (created_by) REFERENCES users (id) ON DELETE SET NULL
+);
+
+CREATE INDEX ix_jobs_status_run_after ON jobs (status, run_after);
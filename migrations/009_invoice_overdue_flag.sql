@@ -0,0 +1,13 @@
+-- Stored overdue state, maintained on write and by the daily sweep.
+-- Backfill after applying: flask invoice sweep-overdue --full
+ALTER TABLE invoices
+    ADD COLUMN is_overdue BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN overdue_since DATETIME NULL;
+CREATE INDEX ix_invoices_is_overdue_due_date ON invoices (is_overdue, due_date);
+
+CREATE TABLE sweep_states (
+    name VARCHAR(50) NOT NULL,
+    last_cutoff DATETIME NOT NULL,
+    updated_at DATETIME NULL,
+    PRIMARY KEY (name)
+);
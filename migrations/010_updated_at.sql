@@ -0,0 +1,7 @@
+-- Row change timestamps for /api/v1 ETags (bumped on every UPDATE by the app)
+ALTER TABLE customers ADD COLUMN updated_at DATETIME(6) NULL;
+ALTER TABLE invoices ADD COLUMN updated_at DATETIME(6) NULL;
+ALTER TABLE payments ADD COLUMN updated_at DATETIME(6) NULL;
+UPDATE customers SET updated_at = created_at;
+UPDATE invoices SET updated_at = created_at;
+UPDATE payments SET updated_at = created_at;
@@ -0,0 +1,4 @@
+-- Unique customer emails (bulk CSV import: flask customer import FILE).
+-- Resolve existing duplicates first; this lists them:
+--   SELECT email, COUNT(*) FROM customers GROUP BY email HAVING COUNT(*) > 1;
+CREATE UNIQUE INDEX uq_customers_email ON customers (email);
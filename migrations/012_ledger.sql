@@ -0,0 +1,32 @@
+-- Append-only ledger of invoice/payment debits and credits, plus balance checkpoints.
+-- Backfill after applying: flask invoice backfill-ledger
+-- Then nightly: flask report checkpoint-balances
+CREATE TABLE ledger_entries (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    customer_id INTEGER NOT NULL,
+    invoice_id INTEGER NOT NULL,
+    payment_id INTEGER NULL,
+    source VARCHAR(20) NOT NULL,
+    action VARCHAR(20) NOT NULL,
+    debit BIGINT NOT NULL DEFAULT 0,
+    credit BIGINT NOT NULL DEFAULT 0,
+    effective_at DATETIME NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_ledger_entries_customer_effective ON ledger_entries (customer_id, effective_at);
+CREATE INDEX ix_ledger_entries_customer_id ON ledger_entries (customer_id, id);
+CREATE INDEX ix_ledger_entries_effective_at ON ledger_entries (effective_at);
+CREATE INDEX ix_ledger_entries_invoice_id ON ledger_entries (invoice_id);
+CREATE INDEX ix_ledger_entries_payment_id ON ledger_entries (payment_id);
+
+CREATE TABLE balance_checkpoints (
+    id INTEGER NOT NULL AUTO_INCREMENT,
+    customer_id INTEGER NULL,
+    as_of DATETIME NOT NULL,
+    balance BIGINT NOT NULL DEFAULT 0,
+    last_entry_id BIGINT NOT NULL,
+    created_at DATETIME NULL,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_balance_checkpoints_customer_as_of ON balance_checkpoints (customer_id, as_of);
@@ -0,0 +1,5 @@
+-- Optimistic locking: every UPDATE of an invoice or customer bumps version_id
+-- and is conditional on the version it read, so a concurrent change makes the
+-- later write fail (HTTP 409 / "Data telah diubah") instead of overwriting it.
+ALTER TABLE invoices ADD COLUMN version_id INT NOT NULL DEFAULT 1;
+ALTER TABLE customers ADD COLUMN version_id INT NOT NULL DEFAULT 1;
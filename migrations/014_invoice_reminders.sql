@@ -0,0 +1,3 @@
+-- Payment reminders (flask invoice send-reminders): when each invoice was last
+-- reminded, so reruns and concurrent runs never send the same reminder twice.
+ALTER TABLE invoices ADD COLUMN last_reminded_at DATETIME(6) NULL;
@@ -0,0 +1,13 @@
+-- Keyset pagination (services.pagination) orders and builds its cursors on
+-- (created_at, id), so created_at must never be NULL. Legacy rows take the
+-- closest timestamp they have, then the columns become NOT NULL.
+UPDATE invoices SET created_at = COALESCE(date, updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL;
+UPDATE payments SET created_at = COALESCE(payment_date, updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL;
+UPDATE customers SET created_at = COALESCE(
+    updated_at,
+    (SELECT MIN(invoices.created_at) FROM invoices WHERE invoices.customer_id = customers.id),
+    CURRENT_TIMESTAMP
+) WHERE created_at IS NULL;
+ALTER TABLE invoices MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE payments MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE customers MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
@@ -1,9 +1,39 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from datetime import datetime
+from datetime import datetime, time
+from functools import lru_cache
+from sqlalchemy import DDL, and_, bindparam, case, event, func, insert, inspect, literal, or_, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm.util import identity_key
 from werkzeug.security import generate_password_hash, check_password_hash
+from .session import RoutingSession, read_replica
+from .money import Money, parse_money, to_money
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Bumped by ORM and Core UPDATEs alike; microseconds on MySQL so API ETags see every change
+UpdatedAt = db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql')
+
+DEFAULT_PASSWORD_HASH_METHOD = 'scrypt'
+
+def password_hash_method():
+    """Configured werkzeug hash method, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'"""
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD)
+    return DEFAULT_PASSWORD_HASH_METHOD
+
+@lru_cache(maxsize=None)
+def _hash_prefix(method):
+    # werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1'), so
+    # read the full prefix back from a throwaway hash, once per method
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+def overdue_cutoff(today=None):
+    """Invoices due before this moment (start of today, UTC) are overdue"""
+    return datetime.combine(today or datetime.utcnow().date(), time.min)
 
 class User(UserMixin, db.Model):
     """User model for authentication"""
@@ -18,82 +48,647 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=password_hash_method())
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
+    def password_needs_rehash(self):
+        """True when the stored hash was made with other parameters than configured"""
+        return self.password_hash.split('$', 1)[0] != _hash_prefix(password_hash_method())
+    
     def __repr__(self):
         return f'<User {self.email}>'
 
 class Customer(db.Model):
     """Customer model"""
     __tablename__ = 'customers'
+    __table_args__ = (
+        db.Index('uq_customers_email', 'email', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), nullable=False)
+    name = db.Column(db.String(120), nullable=False, index=True)
     phone = db.Column(db.String(20), nullable=False)
     email = db.Column(db.String(120), nullable=False)
+    # Normalized copies for exact/prefix search, maintained on insert/update
+    phone_normalized = db.Column(db.String(20), index=True)
+    email_normalized = db.Column(db.String(120), index=True)
     address = db.Column(db.Text)
     status = db.Column(db.String(20), default='active', nullable=False)  # active, inactive
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)  # keyset pagination key (migration 015)
+    updated_at = db.Column(UpdatedAt, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version_id = db.Column(db.Integer, default=1, nullable=False)
     
     # Relationships
     invoices = db.relationship('Invoice', backref='customer', lazy=True, cascade='all, delete-orphan')
     
+    # ORM UPDATE/DELETE match the loaded version_id; a concurrent change raises StaleDataError
+    __mapper_args__ = {'version_id_col': version_id}
+    
     def __repr__(self):
         return f'<Customer {self.name}>'
 
 class Invoice(db.Model):
     """Invoice model"""
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('ix_invoices_status_due_date', 'status', 'due_date'),
+        db.Index('ix_invoices_customer_id_status', 'customer_id', 'status'),
+        db.Index('ix_invoices_is_overdue_due_date', 'is_overdue', 'due_date'),
+        # One invoice per customer per billing period for recurring billing runs
+        db.UniqueConstraint('customer_id', 'billing_period', name='uq_invoices_customer_period'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(50), unique=True, nullable=False, index=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
-    date = db.Column(db.DateTime, default=datetime.utcnow)
+    # active_history keeps the old values around for the ledger's correction entries
+    customer_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False),
+        active_history=True
+    )
+    date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     due_date = db.Column(db.DateTime, nullable=False)
     description = db.Column(db.Text)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.column_property(db.Column(Money, nullable=False), active_history=True)
+    paid_total = db.Column(Money, default=0, nullable=False)  # maintained from payments
+    remaining = db.Column(Money, nullable=False)  # amount - paid_total
     status = db.Column(db.String(20), default='unpaid', nullable=False)  # unpaid, partial, paid
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    billing_period = db.Column(db.String(7))  # YYYY-MM for recurring billing, NULL otherwise
+    # Open and due before today; set on write and by the daily sweep (services.overdue)
+    is_overdue = db.Column(db.Boolean, default=False, nullable=False)
+    overdue_since = db.Column(db.DateTime)
+    # Last payment reminder (services.reminders); microseconds, as each run's batch claims match on it
+    last_reminded_at = db.Column(UpdatedAt)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)  # keyset pagination key (migration 015)
+    updated_at = db.Column(UpdatedAt, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped by ORM writes and by every Core UPDATE below (payment totals, status, overdue sweep)
+    version_id = db.Column(db.Integer, default=1, nullable=False)
     
     # Relationships
     payments = db.relationship('Payment', backref='invoice', lazy=True, cascade='all, delete-orphan')
     
+    # ORM UPDATE/DELETE match the loaded version_id; a concurrent change raises StaleDataError
+    __mapper_args__ = {'version_id_col': version_id}
+    
     @property
     def paid_amount(self):
-        """Calculate total paid amount"""
-        return sum([p.amount for p in self.payments])
+        """Total paid amount (stored, kept in sync with payments)"""
+        return self.paid_total or 0
     
     @property
     def remaining_amount(self):
-        """Calculate remaining amount"""
-        return self.amount - self.paid_amount
+        """Remaining amount (stored, kept in sync with payments)"""
+        if self.remaining is None:
+            return self.amount - self.paid_amount
+        return self.remaining
     
     def update_status(self):
         """Update invoice status based on payments"""
-        if self.paid_amount == 0:
+        paid_amount = self.paid_amount
+        if paid_amount == 0:
             self.status = 'unpaid'
-        elif self.paid_amount < self.amount:
+        elif paid_amount < self.amount:
             self.status = 'partial'
         else:
             self.status = 'paid'
+        self.update_overdue()
+    
+    def update_overdue(self, cutoff=None):
+        """Set is_overdue/overdue_since from status and due_date"""
+        overdue = self.status != 'paid' and self.due_date < (cutoff or overdue_cutoff())
+        self.is_overdue = overdue
+        self.overdue_since = self.due_date if overdue else None
     
     def __repr__(self):
         return f'<Invoice {self.invoice_number}>'
 
+PAYMENT_METHODS = ('cash', 'transfer', 'qris')
+
 class Payment(db.Model):
     """Payment model"""
     __tablename__ = 'payments'
     
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=False)
-    payment_date = db.Column(db.DateTime, default=datetime.utcnow)
-    amount = db.Column(db.Float, nullable=False)
+    # active_history keeps the old values around so updates can adjust the invoice totals
+    invoice_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=False, index=True),
+        active_history=True
+    )
+    payment_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    amount = db.column_property(db.Column(Money, nullable=False), active_history=True)
     method = db.Column(db.String(50), nullable=False)  # cash, transfer, qris
     note = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)  # keyset pagination key (migration 015)
+    updated_at = db.Column(UpdatedAt, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Payment {self.id}>'
+
+class SweepState(db.Model):
+    """Watermark of an incremental sweep (e.g. the cutoff the overdue sweep last reached)"""
+    __tablename__ = 'sweep_states'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    last_cutoff = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SweepState {self.name}={self.last_cutoff}>'
+
+class InvoiceSequence(db.Model):
+    """Named counter for sequential invoice numbers"""
+    __tablename__ = 'invoice_sequences'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)
+    
+    def __repr__(self):
+        return f'<InvoiceSequence {self.name}={self.next_value}>'
+
+class AgingSnapshot(db.Model):
+    """Receivables aging per customer as of a date (customer_id NULL holds the totals)"""
+    __tablename__ = 'aging_snapshots'
+    __table_args__ = (
+        db.Index('ix_aging_snapshots_date_customer', 'snapshot_date', 'customer_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_date = db.Column(db.Date, nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id', ondelete='CASCADE'))
+    current_amount = db.Column(Money, default=0, nullable=False)
+    days_1_30 = db.Column(Money, default=0, nullable=False)
+    days_31_60 = db.Column(Money, default=0, nullable=False)
+    days_61_90 = db.Column(Money, default=0, nullable=False)
+    days_over_90 = db.Column(Money, default=0, nullable=False)
+    total = db.Column(Money, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AgingSnapshot {self.snapshot_date} {self.customer_id}>'
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+class Job(db.Model):
+    """Background job in the DB-backed queue (see services.jobs)"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Claim order for workers: queued jobs that are due
+        db.Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)  # registered task name
+    params = db.Column(db.JSON)
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=3, nullable=False)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    progress_done = db.Column(db.Integer, default=0, nullable=False)
+    progress_total = db.Column(db.Integer)
+    message = db.Column(db.String(255))
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(100))
+    heartbeat_at = db.Column(db.DateTime)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    @property
+    def percent(self):
+        """Progress in percent, None while the total is unknown"""
+        if not self.progress_total:
+            return None
+        return round(100 * self.progress_done / self.progress_total, 1)
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.status}>'
+
+LEDGER_SOURCES = ('invoice', 'payment')
+
+class LedgerEntry(db.Model):
+    """Append-only debit/credit entry, written with every invoice and payment change
+
+    Debits raise what the customer owes (invoices), credits lower it (payments).
+    Corrections are new entries; rows are never updated or deleted.
+    """
+    __tablename__ = 'ledger_entries'
+    __table_args__ = (
+        db.Index('ix_ledger_entries_customer_effective', 'customer_id', 'effective_at'),
+        db.Index('ix_ledger_entries_customer_id', 'customer_id', 'id'),
+        db.Index('ix_ledger_entries_effective_at', 'effective_at'),
+    )
+    
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    # Plain ids rather than foreign keys: the trail outlives deleted invoices and payments
+    customer_id = db.Column(db.Integer, nullable=False)
+    invoice_id = db.Column(db.Integer, nullable=False, index=True)
+    payment_id = db.Column(db.Integer, index=True)
+    source = db.Column(db.String(20), nullable=False)  # invoice, payment
+    action = db.Column(db.String(20), nullable=False)  # create, update, delete
+    debit = db.Column(Money, default=0, nullable=False)
+    credit = db.Column(Money, default=0, nullable=False)
+    # Invoice date / payment date for creations, the time of the change for corrections
+    effective_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<LedgerEntry {self.id} {self.source}:{self.action} {self.debit}/{self.credit}>'
+
+class BalanceCheckpoint(db.Model):
+    """Customer balance over ledger entries effective before as_of with id <= last_entry_id
+
+    Written by services.ledger.checkpoint_balances only for customers with new
+    entries; customer_id NULL marks the run itself and holds the grand total.
+    """
+    __tablename__ = 'balance_checkpoints'
+    __table_args__ = (
+        db.Index('ix_balance_checkpoints_customer_as_of', 'customer_id', 'as_of'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer)
+    as_of = db.Column(db.DateTime, nullable=False)
+    balance = db.Column(Money, default=0, nullable=False)
+    last_entry_id = db.Column(db.BigInteger, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Payment {self.id}>\n
\ No newline at end of file
+        return f'<BalanceCheckpoint {self.customer_id} {self.as_of}={self.balance}>'
+
+# Customer search support
+
+def normalize_phone(phone):
+    """Digits of a phone number, e.g. '0812-345 678' -> '0812345678'"""
+    return ''.join(ch for ch in phone or '' if ch.isdigit())
+
+def normalize_email(email):
+    """Case-folded, trimmed email address"""
+    return (email or '').strip().lower()
+
+@event.listens_for(Customer, 'before_insert')
+@event.listens_for(Customer, 'before_update')
+def _normalize_customer_contacts(mapper, connection, target):
+    target.phone_normalized = normalize_phone(target.phone)
+    target.email_normalized = normalize_email(target.email)
+
+def _sqlite_has_fts5_trigram(ddl, target, bind, **kw):
+    return bind.dialect.name == 'sqlite' and bind.dialect.dbapi.sqlite_version_info >= (3, 34)
+
+# SQLite: FTS5 trigram index over name/email/phone, kept in sync by triggers
+for _statement in (
+    "CREATE VIRTUAL TABLE customers_fts USING fts5("
+    "name, email, phone, content='customers', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER customers_fts_ai AFTER INSERT ON customers BEGIN "
+    "INSERT INTO customers_fts(rowid, name, email, phone) VALUES (new.id, new.name, new.email, new.phone); END",
+    "CREATE TRIGGER customers_fts_ad AFTER DELETE ON customers BEGIN "
+    "INSERT INTO customers_fts(customers_fts, rowid, name, email, phone) "
+    "VALUES ('delete', old.id, old.name, old.email, old.phone); END",
+    "CREATE TRIGGER customers_fts_au AFTER UPDATE ON customers BEGIN "
+    "INSERT INTO customers_fts(customers_fts, rowid, name, email, phone) "
+    "VALUES ('delete', old.id, old.name, old.email, old.phone); "
+    "INSERT INTO customers_fts(rowid, name, email, phone) VALUES (new.id, new.name, new.email, new.phone); END",
+):
+    event.listen(Customer.__table__, 'after_create', DDL(_statement).execute_if(callable_=_sqlite_has_fts5_trigram))
+
+event.listen(
+    Customer.__table__,
+    'before_drop',
+    DDL('DROP TABLE IF EXISTS customers_fts').execute_if(dialect='sqlite')
+)
+
+# MySQL: n-gram FULLTEXT index, so phrase queries keep substring semantics
+event.listen(
+    Customer.__table__,
+    'after_create',
+    DDL(
+        'ALTER TABLE customers ADD FULLTEXT INDEX ft_customers_search (name, email, phone) WITH PARSER ngram'
+    ).execute_if(dialect='mysql')
+)
+
+# Stored invoice totals
+#
+# Invoice.paid_total and Invoice.remaining are adjusted with a relative UPDATE in
+# the same transaction as every Payment insert/update/delete, so concurrent
+# payments on one invoice never overwrite each other's totals.
+
+def _payment_delta_statement():
+    invoices = Invoice.__table__
+    return (
+        invoices.update()
+        .where(invoices.c.id == bindparam('invoice_id_'))
+        .values(
+            paid_total=invoices.c.paid_total + bindparam('delta'),
+            remaining=invoices.c.remaining - bindparam('delta'),
+            version_id=invoices.c.version_id + 1
+        )
+    )
+
+def apply_payment_deltas(connection, deltas):
+    """Add {invoice_id: delta} payment deltas to the stored invoice totals"""
+    params = [
+        {'invoice_id_': invoice_id, 'delta': delta}
+        for invoice_id, delta in deltas.items()
+        if invoice_id is not None and delta
+    ]
+    if params:
+        connection.execute(_payment_delta_statement(), params)
+
+def _apply_payment_delta(connection, invoice_id, delta):
+    """One invoice's delta; an invoice deleted concurrently makes this a stale write"""
+    if invoice_id is None or not delta:
+        return
+    result = connection.execute(_payment_delta_statement(), {'invoice_id_': invoice_id, 'delta': delta})
+    if result.rowcount == 0:
+        raise StaleDataError(f'Invoice {invoice_id} no longer exists.')
+
+def _invoice_deleted_with(target, invoice_id):
+    """Whether the payment's invoice is deleted in the same flush (cascade)"""
+    session = object_session(target)
+    invoice = session.identity_map.get(identity_key(Invoice, invoice_id)) if session is not None else None
+    return invoice is not None and invoice in session.deleted
+
+def refresh_invoice_statuses(connection, invoice_ids, chunk_size=500):
+    """Set status and the overdue flag from the stored totals, one UPDATE per chunk (see update_status)"""
+    invoices = Invoice.__table__
+    status = case(
+        (invoices.c.paid_total <= 0, 'unpaid'),
+        (invoices.c.paid_total < invoices.c.amount, 'partial'),
+        else_='paid'
+    )
+    overdue = and_(invoices.c.paid_total < invoices.c.amount, invoices.c.due_date < overdue_cutoff())
+    
+    invoice_ids = list(invoice_ids)
+    for start in range(0, len(invoice_ids), chunk_size):
+        chunk = invoice_ids[start:start + chunk_size]
+        connection.execute(
+            invoices.update()
+            .where(invoices.c.id.in_(chunk))
+            .values(
+                status=status,
+                is_overdue=case((overdue, True), else_=False),
+                overdue_since=case((overdue, invoices.c.due_date), else_=None),
+                version_id=invoices.c.version_id + 1
+            )
+        )
+
+def _touch_invoice(target, invoice_id):
+    """Remember an invoice whose stored totals changed during this flush"""
+    session = object_session(target)
+    if session is not None and invoice_id is not None:
+        session.info.setdefault('touched_invoice_ids', set()).add(invoice_id)
+
+@event.listens_for(Invoice, 'before_insert')
+def _invoice_before_insert(mapper, connection, target):
+    target.paid_total = 0
+    target.remaining = target.amount
+    if target.status is None:
+        target.status = 'unpaid'
+    target.update_overdue()
+
+@event.listens_for(Invoice, 'before_update')
+def _invoice_before_update(mapper, connection, target):
+    if inspect(target).attrs.amount.history.has_changes():
+        # Computed against the stored paid_total to avoid a stale in-memory value
+        target.remaining = target.amount - Invoice.paid_total
+    if inspect(target).attrs.due_date.history.has_changes():
+        target.update_overdue()
+
+@event.listens_for(Payment, 'after_insert')
+def _payment_after_insert(mapper, connection, target):
+    _apply_payment_delta(connection, target.invoice_id, target.amount)
+    _touch_invoice(target, target.invoice_id)
+    _post_entry(connection, 'payment', 'create', target.invoice_id, credit=target.amount,
+                payment_id=target.id, effective_at=target.payment_date)
+
+@event.listens_for(Payment, 'after_update')
+def _payment_after_update(mapper, connection, target):
+    attrs = inspect(target).attrs
+    amount_history = attrs.amount.history
+    invoice_history = attrs.invoice_id.history
+    if not amount_history.has_changes() and not invoice_history.has_changes():
+        return
+    
+    old_amount = amount_history.deleted[0] if amount_history.deleted else target.amount
+    old_invoice_id = invoice_history.deleted[0] if invoice_history.deleted else target.invoice_id
+    
+    _apply_payment_delta(connection, old_invoice_id, -old_amount)
+    _apply_payment_delta(connection, target.invoice_id, target.amount)
+    _touch_invoice(target, old_invoice_id)
+    _touch_invoice(target, target.invoice_id)
+    _post_change(connection, 'payment', target.invoice_id, None, old_amount, target.amount,
+                 payment_id=target.id, old_invoice_id=old_invoice_id)
+
+@event.listens_for(Payment, 'after_delete')
+def _payment_after_delete(mapper, connection, target):
+    # Payments are deleted before their invoice: bumping its version here
+    # would make the invoice's own versioned DELETE fail
+    if not _invoice_deleted_with(target, target.invoice_id):
+        _apply_payment_delta(connection, target.invoice_id, -target.amount)
+        _touch_invoice(target, target.invoice_id)
+    _post_entry(connection, 'payment', 'delete', target.invoice_id, debit=target.amount, payment_id=target.id)
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _expire_touched_invoices(session, flush_context):
+    """Reload stored totals (and the version they bumped) of invoices already in the session"""
+    invoice_ids = session.info.pop('touched_invoice_ids', None)
+    if not invoice_ids:
+        return
+    
+    for invoice_id in invoice_ids:
+        invoice = session.identity_map.get(identity_key(Invoice, invoice_id))
+        if invoice is not None:
+            session.expire(invoice, ['paid_total', 'remaining', 'version_id'])
+
+# Ledger
+#
+# Every invoice and payment change appends entries in the same transaction:
+# the ORM paths through the events below, the bulk paths (billing run, payment
+# ingest) through post_invoice_entries/post_payment_entries.
+
+def _ledger_columns():
+    return ['customer_id', 'invoice_id', 'payment_id', 'source', 'action', 'debit', 'credit',
+            'effective_at', 'created_at']
+
+def _post_entry(connection, source, action, invoice_id, debit=0, credit=0, payment_id=None,
+                effective_at=None, customer_id=None):
+    """Append one entry; the customer is read from the invoice when not given"""
+    now = datetime.utcnow()
+    values = {
+        'invoice_id': invoice_id,
+        'payment_id': payment_id,
+        'source': source,
+        'action': action,
+        'debit': debit,
+        'credit': credit,
+        'effective_at': effective_at or now,
+        'created_at': now
+    }
+    ledger = LedgerEntry.__table__
+    if customer_id is not None:
+        connection.execute(insert(ledger).values(customer_id=customer_id, **values))
+        return
+    
+    invoices = Invoice.__table__
+    connection.execute(insert(ledger).from_select(
+        _ledger_columns(),
+        select(invoices.c.customer_id, *[literal(values[name], ledger.c[name].type) for name in _ledger_columns()[1:]])
+        .where(invoices.c.id == invoice_id)
+    ))
+
+def _posted(*criteria):
+    """Creations minus deletions in the ledger for a row; 0 when it has no live creation entry
+
+    Counting rather than EXISTS, because SQLite reuses the ids of deleted rows.
+    """
+    ledger = LedgerEntry.__table__
+    return (
+        select(func.coalesce(func.sum(case((ledger.c.action == 'create', 1), (ledger.c.action == 'delete', -1), else_=0)), 0))
+        .where(*criteria)
+        .scalar_subquery()
+    )
+
+def post_invoice_entries(connection, *criteria):
+    """Creation entries for invoices matching criteria that have none yet (bulk inserts, backfill)"""
+    invoices = Invoice.__table__
+    ledger = LedgerEntry.__table__
+    now = datetime.utcnow()
+    posted = _posted(ledger.c.invoice_id == invoices.c.id, ledger.c.source == 'invoice')
+    return connection.execute(insert(ledger).from_select(
+        _ledger_columns(),
+        select(
+            invoices.c.customer_id,
+            invoices.c.id,
+            literal(None, ledger.c.payment_id.type),
+            literal('invoice'),
+            literal('create'),
+            invoices.c.amount,
+            literal(0, ledger.c.credit.type),
+            func.coalesce(invoices.c.date, now),
+            literal(now, ledger.c.created_at.type)
+        ).where(*criteria, posted == 0)
+    )).rowcount
+
+def post_payment_entries(connection, *criteria):
+    """Creation entries for payments matching criteria that have none yet (bulk inserts, backfill)"""
+    invoices = Invoice.__table__
+    payments = Payment.__table__
+    ledger = LedgerEntry.__table__
+    now = datetime.utcnow()
+    posted = _posted(ledger.c.payment_id == payments.c.id, ledger.c.source == 'payment')
+    return connection.execute(insert(ledger).from_select(
+        _ledger_columns(),
+        select(
+            invoices.c.customer_id,
+            payments.c.invoice_id,
+            payments.c.id,
+            literal('payment'),
+            literal('create'),
+            literal(0, ledger.c.debit.type),
+            payments.c.amount,
+            func.coalesce(payments.c.payment_date, now),
+            literal(now, ledger.c.created_at.type)
+        ).select_from(payments.join(invoices, payments.c.invoice_id == invoices.c.id)).where(*criteria, posted == 0)
+    )).rowcount
+
+def _post_change(connection, source, invoice_id, customer_id, old_amount, new_amount, payment_id=None,
+                 old_invoice_id=None, old_customer_id=None):
+    """Entries for an amount and/or owner change: one net entry, or reversal plus repost"""
+    # An invoice debits, a payment credits; debit/credit swap for the reversal
+    side, reverse = ('debit', 'credit') if source == 'invoice' else ('credit', 'debit')
+    old_invoice_id = old_invoice_id or invoice_id
+    old_customer_id = old_customer_id or customer_id
+    
+    if old_invoice_id == invoice_id and old_customer_id == customer_id:
+        delta = new_amount - old_amount
+        if delta:
+            _post_entry(connection, source, 'update', invoice_id, payment_id=payment_id, customer_id=customer_id,
+                        **{side if delta > 0 else reverse: abs(delta)})
+        return
+    
+    _post_entry(connection, source, 'update', old_invoice_id, payment_id=payment_id,
+                customer_id=old_customer_id if source == 'invoice' else None, **{reverse: old_amount})
+    _post_entry(connection, source, 'update', invoice_id, payment_id=payment_id,
+                customer_id=customer_id if source == 'invoice' else None, **{side: new_amount})
+
+def _old_value(history, current):
+    return history.deleted[0] if history.deleted else current
+
+@event.listens_for(Invoice, 'after_insert')
+def _invoice_ledger_insert(mapper, connection, target):
+    _post_entry(connection, 'invoice', 'create', target.id, debit=target.amount,
+                effective_at=target.date, customer_id=target.customer_id)
+
+@event.listens_for(Invoice, 'after_update')
+def _invoice_ledger_update(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if not attrs.amount.history.has_changes() and not attrs.customer_id.history.has_changes():
+        return
+    _post_change(
+        connection, 'invoice', target.id, target.customer_id,
+        _old_value(attrs.amount.history, target.amount), target.amount,
+        old_customer_id=_old_value(attrs.customer_id.history, target.customer_id)
+    )
+
+@event.listens_for(Invoice, 'after_delete')
+def _invoice_ledger_delete(mapper, connection, target):
+    _post_entry(connection, 'invoice', 'delete', target.id, credit=target.amount, customer_id=target.customer_id)
+
+def reconcile_invoice_totals(chunk_size=500):
+    """Recompute stored paid_total/remaining from payments for invoices out of sync
+
+    Status and overdue flag of the corrected invoices are refreshed and the
+    Invoice caches invalidated in the same transaction. Returns the number
+    of invoices corrected.
+    """
+    from services.cache import mark_written
+    
+    invoices = Invoice.__table__
+    payments = Payment.__table__
+    
+    paid = (
+        select(func.coalesce(func.sum(payments.c.amount), 0))
+        .where(payments.c.invoice_id == invoices.c.id)
+        .scalar_subquery()
+    )
+    
+    invoice_ids = [row.id for row in check_invoice_totals()]
+    if not invoice_ids:
+        return 0
+    
+    connection = db.session.connection()
+    for start in range(0, len(invoice_ids), chunk_size):
+        connection.execute(
+            invoices.update()
+            .where(invoices.c.id.in_(invoice_ids[start:start + chunk_size]))
+            .values(
+                paid_total=paid,
+                remaining=invoices.c.amount - paid,
+                version_id=invoices.c.version_id + 1
+            )
+        )
+    refresh_invoice_statuses(connection, invoice_ids, chunk_size)
+    mark_written(db.session, Invoice)
+    db.session.commit()
+    return len(invoice_ids)
+
+def check_invoice_totals():
+    """Return (id, invoice_number, paid_total, actual_paid) for invoices out of sync with payments"""
+    actual = (
+        select(Payment.invoice_id, func.sum(Payment.amount).label('paid'))
+        .group_by(Payment.invoice_id)
+        .subquery()
+    )
+    actual_paid = func.coalesce(actual.c.paid, 0)
+    
+    return db.session.execute(
+        select(Invoice.id, Invoice.invoice_number, Invoice.paid_total, actual_paid.label('actual_paid'))
+        .outerjoin(actual, actual.c.invoice_id == Invoice.id)
+        .where(or_(
+            Invoice.paid_total != actual_paid,
+            Invoice.remaining != Invoice.amount - actual_paid
+        ))
+        .order_by(Invoice.id)
+    ).all()
\ No newline at end of file
@@ -0,0 +1,51 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+CENT = Decimal('0.01')
+
+def to_money(value):
+    """Round a number or numeric string to a Decimal with two places"""
+    if isinstance(value, float):
+        # Go through the shortest repr so 0.1 becomes Decimal('0.1'), not its binary expansion
+        value = repr(value)
+    try:
+        money = Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, TypeError) as e:
+        raise ValueError(f'Invalid money amount: {value!r}') from e
+    if not money.is_finite():
+        raise ValueError(f'Invalid money amount: {value!r}')
+    return money
+
+def parse_money(value):
+    """Parse user input into a Decimal amount; raises ValueError (usable as a werkzeug type=)"""
+    if value is None:
+        raise ValueError('Missing money amount')
+    return to_money(str(value).strip())
+
+def to_cents(value):
+    """Decimal/number -> integer minor units"""
+    return int(to_money(value) * 100)
+
+def from_cents(cents):
+    """Integer minor units (or a DECIMAL SUM of them) -> Decimal with two places"""
+    return (Decimal(cents) / 100).quantize(CENT)
+
+class Money(TypeDecorator):
+    """Exact money amount, stored as BIGINT cents and exposed as Decimal
+    
+    SUM/+/- over Money columns therefore run as integer arithmetic in the
+    database; only the final value is converted back to Decimal.
+    """
+    impl = BigInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_cents(value)
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return from_cents(value)
\ No newline at end of file
@@ -0,0 +1,32 @@
+from functools import wraps
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+
+class RoutingSession(Session):
+    """Session that sends SELECTs to the 'replica' bind inside read-only views"""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and getattr(clause, 'is_select', False)
+            and has_app_context()
+            and g.get('use_read_replica')
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_replica(f):
+    """Decorator for views that only read; their SELECTs go to the replica when configured"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.use_read_replica = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            g.use_read_replica = False
+    return decorated_function
\ No newline at end of file
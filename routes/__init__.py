@@ -1,4 +1,10 @@
-from flask import Blueprint
+from importlib import import_module
+from flask import Blueprint, jsonify
+from sqlalchemy.orm.exc import StaleDataError
+from models import db
+from services.auth import init_login
+from services.metrics import init_metrics
+from services.query_counter import init_query_counter
 
 # Create blueprints
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -7,20 +13,51 @@ invoice_bp = Blueprint('invoice', __name__, url_prefix='/invoices')
 payment_bp = Blueprint('payment', __name__, url_prefix='/payments')
 report_bp = Blueprint('report', __name__, url_prefix='/report')
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
+metrics_bp = Blueprint('metrics', __name__)
+job_bp = Blueprint('job', __name__, url_prefix='/jobs')
+api_v1_bp = Blueprint('api_v1', __name__, url_prefix='/api/v1')
 
-# Import routes to register them
-from . import auth_routes
-from . import customer_routes
-from . import invoice_routes
-from . import payment_routes
-from . import report_routes
-from . import dashboard_routes
+# Optimistic concurrency: a row changed between our read and our write
+CONFLICT_MESSAGE = 'Data telah diubah oleh proses lain. Muat ulang halaman lalu coba lagi.'
 
-def init_routes(app):
-    """Register all blueprints with the app"""
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(customer_bp)
-    app.register_blueprint(invoice_bp)
-    app.register_blueprint(payment_bp)
-    app.register_blueprint(report_bp)
-    app.register_blueprint(dashboard_bp)
\ No newline at end of file
+def conflict_response(e=None):
+    """409 for a StaleDataError; the request can simply be retried"""
+    db.session.rollback()
+    response = jsonify({'errors': [CONFLICT_MESSAGE], 'retryable': True})
+    response.status_code = 409
+    response.headers['Retry-After'] = '0'
+    return response
+
+# Blueprint name -> module defining its views. Modules are imported by
+# init_routes, not here, so an app can register a subset (BLUEPRINTS) and skip
+# the imports of the rest. Importing a module also registers its job tasks.
+BLUEPRINT_MODULES = {
+    'auth': ('auth_routes', auth_bp),
+    'customer': ('customer_routes', customer_bp),
+    'invoice': ('invoice_routes', invoice_bp),
+    'payment': ('payment_routes', payment_bp),
+    'report': ('report_routes', report_bp),
+    'dashboard': ('dashboard_routes', dashboard_bp),
+    'metrics': ('metrics_routes', metrics_bp),
+    'job': ('job_routes', job_bp),
+    'api_v1': ('api_v1_routes', api_v1_bp)
+}
+# Login redirects point at auth.login, so it is always registered
+REQUIRED_BLUEPRINTS = ('auth',)
+
+def init_routes(app, blueprints=None):
+    """Register blueprints with the app: the given names, else BLUEPRINTS from the config, else all"""
+    names = blueprints or app.config.get('BLUEPRINTS') or list(BLUEPRINT_MODULES)
+    unknown = [name for name in names if name not in BLUEPRINT_MODULES]
+    if unknown:
+        raise ValueError(f'Unknown blueprints: {", ".join(unknown)}')
+    
+    init_login(app)
+    init_metrics(app)
+    init_query_counter(app)
+    app.register_error_handler(StaleDataError, conflict_response)
+    
+    for name in dict.fromkeys(REQUIRED_BLUEPRINTS + tuple(names)):
+        module, blueprint = BLUEPRINT_MODULES[name]
+        import_module(f'.{module}', __name__)
+        app.register_blueprint(blueprint)
@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+from datetime import date, datetime
+from decimal import Decimal
+from flask import abort, current_app, jsonify, request
+from flask_login import login_required
+from models import db, Customer, Invoice, Payment, read_replica
+from services.pagination import keyset_paginate
+from services.query_counter import query_budget
+from . import api_v1_bp
+
+API_MAX_BATCH = 100
+API_MAX_PER_PAGE = 200
+
+class ApiResource:
+    """Model exposed under /api/v1/<name>: readable fields and simple equality filters"""
+    
+    def __init__(self, model, fields, default_fields, filters=(), version='updated_at'):
+        self.model = model
+        self.fields = fields
+        self.default_fields = default_fields
+        self.filters = filters
+        self.version = version
+    
+    def columns(self, fields):
+        # id/created_at drive keyset cursors and the version column the ETag, so they are always loaded
+        names = dict.fromkeys(('id', 'created_at', self.version) + tuple(fields))
+        return [getattr(self.model, name) for name in names]
+
+RESOURCES = {
+    'customers': ApiResource(
+        Customer,
+        fields=('id', 'name', 'phone', 'email', 'address', 'status', 'created_at', 'updated_at', 'version_id'),
+        default_fields=('id', 'name', 'phone', 'email', 'status', 'updated_at'),
+        filters=('status',),
+        version='version_id'
+    ),
+    'invoices': ApiResource(
+        Invoice,
+        fields=('id', 'invoice_number', 'customer_id', 'date', 'due_date', 'description', 'amount',
+                'paid_total', 'remaining', 'status', 'is_overdue', 'overdue_since', 'billing_period',
+                'created_at', 'updated_at', 'version_id'),
+        default_fields=('id', 'invoice_number', 'customer_id', 'due_date', 'amount', 'remaining',
+                        'status', 'updated_at'),
+        filters=('status', 'customer_id', 'is_overdue'),
+        version='version_id'
+    ),
+    'payments': ApiResource(
+        Payment,
+        fields=('id', 'invoice_id', 'payment_date', 'amount', 'method', 'note', 'created_at', 'updated_at'),
+        default_fields=('id', 'invoice_id', 'payment_date', 'amount', 'method', 'updated_at'),
+        filters=('invoice_id', 'method')
+    )
+}
+
+def _bad_request(message):
+    response = jsonify({'errors': [message]})
+    response.status_code = 400
+    abort(response)
+
+def _get_resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        abort(404)
+    return resource
+
+def _requested_fields(resource):
+    """?fields=a,b (sparse fieldset), validated against the resource"""
+    if not request.args.get('fields'):
+        return resource.default_fields
+    
+    fields = tuple(dict.fromkeys(field.strip() for field in request.args['fields'].split(',') if field.strip()))
+    unknown = [field for field in fields if field not in resource.fields]
+    if unknown:
+        _bad_request(f'Field tidak dikenal: {", ".join(unknown)}. Tersedia: {", ".join(resource.fields)}.')
+    return fields
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _row_to_dict(row, fields):
+    return {field: _json_value(getattr(row, field)) for field in fields}
+
+def _etag(resource, fields, rows, *extra):
+    """Weak ETag over the selected fields and each row's (id, version)
+
+    The version counter is bumped by every write to the row, without relying
+    on timestamps; resources without one fall back to updated_at.
+    """
+    digest = hashlib.sha1(repr((fields, extra)).encode())
+    for row in rows:
+        version = getattr(row, resource.version)
+        digest.update(f'{row.id}:{version.isoformat() if isinstance(version, datetime) else version or ""};'.encode())
+    return digest.hexdigest()
+
+def _conditional_json(payload_factory, etag):
+    """304 when If-None-Match carries etag, otherwise the JSON payload tagged with it"""
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(payload_factory())
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _filtered_query(resource, columns):
+    query = db.session.query(*columns)
+    for name in resource.filters:
+        value = request.args.get(name)
+        if value is None or value == '':
+            continue
+        column = getattr(resource.model, name)
+        if name == 'is_overdue':
+            value = value.lower() in ('1', 'true', 'yes')
+        elif name.endswith('_id'):
+            try:
+                value = int(value)
+            except ValueError:
+                _bad_request(f'{name} harus berupa angka.')
+        query = query.filter(column == value)
+    return query
+
+@api_v1_bp.route('/<resource_name>')
+@login_required
+@query_budget(2)
+@read_replica
+def list_resources(resource_name):
+    """Cursor-paginated listing, or ?ids=1,2,3 for a batch fetch in the given order"""
+    resource = _get_resource(resource_name)
+    fields = _requested_fields(resource)
+    columns = resource.columns(fields)
+    
+    if request.args.get('ids'):
+        try:
+            ids = list(dict.fromkeys(int(item) for item in request.args['ids'].split(',') if item.strip()))
+        except ValueError:
+            _bad_request('ids harus berupa daftar angka dipisah koma.')
+        if len(ids) > API_MAX_BATCH:
+            _bad_request(f'Maksimal {API_MAX_BATCH} id per permintaan.')
+        
+        found = {row.id: row for row in db.session.query(*columns).filter(resource.model.id.in_(ids))}
+        rows = [found[item_id] for item_id in ids if item_id in found]
+        return _conditional_json(lambda: {
+            'items': [_row_to_dict(row, fields) for row in rows],
+            'missing': [item_id for item_id in ids if item_id not in found]
+        }, _etag(resource, fields, rows, ids))
+    
+    try:
+        page = keyset_paginate(
+            _filtered_query(resource, columns),
+            resource.model,
+            cursor=request.args.get('cursor'),
+            per_page=max(1, min(request.args.get('per_page', 50, type=int), API_MAX_PER_PAGE))
+        )
+    except ValueError:
+        _bad_request('Cursor tidak valid.')
+    
+    return _conditional_json(lambda: {
+        'items': [_row_to_dict(row, fields) for row in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    }, _etag(resource, fields, page.items, page.next_cursor, page.prev_cursor))
+
+@api_v1_bp.route('/<resource_name>/<int:item_id>')
+@login_required
+@query_budget(2)
+@read_replica
+def get_resource(resource_name, item_id):
+    """One row with the requested fields"""
+    resource = _get_resource(resource_name)
+    fields = _requested_fields(resource)
+    
+    row = db.session.query(*resource.columns(fields)).filter(resource.model.id == item_id).first()
+    if row is None:
+        abort(404)
+    return _conditional_json(lambda: _row_to_dict(row, fields), _etag(resource, fields, [row]))
+
+@api_v1_bp.after_request
+def gzip_response(response):
+    """Compress JSON bodies for clients that accept gzip"""
+    if response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in request.headers.get('Accept-Encoding', '').lower():
+        return response
+    
+    body = response.get_data()
+    if len(body) < current_app.config.get('API_GZIP_MIN_SIZE', 500):
+        return response
+    
+    response.set_data(gzip.compress(body, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
\ No newline at end of file
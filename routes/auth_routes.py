@@ -35,6 +35,11 @@ def login():
                 flash('Akun Anda telah dinonaktifkan.', 'danger')
                 return redirect(url_for('auth.login'))
             
+            if user.password_needs_rehash():
+                # Upgrade the hash to the configured parameters while the password is at hand
+                user.set_password(password)
+                db.session.commit()
+            
             login_user(user)
             next_page = request.args.get('next')
             if next_page and next_page.startswith('/'): 
@@ -100,7 +105,10 @@ def change_password():
         new_password = request.form.get('new_password')
         confirm_password = request.form.get('confirm_password')
         
-        if not current_user.check_password(old_password):
+        # current_user is a cached copy without the hash; check and update the stored row
+        user = db.session.get(User, current_user.id)
+        
+        if not user.check_password(old_password):
             flash('Password lama salah.', 'danger')
             return redirect(url_for('auth.change_password'))
         
@@ -108,7 +116,7 @@ def change_password():
             flash('Password baru tidak cocok.', 'warning')
             return redirect(url_for('auth.change_password'))
         
-        current_user.set_password(new_password)
+        user.set_password(new_password)
         db.session.commit()
         flash('Password berhasil diubah.', 'success')
         return redirect(url_for('dashboard.index'))
@@ -1,38 +1,95 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify
+import csv
+import io
+import os
+import uuid
+import click
+from flask import render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user
-from models import db, Customer
-from . import customer_bp
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from models import db, Customer, read_replica
+from services.customer_import import import_customers
+from services.jobs import enqueue, job_task
+from services.customer_lookup import search_customer_names
+from services.customer_search import get_search_backend
+from services.pagination import keyset_paginate
+from services.query_counter import query_budget
+from . import CONFLICT_MESSAGE, customer_bp
 from .auth_routes import admin_required
+from .job_routes import job_accepted, job_files_dir
+
+def _search_customers(search):
+    """Customer query filtered by the listing search term"""
+    query = Customer.query
+    
+    if search:
+        query = get_search_backend().filter(query, search)
+    
+    return query
+
+def _keyset_customers(query, cursor):
+    """Cursor-paginate customers, aborting with 400 on a malformed cursor"""
+    try:
+        return keyset_paginate(
+            query,
+            Customer,
+            cursor=cursor,
+            per_page=10,
+            with_total=bool(request.args.get('total'))
+        )
+    except ValueError:
+        abort(400)
 
 @customer_bp.route('/', methods=['GET'])
 @login_required
+@query_budget(3)
+@read_replica
 def list_customers():
     """Display all customers"""
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     search = request.args.get('search', '')
     
-    query = Customer.query
+    query = _search_customers(search)
     
-    if search:
-        query = query.filter(
-            db.or_(
-                Customer.name.ilike(f'%{search}%'),
-                Customer.email.ilike(f'%{search}%'),
-                Customer.phone.ilike(f'%{search}%')
-            )
+    # ?cursor= switches to keyset pagination, which costs the same on every page
+    if cursor is not None:
+        customers = _keyset_customers(query, cursor)
+    else:
+        customers = query.order_by(Customer.created_at.desc()).paginate(
+            page=page,
+            per_page=10
         )
     
-    customers = query.order_by(Customer.created_at.desc()).paginate(
-        page=page,
-        per_page=10
-    )
-    
     return render_template(
         'customer/list.html',
         customers=customers,
         search=search
     )
 
+@customer_bp.route('/api/list')
+@login_required
+@query_budget(3)
+@read_replica
+def list_customers_json():
+    """Cursor-paginated customer listing as JSON"""
+    search = request.args.get('search', '')
+    customers = _keyset_customers(_search_customers(search), request.args.get('cursor'))
+    
+    return jsonify({
+        'items': [{
+            'id': customer.id,
+            'name': customer.name,
+            'email': customer.email,
+            'phone': customer.phone,
+            'status': customer.status,
+            'created_at': customer.created_at.isoformat()
+        } for customer in customers.items],
+        'next_cursor': customers.next_cursor,
+        'prev_cursor': customers.prev_cursor,
+        'total': customers.total
+    })
+
 @customer_bp.route('/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -67,6 +124,10 @@ def add_customer():
             db.session.commit()
             flash(f'Pelanggan {name} berhasil ditambahkan.', 'success')
             return redirect(url_for('customer.list_customers'))
+        except IntegrityError:
+            # Lost a race with another insert of the same email (unique index)
+            db.session.rollback()
+            flash('Email sudah terdaftar.', 'warning')
         except Exception as e:
             db.session.rollback()
             flash(f'Error: {str(e)}', 'danger')
@@ -87,6 +148,11 @@ def edit_customer(customer_id):
         address = request.form.get('address')
         status = request.form.get('status', 'active')
         
+        # The form carries the version it was rendered from
+        if request.form.get('version_id', customer.version_id, type=int) != customer.version_id:
+            flash(CONFLICT_MESSAGE, 'warning')
+            return redirect(url_for('customer.edit_customer', customer_id=customer_id))
+        
         # Validation
         if not all([name, phone, email]):
             flash('Nama, HP, dan Email harus diisi.', 'warning')
@@ -112,6 +178,13 @@ def edit_customer(customer_id):
             db.session.commit()
             flash(f'Pelanggan {name} berhasil diubah.', 'success')
             return redirect(url_for('customer.list_customers'))
+        except IntegrityError:
+            db.session.rollback()
+            flash('Email sudah digunakan pelanggan lain.', 'warning')
+        except StaleDataError:
+            db.session.rollback()
+            flash(CONFLICT_MESSAGE, 'warning')
+            return redirect(url_for('customer.edit_customer', customer_id=customer_id))
         except Exception as e:
             db.session.rollback()
             flash(f'Error: {str(e)}', 'danger')
@@ -140,14 +213,37 @@ def delete_customer(customer_id):
         db.session.delete(customer)
         db.session.commit()
         flash(f'Pelanggan {customer.name} berhasil dihapus.', 'success')
+    except StaleDataError:
+        db.session.rollback()
+        flash(CONFLICT_MESSAGE, 'warning')
     except Exception as e:
         db.session.rollback()
         flash(f'Error: {str(e)}', 'danger')
     
     return redirect(url_for('customer.list_customers'))
 
+@customer_bp.route('/api/lookup')
+@login_required
+@read_replica
+def lookup_customers():
+    """Typeahead: (id, name) of customers whose name starts with ?q="""
+    prefix = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    
+    if not prefix:
+        return jsonify([])
+    
+    customers = search_customer_names(
+        prefix,
+        limit=limit,
+        active_only=bool(request.args.get('active'))
+    )
+    
+    return jsonify([{'id': c.id, 'name': c.name} for c in customers])
+
 @customer_bp.route('/api/<int:customer_id>')
 @login_required
+@read_replica
 def get_customer(customer_id):
     """Get customer data as JSON"""
     customer = Customer.query.get_or_404(customer_id)
@@ -157,4 +253,76 @@ def get_customer(customer_id):
         'email': customer.email,
         'phone': customer.phone,
         'address': customer.address
-    })
\ No newline at end of file
+    })
+
+@customer_bp.route('/import', methods=['POST'])
+@login_required
+@admin_required
+def import_customers_csv():
+    """Import customers from an uploaded CSV (?dry_run=1 validates only, ?async=1 queues a job)"""
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'errors': ['File CSV harus diunggah.']}), 400
+    
+    dry_run = bool(request.values.get('dry_run'))
+    
+    if request.values.get('async'):
+        filename = f'import-{uuid.uuid4().hex}.csv'
+        upload.save(os.path.join(job_files_dir(), filename))
+        job = enqueue('customer.import', {'file': filename, 'dry_run': dry_run}, created_by=current_user.id)
+        return job_accepted(job)
+    
+    # Decoded while reading, so the upload is never held in memory as a whole
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    try:
+        stats = import_customers(stream, dry_run=dry_run)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'errors': [str(e)]}), 400
+    return jsonify(stats)
+
+@job_task('customer.import')
+def import_customers_job(job, file, dry_run=False):
+    """Import an uploaded CSV stored in JOB_FILES_DIR; progress counts rows read"""
+    path = os.path.join(job_files_dir(), os.path.basename(file))
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        stats = import_customers(
+            stream,
+            dry_run=dry_run,
+            progress=lambda stats: job.progress(stats['rows'], message=f"{stats['created']} pelanggan diimpor")
+        )
+    # Kept until success so a retry can rerun it; imported rows are skipped as duplicates
+    os.remove(path)
+    return stats
+
+@customer_bp.cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Validate only, insert nothing')
+@click.option('--chunk-size', default=1000, show_default=True)
+@click.option('--errors-out', type=click.Path(dir_okay=False), help='Write every rejected row to this CSV')
+def import_command(path, dry_run, chunk_size, errors_out):
+    """Import customers from a CSV file (name/nama, phone/hp, email, address/alamat, status)"""
+    error_file = open(errors_out, 'w', newline='') if errors_out else None
+    error_writer = csv.writer(error_file) if error_file else None
+    if error_writer:
+        error_writer.writerow(['Baris', 'Error'])
+    
+    def write_error(error):
+        if error_writer:
+            error_writer.writerow([error['line'], ' '.join(error['errors'])])
+    
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            stats = import_customers(stream, chunk_size=chunk_size, dry_run=dry_run, max_errors=20, on_error=write_error)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        if error_file:
+            error_file.close()
+    
+    for error in stats['errors']:
+        click.echo(f"Baris {error['line']}: {' '.join(error['errors'])}")
+    verb = 'valid (uji coba)' if dry_run else 'diimpor'
+    click.echo(
+        f"{stats['rows']} baris: {stats['created']} {verb}, {stats['duplicates']} duplikat, "
+        f"{stats['failed']} ditolak, {stats['seconds']} detik ({stats['per_second']}/detik)."
+    )
\ No newline at end of file
@@ -1,9 +1,22 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify
+from flask import render_template, request, redirect, url_for, flash, jsonify, abort, current_app
 from flask_login import login_required, current_user
-from models import db, Invoice, Customer, Payment
+from models import db, Invoice, Customer, Payment, reconcile_invoice_totals, check_invoice_totals, parse_money, read_replica
 from datetime import datetime, timedelta
-from . import invoice_bp
+from services.billing import run_billing
+from services.jobs import enqueue, job_task
+from services.ledger import backfill_ledger, check_invoice_ledger
+from services.overdue import sweep_overdue
+from services.reminders import get_sender, send_reminders
+from services.customer_lookup import active_customer_choices
+from services.pagination import keyset_paginate
+from services.query_counter import query_budget
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from . import CONFLICT_MESSAGE, invoice_bp
 from .auth_routes import admin_required
+from .job_routes import job_accepted
+import click
 import uuid
 
 def generate_invoice_number():
@@ -12,37 +25,107 @@ def generate_invoice_number():
     unique_str = str(uuid.uuid4())[:8].upper()
     return f'INV-{date_str}-{unique_str}'
 
+def _filter_invoices(status_filter, customer_id, overdue=False):
+    """Invoice query filtered by the listing filters"""
+    query = Invoice.query.options(joinedload(Invoice.customer))
+    
+    if status_filter:
+        query = query.filter_by(status=status_filter)
+    
+    if overdue:
+        query = query.filter_by(is_overdue=True)
+    
+    if customer_id:
+        query = query.filter_by(customer_id=customer_id)
+    
+    return query
+
+def _keyset_invoices(query, cursor):
+    """Cursor-paginate invoices, aborting with 400 on a malformed cursor"""
+    try:
+        return keyset_paginate(
+            query,
+            Invoice,
+            cursor=cursor,
+            per_page=10,
+            with_total=bool(request.args.get('total'))
+        )
+    except ValueError:
+        abort(400)
+
 @invoice_bp.route('/', methods=['GET'])
 @login_required
+@query_budget(4)
+@read_replica
 def list_invoices():
     """Display all invoices"""
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     status_filter = request.args.get('status', '')
     customer_id = request.args.get('customer_id', '', type=int)
+    overdue = bool(request.args.get('overdue'))
     
-    query = Invoice.query
+    query = _filter_invoices(status_filter, customer_id, overdue)
     
-    if status_filter:
-        query = query.filter_by(status=status_filter)
+    # ?cursor= switches to keyset pagination, which costs the same on every page
+    if cursor is not None:
+        invoices = _keyset_invoices(query, cursor)
+    else:
+        invoices = query.order_by(Invoice.created_at.desc()).paginate(
+            page=page,
+            per_page=10
+        )
     
+    # The filter uses the customer typeahead; only the selected customer is loaded
+    selected_customer = None
     if customer_id:
-        query = query.filter_by(customer_id=customer_id)
-    
-    invoices = query.order_by(Invoice.created_at.desc()).paginate(
-        page=page,
-        per_page=10
-    )
-    
-    customers = Customer.query.all()
+        selected_customer = db.session.execute(
+            db.select(Customer.id, Customer.name).where(Customer.id == customer_id)
+        ).first()
     
     return render_template(
         'invoice/list.html',
         invoices=invoices,
-        customers=customers,
+        customers=[selected_customer] if selected_customer else [],
+        customer_lookup_url=url_for('customer.lookup_customers'),
         status_filter=status_filter,
-        customer_id=customer_id
+        customer_id=customer_id,
+        overdue=overdue
     )
 
+@invoice_bp.route('/api/list')
+@login_required
+@query_budget(3)
+@read_replica
+def list_invoices_json():
+    """Cursor-paginated invoice listing as JSON"""
+    query = _filter_invoices(
+        request.args.get('status', ''),
+        request.args.get('customer_id', '', type=int),
+        bool(request.args.get('overdue'))
+    )
+    invoices = _keyset_invoices(query, request.args.get('cursor'))
+    
+    return jsonify({
+        'items': [{
+            'id': inv.id,
+            'invoice_number': inv.invoice_number,
+            'customer_id': inv.customer_id,
+            'date': inv.date.isoformat(),
+            'due_date': inv.due_date.isoformat(),
+            'amount': float(inv.amount),
+            'paid_amount': float(inv.paid_amount),
+            'remaining_amount': float(inv.remaining_amount),
+            'status': inv.status,
+            'is_overdue': inv.is_overdue,
+            'overdue_since': inv.overdue_since.isoformat() if inv.overdue_since else None,
+            'created_at': inv.created_at.isoformat()
+        } for inv in invoices.items],
+        'next_cursor': invoices.next_cursor,
+        'prev_cursor': invoices.prev_cursor,
+        'total': invoices.total
+    })
+
 @invoice_bp.route('/create', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -51,7 +134,7 @@ def create_invoice():
     if request.method == 'POST':
         customer_id = request.form.get('customer_id', type=int)
         description = request.form.get('description')
-        amount = request.form.get('amount', type=float)
+        amount = request.form.get('amount', type=parse_money)
         due_date_str = request.form.get('due_date')
         
         # Validation
@@ -89,15 +172,19 @@ def create_invoice():
             db.session.rollback()
             flash(f'Error: {str(e)}', 'danger')
     
-    customers = Customer.query.filter_by(status='active').all()
+    customers = active_customer_choices()
     return render_template('invoice/create.html', customers=customers)
 
 @invoice_bp.route('/<int:invoice_id>', methods=['GET'])
 @login_required
+@query_budget(3)
 def view_invoice(invoice_id):
     """View invoice details"""
-    invoice = Invoice.query.get_or_404(invoice_id)
-    payments = Payment.query.filter_by(invoice_id=invoice_id).all()
+    invoice = Invoice.query.options(
+        joinedload(Invoice.customer),
+        selectinload(Invoice.payments)
+    ).get_or_404(invoice_id)
+    payments = invoice.payments
     
     return render_template(
         'invoice/view.html',
@@ -119,9 +206,14 @@ def edit_invoice(invoice_id):
     
     if request.method == 'POST':
         description = request.form.get('description')
-        amount = request.form.get('amount', type=float)
+        amount = request.form.get('amount', type=parse_money)
         due_date_str = request.form.get('due_date')
         
+        # The form carries the version it was rendered from
+        if request.form.get('version_id', invoice.version_id, type=int) != invoice.version_id:
+            flash(CONFLICT_MESSAGE, 'warning')
+            return redirect(url_for('invoice.edit_invoice', invoice_id=invoice_id))
+        
         if not all([amount, due_date_str]):
             flash('Nominal dan Jatuh Tempo harus diisi.', 'warning')
             return redirect(url_for('invoice.edit_invoice', invoice_id=invoice_id))
@@ -142,6 +234,11 @@ def edit_invoice(invoice_id):
             return redirect(url_for('invoice.view_invoice', invoice_id=invoice_id))
         except ValueError:
             flash('Format tanggal tidak valid.', 'danger')
+        except StaleDataError:
+            # A payment (or another edit) landed after the paid check above
+            db.session.rollback()
+            flash(CONFLICT_MESSAGE, 'warning')
+            return redirect(url_for('invoice.view_invoice', invoice_id=invoice_id))
         except Exception as e:
             db.session.rollback()
             flash(f'Error: {str(e)}', 'danger')
@@ -165,6 +262,11 @@ def delete_invoice(invoice_id):
         db.session.delete(invoice)
         db.session.commit()
         flash(f'Tagihan {invoice_number} berhasil dihapus.', 'success')
+    except StaleDataError:
+        # A payment landed after the check above; its total update bumped the version
+        db.session.rollback()
+        flash(CONFLICT_MESSAGE, 'warning')
+        return redirect(url_for('invoice.view_invoice', invoice_id=invoice_id))
     except Exception as e:
         db.session.rollback()
         flash(f'Error: {str(e)}', 'danger')
@@ -173,6 +275,8 @@ def delete_invoice(invoice_id):
 
 @invoice_bp.route('/api/by-customer/<int:customer_id>')
 @login_required
+@query_budget(2)
+@read_replica
 def get_customer_invoices(customer_id):
     """Get unpaid invoices for a customer"""
     invoices = Invoice.query.filter(
@@ -183,8 +287,208 @@ def get_customer_invoices(customer_id):
     return jsonify([{
         'id': inv.id,
         'invoice_number': inv.invoice_number,
-        'amount': inv.amount,
-        'paid_amount': inv.paid_amount,
-        'remaining_amount': inv.remaining_amount,
-        'status': inv.status
-    } for inv in invoices])
\ No newline at end of file
+        'amount': float(inv.amount),
+        'paid_amount': float(inv.paid_amount),
+        'remaining_amount': float(inv.remaining_amount),
+        'status': inv.status,
+        'is_overdue': inv.is_overdue
+    } for inv in invoices])
+
+@invoice_bp.route('/api/billing-run', methods=['POST'])
+@login_required
+@admin_required
+def billing_run():
+    """Queue a billing run for a period; poll the returned job for progress"""
+    data = request.get_json(silent=True) or request.form
+    
+    try:
+        period = data.get('period', '')
+        datetime.strptime(period, '%Y-%m')
+        amount = parse_money(data.get('amount'))
+        due_days = int(data.get('due_days', 14))
+    except (TypeError, ValueError):
+        return jsonify({'errors': ['Periode (YYYY-MM), nominal, dan jatuh tempo harus valid.']}), 400
+    
+    if amount <= 0:
+        return jsonify({'errors': ['Nominal harus lebih dari 0.']}), 400
+    
+    job = enqueue('invoice.bill', {
+        'period': period,
+        'amount': str(amount),
+        'description': data.get('description'),
+        'due_days': due_days,
+        'customer_status': data.get('customer_status', 'active') or None
+    }, created_by=current_user.id)
+    return job_accepted(job)
+
+@job_task('invoice.bill')
+def bill_job(job, period, amount, description=None, due_days=14, customer_status='active'):
+    """Background billing run; progress counts customers processed"""
+    query = select(func.count(Customer.id))
+    if customer_status:
+        query = query.where(Customer.status == customer_status)
+    total = db.session.execute(query).scalar()
+    
+    def report(stats):
+        job.progress(stats['created'] + stats['skipped'], total, f"{stats['created']} tagihan dibuat")
+    
+    return run_billing(
+        period,
+        parse_money(amount),
+        description=description,
+        due_days=due_days,
+        customer_status=customer_status,
+        progress=report
+    )
+
+@invoice_bp.cli.command('bill')
+@click.option('--period', required=True, help='Billing period, YYYY-MM')
+@click.option('--amount', required=True, type=parse_money)
+@click.option('--description', default=None)
+@click.option('--due-days', default=14, show_default=True, help='Due date offset from the start of the period')
+@click.option('--customer-status', default='active', show_default=True, help="Empty for all customers")
+@click.option('--chunk-size', default=1000, show_default=True)
+def bill_command(period, amount, description, due_days, customer_status, chunk_size):
+    """Issue recurring invoices for a billing period (resumable, idempotent)"""
+    def report(stats):
+        click.echo(f"{stats['created']} dibuat, {stats['skipped']} dilewati...")
+    
+    stats = run_billing(
+        period,
+        amount,
+        description=description,
+        due_days=due_days,
+        customer_status=customer_status or None,
+        chunk_size=chunk_size,
+        progress=report
+    )
+    click.echo(
+        f"Periode {stats['period']}: {stats['created']} tagihan dibuat, "
+        f"{stats['skipped']} dilewati, {stats['seconds']} detik ({stats['per_second']}/detik)."
+    )
+
+@job_task('invoice.sweep-overdue')
+def sweep_overdue_job(job, full=False):
+    return sweep_overdue(full=full)
+
+@invoice_bp.cli.command('sweep-overdue')
+@click.option('--full', is_flag=True, help='Rescan all open invoices and clear stale flags')
+def sweep_overdue_command(full):
+    """Flag invoices that became overdue since the last sweep (run daily after midnight UTC)"""
+    stats = sweep_overdue(full=full)
+    click.echo(f"{stats['flagged']} tagihan ditandai jatuh tempo, {stats['cleared']} dibersihkan (batas {stats['cutoff']}).")
+
+def _send_reminders(**options):
+    """send_reminders with the configured sender and REMINDER_* settings; options override them"""
+    config = current_app.config
+    settings = {
+        'days_before': config.get('REMINDER_DAYS_BEFORE_DUE', 3),
+        'interval_days': config.get('REMINDER_INTERVAL_DAYS', 7),
+        'batch_size': config.get('REMINDER_BATCH_SIZE', 100),
+        'rate_limit': config.get('REMINDER_RATE_LIMIT', 0)
+    }
+    settings.update(options)
+    sender = get_sender(config)
+    try:
+        return send_reminders(sender, **settings)
+    finally:
+        sender.close()
+
+@invoice_bp.route('/reminders/job', methods=['POST'])
+@login_required
+@admin_required
+def reminders_job():
+    """Queue a reminder run; ?dry_run=1 only counts what would be sent"""
+    dry_run = request.values.get('dry_run') in ('1', 'true')
+    job = enqueue('invoice.send-reminders', {'dry_run': dry_run}, created_by=current_user.id)
+    return job_accepted(job)
+
+@job_task('invoice.send-reminders')
+def send_reminders_job(job, dry_run=False, limit=None):
+    """Reminder run; progress counts candidate invoices read (the total is not known up front)"""
+    def report(stats):
+        job.progress(stats['candidates'], message=f"{stats['sent']} pengingat dikirim")
+    
+    return _send_reminders(dry_run=dry_run, limit=limit, progress=report)
+
+@invoice_bp.cli.command('send-reminders')
+@click.option('--dry-run', is_flag=True, help='Render and count without claiming or sending')
+@click.option('--limit', type=int, default=None, help='Stop after this many candidate invoices')
+@click.option('--days-before', type=int, default=None, help='Default: REMINDER_DAYS_BEFORE_DUE')
+@click.option('--today', type=click.DateTime(formats=['%Y-%m-%d']), default=None)
+def send_reminders_command(dry_run, limit, days_before, today):
+    """Remind customers of overdue and soon-due invoices (run daily after sweep-overdue)"""
+    options = {'dry_run': dry_run, 'limit': limit}
+    if days_before is not None:
+        options['days_before'] = days_before
+    if today is not None:
+        options['today'] = today.date()
+    
+    stats = _send_reminders(**options)
+    click.echo(
+        f"{'[dry run] ' if dry_run else ''}{stats['sent']} pengingat "
+        f"({stats['kinds']['overdue']} jatuh tempo, {stats['kinds']['due_soon']} segera jatuh tempo), "
+        f"{stats['skipped']} dilewati, {stats['seconds']} detik ({stats['per_second']}/detik)."
+    )
+
+@job_task('invoice.reconcile-totals')
+def reconcile_totals_job(job):
+    return {'reconciled': reconcile_invoice_totals()}
+
+@invoice_bp.cli.command('reconcile-totals')
+def reconcile_totals_command():
+    """Recompute stored invoice paid/remaining totals from payments"""
+    count = reconcile_invoice_totals()
+    click.echo(f'{count} tagihan direkonsiliasi.')
+
+@invoice_bp.cli.command('check-totals')
+def check_totals_command():
+    """Report invoices whose stored totals disagree with their payments"""
+    mismatches = check_invoice_totals()
+    
+    for row in mismatches:
+        click.echo(f'{row.invoice_number}: tersimpan {row.paid_total}, pembayaran {row.actual_paid}')
+    
+    if mismatches:
+        raise click.ClickException(f'{len(mismatches)} tagihan tidak konsisten.')
+    click.echo('Semua total tagihan konsisten.')
+
+@invoice_bp.cli.command('backfill-ledger')
+def backfill_ledger_command():
+    """Post ledger entries for invoices and payments that have none (after migration 012)"""
+    stats = backfill_ledger()
+    click.echo(f"{stats['invoices']} tagihan dan {stats['payments']} pembayaran dicatat di ledger.")
+
+@invoice_bp.cli.command('check-ledger')
+def check_ledger_command():
+    """Report invoices whose stored amount, paid total or status disagrees with the ledger"""
+    mismatches = check_invoice_ledger()
+    
+    for row in mismatches:
+        click.echo(
+            f'{row.invoice_number}: tersimpan {row.amount}/{row.paid_total} ({row.status}), '
+            f'ledger {row.ledger_amount}/{row.ledger_paid} ({row.ledger_status})'
+        )
+    
+    if mismatches:
+        raise click.ClickException(f'{len(mismatches)} tagihan tidak sesuai ledger.')
+    click.echo('Semua tagihan sesuai ledger.')
+
+@invoice_bp.cli.command('check-indexes')
+@click.option('--create-schema', is_flag=True, help='Create missing tables first, e.g. on a throwaway CI database')
+def check_indexes_command(create_schema):
+    """Fail if a hot listing/dashboard query falls back to a full table scan"""
+    from services.query_plans import find_full_scans
+    
+    if create_schema:
+        db.create_all()
+    full_scans = find_full_scans()
+    
+    for name, plan in full_scans.items():
+        click.echo(f'{name}:')
+        for row in plan:
+            click.echo(f'    {tuple(row)}')
+    
+    if full_scans:
+        raise click.ClickException(f'{len(full_scans)} query melakukan full table scan.')
+    click.echo('Semua query menggunakan index.')
\ No newline at end of file
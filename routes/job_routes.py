@@ -0,0 +1,95 @@
+import os
+import signal
+import click
+from flask import abort, current_app, jsonify, send_from_directory, url_for
+from flask_login import current_user, login_required
+from models import db, Job
+from services.jobs import Worker, enqueue, job_to_dict, registered_tasks
+from . import job_bp
+
+def job_files_dir():
+    """Directory for files produced by jobs (exports), created on demand"""
+    path = current_app.config['JOB_FILES_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def job_accepted(job):
+    """202 response pointing the client at the job's status URL"""
+    response = jsonify(job_to_dict(job))
+    response.status_code = 202
+    response.headers['Location'] = url_for('job.job_status', job_id=job.id)
+    return response
+
+def _get_visible_job(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None or (current_user.role != 'admin' and job.created_by != current_user.id):
+        abort(404)
+    return job
+
+@job_bp.route('/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """Poll a job's status, progress and result"""
+    return jsonify(job_to_dict(_get_visible_job(job_id)))
+
+@job_bp.route('/<int:job_id>/download')
+@login_required
+def download_job_file(job_id):
+    """Download the file a finished job produced"""
+    job = _get_visible_job(job_id)
+    if job.status != 'succeeded' or not (job.result or {}).get('file'):
+        abort(404)
+    return send_from_directory(job_files_dir(), job.result['file'], as_attachment=True)
+
+@job_bp.cli.command('worker')
+@click.option('--concurrency', type=int, default=None, help='Jobs run in parallel (default JOB_WORKER_CONCURRENCY)')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds between queue polls when idle')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty')
+def worker_command(concurrency, poll_interval, burst):
+    """Run queued jobs; start several workers to scale out"""
+    app = current_app._get_current_object()
+    worker = Worker(
+        app,
+        concurrency=concurrency or app.config.get('JOB_WORKER_CONCURRENCY', 4),
+        poll_interval=poll_interval
+    )
+    
+    def shutdown(signum, frame):
+        click.echo('Menghentikan worker setelah job yang berjalan selesai...')
+        worker.stop()
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    
+    click.echo(f'Worker {worker.name}: {worker.concurrency} thread, task: {", ".join(registered_tasks())}')
+    processed = worker.run(burst=burst)
+    click.echo(f'{processed} job diproses.')
+
+@job_bp.cli.command('enqueue')
+@click.argument('name')
+@click.option('--param', 'params', multiple=True, help='key=value, repeatable')
+def enqueue_command(name, params):
+    """Queue a job by task name"""
+    try:
+        values = dict(param.split('=', 1) for param in params)
+        job = enqueue(name, values)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Job {job.id} ({job.name}) diantrekan.')
+
+@job_bp.cli.command('status')
+@click.argument('job_id', type=int)
+def status_command(job_id):
+    """Show a job's status"""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        raise click.ClickException(f'Job {job_id} tidak ditemukan.')
+    
+    progress = f'{job.progress_done}/{job.progress_total or "?"}'
+    click.echo(f'Job {job.id} {job.name}: {job.status}, percobaan {job.attempts}/{job.max_attempts}, progres {progress}')
+    if job.message:
+        click.echo(job.message)
+    if job.error:
+        click.echo(f'Error: {job.error}')
+    if job.result is not None:
+        click.echo(f'Hasil: {job.result}')
\ No newline at end of file
@@ -0,0 +1,52 @@
+import io
+from flask import Response, abort, current_app, request
+from flask_login import current_user
+from services.metrics import metrics
+from . import metrics_bp
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    """Per-endpoint latency and SQL metrics in Prometheus format
+
+    With METRICS_TOKEN set a scraper sends it as a bearer token; without
+    one only a logged-in admin gets the metrics.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+    elif not current_user.is_authenticated or current_user.role != 'admin':
+        abort(401)
+    
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def _profile_view(view, **kwargs):
+    """Run a view under cProfile and return the hottest functions as text"""
+    import cProfile
+    import pstats
+    
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        current_app.make_response(view(**kwargs))
+    finally:
+        profiler.disable()
+    
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(60)
+    return Response(output.getvalue(), mimetype='text/plain')
+
+@metrics_bp.before_app_request
+def profile_request():
+    """?_profile=1 profiles the request instead of returning its page (admins only)
+
+    For anyone else the parameter is ignored and the page is served as usual.
+    """
+    if '_profile' not in request.args or not current_app.config.get('PROFILER_ENABLED'):
+        return None
+    
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None or not current_user.is_authenticated or current_user.role != 'admin':
+        return None
+    
+    return _profile_view(view, **request.view_args)
\ No newline at end of file
@@ -1,30 +1,159 @@
-from flask import Blueprint, jsonify, request
+from flask import request, jsonify, abort, current_app
+from flask_login import login_required
+from sqlalchemy.orm.exc import StaleDataError
+from models import db, Invoice, Payment, refresh_invoice_statuses, read_replica
+from services.cache import mark_written
+from services.pagination import keyset_paginate
+from services.query_counter import query_budget
+from services.payment_ingest import parse_payment, ingest_payments
+from . import conflict_response, payment_bp
+from .auth_routes import admin_required
 
-payment_routes = Blueprint('payment_routes', __name__)
+def _payment_to_dict(payment):
+    return {
+        'id': payment.id,
+        'invoice_id': payment.invoice_id,
+        'payment_date': payment.payment_date.isoformat(),
+        'amount': float(payment.amount),
+        'method': payment.method,
+        'note': payment.note,
+        'created_at': payment.created_at.isoformat()
+    }
 
-@payment_routes.route('/payments', methods=['GET'])
-def get_payments():
-    # Logic to fetch all payments
-    return jsonify({'message': 'Fetching all payments'}), 200
+def _request_data():
+    return request.get_json(silent=True) or request.form
 
-@payment_routes.route('/payments', methods=['POST'])
+def _commit_payment_change(invoice_ids):
+    """Refresh the affected invoices' status and commit"""
+    db.session.flush()
+    refresh_invoice_statuses(db.session.connection(), invoice_ids)
+    mark_written(db.session, Invoice)
+    db.session.commit()
+
+@payment_bp.route('/', methods=['GET'])
+@login_required
+@query_budget(2)
+@read_replica
+def list_payments():
+    """Cursor-paginated payments as JSON, optionally for one invoice"""
+    query = Payment.query
+    
+    invoice_id = request.args.get('invoice_id', type=int)
+    if invoice_id:
+        query = query.filter_by(invoice_id=invoice_id)
+    
+    try:
+        payments = keyset_paginate(
+            query,
+            Payment,
+            cursor=request.args.get('cursor'),
+            per_page=min(request.args.get('per_page', 50, type=int), 500)
+        )
+    except ValueError:
+        abort(400)
+    
+    return jsonify({
+        'items': [_payment_to_dict(payment) for payment in payments.items],
+        'next_cursor': payments.next_cursor,
+        'prev_cursor': payments.prev_cursor
+    })
+
+@payment_bp.route('/', methods=['POST'])
+@login_required
 def create_payment():
-    # Logic to create a new payment
-    payment_data = request.json
-    return jsonify({'message': 'Payment created', 'data': payment_data}), 201
+    """Record a payment against an invoice"""
+    values, errors = parse_payment(_request_data())
+    if errors:
+        return jsonify({'errors': errors}), 400
+    
+    Invoice.query.get_or_404(values['invoice_id'])
+    payment = Payment(**values)
+    
+    try:
+        db.session.add(payment)
+        _commit_payment_change({payment.invoice_id})
+    except StaleDataError:
+        return conflict_response()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'errors': [str(e)]}), 500
+    
+    return jsonify(_payment_to_dict(payment)), 201
 
-@payment_routes.route('/payments/<int:payment_id>', methods=['GET'])
+@payment_bp.route('/<int:payment_id>', methods=['GET'])
+@login_required
+@read_replica
 def get_payment(payment_id):
-    # Logic to fetch a single payment by ID
-    return jsonify({'message': 'Fetching payment', 'id': payment_id}), 200
+    """Get payment data as JSON"""
+    payment = Payment.query.get_or_404(payment_id)
+    return jsonify(_payment_to_dict(payment))
 
-@payment_routes.route('/payments/<int:payment_id>', methods=['PUT'])
+@payment_bp.route('/<int:payment_id>', methods=['PUT'])
+@login_required
+@admin_required
 def update_payment(payment_id):
-    # Logic to update payment by ID
-    payment_data = request.json
-    return jsonify({'message': 'Payment updated', 'id': payment_id, 'data': payment_data}), 200
+    """Update a payment; totals of the old and new invoice follow"""
+    payment = Payment.query.get_or_404(payment_id)
+    values, errors = parse_payment(_request_data(), partial=True)
+    if errors:
+        return jsonify({'errors': errors}), 400
+    
+    if 'invoice_id' in values:
+        Invoice.query.get_or_404(values['invoice_id'])
+    
+    old_invoice_id = payment.invoice_id
+    
+    try:
+        for field, value in values.items():
+            setattr(payment, field, value)
+        _commit_payment_change({old_invoice_id, payment.invoice_id})
+    except StaleDataError:
+        return conflict_response()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'errors': [str(e)]}), 500
+    
+    return jsonify(_payment_to_dict(payment))
 
-@payment_routes.route('/payments/<int:payment_id>', methods=['DELETE'])
+@payment_bp.route('/<int:payment_id>', methods=['DELETE'])
+@login_required
+@admin_required
 def delete_payment(payment_id):
-    # Logic to delete payment by ID
-    return jsonify({'message': 'Payment deleted', 'id': payment_id}), 204
+    """Delete a payment"""
+    payment = Payment.query.get_or_404(payment_id)
+    
+    try:
+        invoice_id = payment.invoice_id
+        db.session.delete(payment)
+        _commit_payment_change({invoice_id})
+    except StaleDataError:
+        return conflict_response()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'errors': [str(e)]}), 500
+    
+    return '', 204
+
+@payment_bp.route('/bulk', methods=['POST'])
+@login_required
+@admin_required
+def bulk_create_payments():
+    """Record a batch of payments (bank transfer / QRIS settlement files)"""
+    data = request.get_json(silent=True)
+    rows = data.get('payments') if isinstance(data, dict) else data
+    
+    if not isinstance(rows, list):
+        return jsonify({'errors': ['Body harus berupa daftar pembayaran.']}), 400
+    
+    max_rows = current_app.config.get('PAYMENT_BULK_MAX_ROWS', 50000)
+    if len(rows) > max_rows:
+        return jsonify({'errors': [f'Maksimal {max_rows} pembayaran per permintaan.']}), 413
+    
+    results = ingest_payments(rows)
+    created = sum(1 for result in results if result['status'] == 'created')
+    
+    return jsonify({
+        'created': created,
+        'failed': len(results) - created,
+        'results': results
+    })
\ No newline at end of file
@@ -0,0 +1,372 @@
+import click
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta
+from flask import Response, current_app, render_template, request, abort, jsonify, send_file, stream_with_context
+from flask_login import current_user, login_required
+from sqlalchemy import func, select
+from werkzeug.datastructures import MultiDict
+from models import db, Customer, Invoice, Payment, read_replica
+from services.aging import AGING_BUCKETS, compute_aging, read_aging_snapshot, snapshot_aging
+from services.jobs import enqueue, job_task
+from services.ledger import checkpoint_balances, customer_balance
+from services.query_counter import query_budget
+from services.statements import STATEMENT_FORMATS, build_statements, generate_statements, period_bounds, write_statement
+from . import report_bp
+from .auth_routes import admin_required
+from .job_routes import job_accepted, job_files_dir
+
+EXPORT_BATCH_SIZE = 1000
+
+def _date_arg(name, args=None):
+    """Parse an optional YYYY-MM-DD query argument, aborting with 400 if malformed"""
+    value = (request.args if args is None else args).get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        abort(400)
+
+def _export_invoices(args):
+    query = select(
+        Invoice.invoice_number,
+        Customer.name,
+        Invoice.date,
+        Invoice.due_date,
+        Invoice.description,
+        Invoice.amount,
+        Invoice.paid_total,
+        Invoice.remaining,
+        Invoice.status
+    ).join(Customer, Invoice.customer_id == Customer.id).order_by(Invoice.id)
+    
+    if args.get('status'):
+        query = query.where(Invoice.status == args['status'])
+    if args.get('customer_id', type=int):
+        query = query.where(Invoice.customer_id == args.get('customer_id', type=int))
+    
+    headers = ['No. Tagihan', 'Pelanggan', 'Tanggal', 'Jatuh Tempo', 'Keterangan',
+               'Nominal', 'Dibayar', 'Sisa', 'Status']
+    return headers, query
+
+def _export_payments(args):
+    query = select(
+        Payment.id,
+        Invoice.invoice_number,
+        Payment.payment_date,
+        Payment.amount,
+        Payment.method,
+        Payment.note
+    ).join(Invoice, Payment.invoice_id == Invoice.id).order_by(Payment.id)
+    
+    # Half-open [date_from, date_to) range on payment_date
+    date_from = _date_arg('date_from', args)
+    date_to = _date_arg('date_to', args)
+    if date_from:
+        query = query.where(Payment.payment_date >= date_from)
+    if date_to:
+        query = query.where(Payment.payment_date < date_to)
+    
+    headers = ['ID', 'No. Tagihan', 'Tanggal Bayar', 'Nominal', 'Metode', 'Catatan']
+    return headers, query
+
+def _export_customers(args):
+    query = select(
+        Customer.id,
+        Customer.name,
+        Customer.phone,
+        Customer.email,
+        Customer.address,
+        Customer.status,
+        Customer.created_at
+    ).order_by(Customer.id)
+    
+    if args.get('status'):
+        query = query.where(Customer.status == args['status'])
+    
+    headers = ['ID', 'Nama', 'HP', 'Email', 'Alamat', 'Status', 'Dibuat']
+    return headers, query
+
+EXPORTS = {
+    'invoices': _export_invoices,
+    'payments': _export_payments,
+    'customers': _export_customers
+}
+
+def _execute_streaming(query):
+    """Execute query on a server-side cursor, fetching EXPORT_BATCH_SIZE rows at a time"""
+    return db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+def _generate_csv(headers, result):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    writer.writerow(headers)
+    for rows in result.partitions():
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    
+    yield buffer.getvalue()
+
+def _xlsx_file(headers, result, output=None):
+    """Write rows into a write-only workbook, spooled to a temporary file unless output is a path"""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        abort(501, 'Ekspor XLSX membutuhkan paket openpyxl.')
+    
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(headers)
+    for rows in result.partitions():
+        for row in rows:
+            sheet.append(list(row))
+    
+    if output is not None:
+        workbook.save(output)
+        return output
+    
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+@report_bp.route('/export/<entity>.<fmt>')
+@login_required
+@admin_required
+@read_replica
+def export(entity, fmt):
+    """Stream invoices, payments or customers as CSV; XLSX is written to a temporary file, then sent"""
+    if entity not in EXPORTS or fmt not in ('csv', 'xlsx'):
+        abort(404)
+    
+    headers, query = EXPORTS[entity](request.args)
+    # Executed here rather than in the generator so the read replica is used
+    result = _execute_streaming(query)
+    filename = f'{entity}-{datetime.now().strftime("%Y%m%d-%H%M%S")}.{fmt}'
+    
+    if fmt == 'xlsx':
+        return send_file(
+            _xlsx_file(headers, result),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=filename
+        )
+    
+    return Response(
+        stream_with_context(_generate_csv(headers, result)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@report_bp.route('/export/<entity>.<fmt>/job', methods=['POST'])
+@login_required
+@admin_required
+def export_job(entity, fmt):
+    """Queue an export to a file; download it from the job once it has finished"""
+    if entity not in EXPORTS or fmt not in ('csv', 'xlsx'):
+        abort(404)
+    
+    EXPORTS[entity](request.args)  # validate the filters before queueing
+    job = enqueue('report.export', {
+        'entity': entity,
+        'fmt': fmt,
+        'args': request.args.to_dict()
+    }, created_by=current_user.id)
+    return job_accepted(job)
+
+@job_task('report.export')
+def export_job_task(job, entity, fmt, args):
+    """Write an export to JOB_FILES_DIR; progress counts rows written"""
+    headers, query = EXPORTS[entity](MultiDict(args))
+    total = db.session.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar()
+    result = _execute_streaming(query)
+    filename = f'{entity}-{job.id}-{datetime.now().strftime("%Y%m%d-%H%M%S")}.{fmt}'
+    path = os.path.join(job_files_dir(), filename)
+    
+    if fmt == 'xlsx':
+        _xlsx_file(headers, result, path)
+    else:
+        with open(path, 'w', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(headers)
+            written = 0
+            for rows in result.partitions():
+                writer.writerows(rows)
+                written += len(rows)
+                job.progress(written, total)
+    
+    return {'file': filename, 'rows': total}
+
+def _aging_report():
+    """Aging for ?date= (default today): live for today, from the snapshot for past dates"""
+    today = datetime.utcnow().date()
+    as_of = _date_arg('date')
+    as_of = as_of.date() if as_of else today
+    customer_id = request.args.get('customer_id', type=int)
+    
+    if as_of < today:
+        report = read_aging_snapshot(as_of, customer_id)
+        if report is None:
+            abort(404)
+        return as_of, report
+    
+    return as_of, compute_aging(as_of, customer_id, limit=request.args.get('limit', type=int))
+
+@report_bp.route('/aging')
+@login_required
+@read_replica
+def aging_report():
+    """Receivables aging report"""
+    as_of, (customers, totals) = _aging_report()
+    
+    return render_template(
+        'report/aging.html',
+        as_of=as_of,
+        buckets=AGING_BUCKETS,
+        customers=customers,
+        totals=totals
+    )
+
+@report_bp.route('/api/aging')
+@login_required
+@read_replica
+def aging_report_json():
+    """Receivables aging report as JSON"""
+    as_of, (customers, totals) = _aging_report()
+    
+    return jsonify({
+        'as_of': as_of.isoformat(),
+        'customers': customers,
+        'totals': totals
+    })
+
+@report_bp.route('/api/balance/<int:customer_id>')
+@login_required
+@read_replica
+def customer_balance_json(customer_id):
+    """What a customer owed at the end of ?date= (default: now), from the ledger"""
+    date = _date_arg('date')
+    balance = customer_balance(customer_id, date + timedelta(days=1) if date else None)
+    balance['balance'] = float(balance['balance'])
+    return jsonify(balance)
+
+@job_task('report.snapshot-aging')
+def snapshot_aging_job(job, date=None):
+    as_of = datetime.strptime(date, '%Y-%m-%d').date() if date else datetime.utcnow().date()
+    snapshot_aging(as_of)
+    return {'date': as_of.isoformat()}
+
+@report_bp.cli.command('snapshot-aging')
+@click.option('--date', 'as_of', type=click.DateTime(formats=['%Y-%m-%d']), help='Default: today (UTC)')
+def snapshot_aging_command(as_of):
+    """Store today's aging per customer (run nightly)"""
+    as_of = as_of.date() if as_of else datetime.utcnow().date()
+    snapshot_aging(as_of)
+    click.echo(f'Snapshot aging {as_of} tersimpan.')
+
+@job_task('report.checkpoint-balances')
+def checkpoint_balances_job(job, date=None):
+    return checkpoint_balances(datetime.strptime(date, '%Y-%m-%d') if date else None)
+
+@report_bp.cli.command('checkpoint-balances')
+@click.option('--date', 'as_of', type=click.DateTime(formats=['%Y-%m-%d']), help='Balance as of 00:00 of this day (default: today, UTC)')
+def checkpoint_balances_command(as_of):
+    """Checkpoint customer balances from the ledger (run nightly)"""
+    try:
+        stats = checkpoint_balances(as_of)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Checkpoint {stats['as_of']}: {stats['customers']} pelanggan diperbarui (entri s.d. #{stats['entries_to']}).")
+
+def statement_cache_dir():
+    path = current_app.config['STATEMENT_CACHE_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _statement_args():
+    """?period=YYYY-MM (default: last month) and ?format=html|pdf, aborting with 400 if invalid"""
+    today = datetime.utcnow().date()
+    default_period = f'{today.year - 1}-12' if today.month == 1 else f'{today.year}-{today.month - 1:02d}'
+    period = request.args.get('period') or default_period
+    fmt = request.args.get('format', 'html')
+    try:
+        period_bounds(period)
+    except ValueError:
+        abort(400)
+    if fmt not in STATEMENT_FORMATS:
+        abort(400)
+    return period, fmt
+
+@report_bp.route('/statement/<int:customer_id>')
+@login_required
+@query_budget(3)
+@read_replica
+def customer_statement(customer_id):
+    """Monthly statement of one customer: invoices, payments and running balance"""
+    period, fmt = _statement_args()
+    statement = build_statements([customer_id], period).get(customer_id)
+    if statement is None:
+        abort(404)
+    
+    try:
+        path, _ = write_statement(statement_cache_dir(), statement, fmt)
+    except RuntimeError as e:
+        abort(501, str(e))
+    
+    return send_file(
+        path,
+        mimetype='application/pdf' if fmt == 'pdf' else 'text/html',
+        as_attachment=fmt == 'pdf',
+        download_name=f'rekening-{customer_id}-{period}.{fmt}',
+        max_age=0
+    )
+
+@report_bp.route('/statements/job', methods=['POST'])
+@login_required
+@admin_required
+def statements_job():
+    """Queue statements for every customer with activity in ?period="""
+    period, fmt = _statement_args()
+    job = enqueue('report.statements', {'period': period, 'fmt': fmt}, created_by=current_user.id)
+    return job_accepted(job)
+
+@job_task('report.statements')
+def statements_job_task(job, period, fmt='pdf', customer_ids=None):
+    """Render statements into STATEMENT_CACHE_DIR; progress counts customers read"""
+    return generate_statements(
+        period,
+        statement_cache_dir(),
+        fmt=fmt,
+        customer_ids=customer_ids,
+        workers=current_app.config.get('STATEMENT_WORKERS') or None,
+        progress=job.progress
+    )
+
+@report_bp.cli.command('statements')
+@click.option('--period', required=True, help='YYYY-MM')
+@click.option('--format', 'fmt', type=click.Choice(STATEMENT_FORMATS), default='pdf', show_default=True)
+@click.option('--customer', 'customer_ids', type=int, multiple=True, help='Only these customers (repeatable)')
+@click.option('--workers', type=int, default=None, help='Render processes (default STATEMENT_WORKERS or one per CPU)')
+def statements_command(period, fmt, customer_ids, workers):
+    """Render monthly statements for all customers with activity"""
+    try:
+        stats = generate_statements(
+            period,
+            statement_cache_dir(),
+            fmt=fmt,
+            customer_ids=list(customer_ids) or None,
+            workers=workers or current_app.config.get('STATEMENT_WORKERS') or None,
+            progress=lambda done, total: click.echo(f'{done}/{total} pelanggan', err=True)
+        )
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+    click.echo(
+        f'{stats["statements"]} rekening koran {period}: {stats["rendered"]} dibuat, '
+        f'{stats["cached"]} dari cache ({stats["seconds"]} detik) di {statement_cache_dir()}'
+    )
\ No newline at end of file
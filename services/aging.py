@@ -0,0 +1,112 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_, case, func, insert, literal, select
+from models import db, AgingSnapshot, Customer, Invoice
+from .dashboard_stats import OPEN_STATUSES
+
+AGING_BUCKETS = ('current_amount', 'days_1_30', 'days_31_60', 'days_61_90', 'days_over_90')
+
+def _bucket_columns(as_of):
+    """SUM(remaining) per days-past-due bucket, as sargable due_date ranges"""
+    start = datetime.combine(as_of, time.min)
+    day_30 = start - timedelta(days=30)
+    day_60 = start - timedelta(days=60)
+    day_90 = start - timedelta(days=90)
+    due = Invoice.due_date
+    
+    def bucket(condition, name):
+        return func.coalesce(func.sum(case((condition, Invoice.remaining), else_=0)), 0).label(name)
+    
+    return [
+        bucket(due >= start, 'current_amount'),
+        bucket(and_(due < start, due >= day_30), 'days_1_30'),
+        bucket(and_(due < day_30, due >= day_60), 'days_31_60'),
+        bucket(and_(due < day_60, due >= day_90), 'days_61_90'),
+        bucket(due < day_90, 'days_over_90'),
+        func.coalesce(func.sum(Invoice.remaining), 0).label('total')
+    ]
+
+def aging_by_customer_query(as_of, customer_id=None):
+    """Grouped per-customer aging of open invoices"""
+    query = (
+        select(Invoice.customer_id, Customer.name, *_bucket_columns(as_of))
+        .join(Customer, Invoice.customer_id == Customer.id)
+        .where(Invoice.status.in_(OPEN_STATUSES))
+        .group_by(Invoice.customer_id, Customer.name)
+    )
+    if customer_id:
+        query = query.where(Invoice.customer_id == customer_id)
+    return query
+
+def aging_totals_query(as_of):
+    """Aging of all open invoices in one row"""
+    return select(*_bucket_columns(as_of)).where(Invoice.status.in_(OPEN_STATUSES))
+
+def _amounts(row):
+    """Bucket and total amounts of a row as Decimal, for writing back into Money columns"""
+    return {name: getattr(row, name) for name in AGING_BUCKETS + ('total',)}
+
+def _row_to_dict(row):
+    """Bucket and total amounts as float, for JSON"""
+    return {name: float(amount) for name, amount in _amounts(row).items()}
+
+def compute_aging(as_of, customer_id=None, limit=None):
+    """Live aging: (per-customer rows ordered by total, totals) as dicts"""
+    query = aging_by_customer_query(as_of, customer_id).order_by(func.sum(Invoice.remaining).desc())
+    if limit:
+        query = query.limit(limit)
+    
+    customers = [
+        dict(_row_to_dict(row), customer_id=row.customer_id, name=row.name)
+        for row in db.session.execute(query)
+    ]
+    totals = _row_to_dict(db.session.execute(aging_totals_query(as_of)).one())
+    return customers, totals
+
+def snapshot_aging(as_of):
+    """Materialize the aging as of a date into aging_snapshots; replaces an existing snapshot"""
+    columns = ['snapshot_date', 'customer_id', *AGING_BUCKETS, 'total', 'created_at']
+    now = datetime.utcnow()
+    
+    db.session.execute(AgingSnapshot.__table__.delete().where(AgingSnapshot.snapshot_date == as_of))
+    
+    per_customer = aging_by_customer_query(as_of).subquery()
+    db.session.execute(
+        insert(AgingSnapshot.__table__).from_select(
+            columns,
+            select(
+                literal(as_of, AgingSnapshot.snapshot_date.type),
+                per_customer.c.customer_id,
+                *[per_customer.c[name] for name in AGING_BUCKETS],
+                per_customer.c.total,
+                literal(now, AgingSnapshot.created_at.type)
+            )
+        )
+    )
+    
+    totals = db.session.execute(aging_totals_query(as_of)).one()
+    db.session.execute(
+        insert(AgingSnapshot.__table__),
+        [dict(_amounts(totals), snapshot_date=as_of, customer_id=None, created_at=now)]
+    )
+    db.session.commit()
+
+def read_aging_snapshot(as_of, customer_id=None):
+    """Stored aging for a date: (per-customer rows, totals), or None if not snapshotted"""
+    totals = AgingSnapshot.query.filter_by(snapshot_date=as_of, customer_id=None).first()
+    if totals is None:
+        return None
+    
+    query = (
+        db.session.query(AgingSnapshot, Customer.name)
+        .join(Customer, AgingSnapshot.customer_id == Customer.id)
+        .filter(AgingSnapshot.snapshot_date == as_of)
+        .order_by(AgingSnapshot.total.desc())
+    )
+    if customer_id:
+        query = query.filter(AgingSnapshot.customer_id == customer_id)
+    
+    customers = [
+        dict(_row_to_dict(snapshot), customer_id=snapshot.customer_id, name=name)
+        for snapshot, name in query
+    ]
+    return customers, _row_to_dict(totals)
@@ -0,0 +1,49 @@
+from flask import current_app
+from flask_login import LoginManager
+from sqlalchemy import select
+from sqlalchemy.orm import make_transient_to_detached
+from models import db, User
+from .cache import TTLCache, invalidate_on_write
+
+# Cleared on every committed User write (registration, password change,
+# role/is_active edits, rehash on login); other processes see changes after the TTL
+_user_cache = invalidate_on_write(TTLCache(ttl=60), User)
+
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+login_manager.login_message = 'Silakan login terlebih dahulu.'
+login_manager.login_message_category = 'warning'
+
+def _load_user_row(user_id):
+    """Detached User without password_hash, safe to share between requests"""
+    row = db.session.execute(
+        select(User.id, User.name, User.email, User.role, User.is_active, User.created_at)
+        .where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    
+    user = User(**row._asdict())
+    make_transient_to_detached(user)
+    return user
+
+@login_manager.user_loader
+def load_user(user_id):
+    """Session user, cached for USER_CACHE_TTL seconds; inactive users are logged out"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    
+    ttl = current_app.config.get('USER_CACHE_TTL', 60)
+    if ttl > 0:
+        user = _user_cache.get_or_set(user_id, lambda: _load_user_row(user_id), ttl)
+    else:
+        user = _load_user_row(user_id)
+    if user is None or not user.is_active:
+        return None
+    return user
+
+def init_login(app):
+    """Attach the cached user loader to app"""
+    login_manager.init_app(app)
@@ -0,0 +1,104 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from models import db, Customer, Invoice, InvoiceSequence, overdue_cutoff, post_invoice_entries, to_money
+from .cache import mark_written
+
+def reserve_sequence(name, count):
+    """Reserve count consecutive values of a named sequence; return the first one"""
+    sequences = InvoiceSequence.__table__
+    
+    # The relative UPDATE row-locks the counter until commit, so blocks never overlap
+    result = db.session.execute(
+        sequences.update()
+        .where(sequences.c.name == name)
+        .values(next_value=sequences.c.next_value + count)
+    )
+    if result.rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(sequences).values(name=name, next_value=1 + count))
+            return 1
+        except IntegrityError:
+            # Created concurrently; retry as an update
+            return reserve_sequence(name, count)
+    
+    next_value = db.session.execute(
+        select(sequences.c.next_value).where(sequences.c.name == name)
+    ).scalar_one()
+    return next_value - count
+
+def billing_invoice_number(period, sequence):
+    return f'INV-{period.replace("-", "")}-{sequence:06d}'
+
+def run_billing(period, amount, description=None, due_days=14, customer_status='active',
+                customer_ids=None, chunk_size=1000, progress=None):
+    """Issue one invoice per matching customer for a YYYY-MM billing period"""
+    # Invoices are dated on the first of the period, whenever the run happens,
+    # so the period's statement (/report/statement/<id>?period=) lists them.
+    # Customers are processed in id order, one committed chunk at a time.
+    # Customers already invoiced for the period are skipped, so an interrupted
+    # or repeated run picks up where it stopped without duplicates.
+    period_start = datetime.strptime(period, '%Y-%m')
+    amount = to_money(amount)
+    due_date = period_start + timedelta(days=due_days)
+    overdue = due_date < overdue_cutoff()
+    stats = {'period': period, 'created': 0, 'skipped': 0}
+    started = time.perf_counter()
+    last_id = 0
+    
+    while True:
+        query = select(Customer.id).where(Customer.id > last_id).order_by(Customer.id).limit(chunk_size)
+        if customer_status:
+            query = query.where(Customer.status == customer_status)
+        if customer_ids is not None:
+            query = query.where(Customer.id.in_(customer_ids))
+        
+        chunk = db.session.execute(query).scalars().all()
+        if not chunk:
+            break
+        last_id = chunk[-1]
+        
+        billed = set(db.session.execute(
+            select(Invoice.customer_id).where(
+                Invoice.billing_period == period,
+                Invoice.customer_id.in_(chunk)
+            )
+        ).scalars())
+        to_bill = [customer_id for customer_id in chunk if customer_id not in billed]
+        stats['skipped'] += len(billed)
+        
+        if to_bill:
+            now = datetime.utcnow()
+            first = reserve_sequence(f'billing-{period}', len(to_bill))
+            db.session.execute(insert(Invoice.__table__), [{
+                'invoice_number': billing_invoice_number(period, first + offset),
+                'customer_id': customer_id,
+                'date': period_start,
+                'due_date': due_date,
+                'description': description,
+                'amount': amount,
+                'paid_total': 0,
+                'remaining': amount,
+                'status': 'unpaid',
+                'is_overdue': overdue,
+                'overdue_since': due_date if overdue else None,
+                'billing_period': period,
+                'created_at': now
+            } for offset, customer_id in enumerate(to_bill)])
+            post_invoice_entries(
+                db.session.connection(),
+                Invoice.__table__.c.billing_period == period,
+                Invoice.__table__.c.customer_id.in_(to_bill)
+            )
+            mark_written(db.session, Invoice)
+        
+        db.session.commit()
+        stats['created'] += len(to_bill)
+        if progress:
+            progress(stats)
+    
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    stats['per_second'] = round(stats['created'] / stats['seconds'], 1) if stats['seconds'] else None
+    return stats
@@ -0,0 +1,82 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe in-process cache whose entries expire after a TTL (seconds)"""
+    
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+    
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+    
+    def get_or_set(self, key, factory, ttl=None):
+        """Return the cached value for key, computing it with factory() on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+    
+    def invalidate(self, key=_MISSING):
+        """Drop one key, or every entry when no key is given"""
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+# Caches cleared after a commit that wrote one of their models
+_invalidation_rules = []
+
+def invalidate_on_write(cache, *models):
+    """Register cache to be cleared whenever a commit writes any of models"""
+    _invalidation_rules.append((cache, models))
+    return cache
+
+def mark_written(session, *models):
+    """Record writes done outside the unit of work (bulk or Core statements)"""
+    session.info.setdefault('written_models', set()).update(models)
+
+@event.listens_for(Session, 'after_flush')
+def _record_written_models(session, flush_context):
+    written = {type(obj) for obj in session.new}
+    written.update(type(obj) for obj in session.dirty)
+    written.update(type(obj) for obj in session.deleted)
+    if written:
+        mark_written(session, *written)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_written_models(session):
+    written = session.info.pop('written_models', None)
+    if not written:
+        return
+    
+    for cache, models in _invalidation_rules:
+        if any(issubclass(model, models) for model in written):
+            cache.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_written_models(session):
+    session.info.pop('written_models', None)
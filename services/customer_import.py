@@ -0,0 +1,116 @@
+import csv
+import time
+from sqlalchemy import insert, select
+from models import db, Customer, normalize_email, normalize_phone
+from .cache import mark_written
+
+CUSTOMER_STATUSES = ('active', 'inactive')
+
+# CSV header -> column; the Indonesian headers match /report/export/customers.csv
+HEADER_ALIASES = {
+    'name': 'name', 'nama': 'name',
+    'phone': 'phone', 'hp': 'phone',
+    'email': 'email',
+    'address': 'address', 'alamat': 'address',
+    'status': 'status'
+}
+REQUIRED_COLUMNS = ('name', 'phone', 'email')
+
+def _column_map(fieldnames):
+    """Map CSV headers to columns; raise ValueError when a required column is missing"""
+    mapping = {}
+    for header in fieldnames or ():
+        column = HEADER_ALIASES.get((header or '').strip().lower())
+        if column and column not in mapping.values():
+            mapping[header] = column
+    
+    missing = [column for column in REQUIRED_COLUMNS if column not in mapping.values()]
+    if missing:
+        raise ValueError(f'Kolom wajib tidak ada: {", ".join(missing)}.')
+    return mapping
+
+def parse_customer(data):
+    """Validate customer fields from a mapping; return (values, errors)"""
+    values = {column: (data.get(column) or '').strip() for column in HEADER_ALIASES.values()}
+    errors = []
+    
+    if not values['name'] or not values['phone'] or not values['email']:
+        errors.append('Nama, HP, dan Email harus diisi.')
+    if len(values['name']) > 120 or len(values['email']) > 120 or len(values['phone']) > 20:
+        errors.append('Nama/Email maksimal 120 karakter, HP maksimal 20 karakter.')
+    if values['email'] and ('@' not in values['email'] or ' ' in values['email']):
+        errors.append('Format email tidak valid.')
+    
+    values['status'] = values['status'].lower() or 'active'
+    if values['status'] not in CUSTOMER_STATUSES:
+        errors.append(f'Status harus salah satu dari: {", ".join(CUSTOMER_STATUSES)}.')
+    
+    values['address'] = values['address'] or None
+    return values, errors
+
+def _existing_emails():
+    """Normalized emails of all customers, loaded once per import"""
+    return {normalize_email(email) for email in db.session.execute(select(Customer.email)).scalars()}
+
+def import_customers(stream, chunk_size=1000, dry_run=False, max_errors=1000, on_error=None, progress=None):
+    """Stream customers from a CSV text stream into the database in committed chunks
+
+    Memory stays constant apart from the set of known emails: rows are read,
+    validated and inserted one chunk at a time. Rows whose email already exists
+    (in the table or earlier in the file) are counted as duplicates, not
+    failed, so a rerun after an interruption skips what was already
+    imported. Both are listed in errors. Only the
+    first max_errors errors are kept in the result; on_error(error) sees all.
+    """
+    started = time.perf_counter()
+    reader = csv.DictReader(stream)
+    mapping = _column_map(reader.fieldnames)
+    known_emails = _existing_emails()
+    stats = {'rows': 0, 'created': 0, 'duplicates': 0, 'failed': 0, 'dry_run': dry_run, 'errors': []}
+    chunk = []
+    
+    def report(line, errors, duplicate=False):
+        error = {'line': line, 'errors': errors}
+        stats['duplicates' if duplicate else 'failed'] += 1
+        if len(stats['errors']) < max_errors:
+            stats['errors'].append(error)
+        if on_error:
+            on_error(error)
+    
+    def flush():
+        if chunk and not dry_run:
+            try:
+                db.session.execute(insert(Customer.__table__), chunk)
+                mark_written(db.session, Customer)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        stats['created'] += len(chunk)
+        chunk.clear()
+        if progress:
+            progress(stats)
+    
+    for row in reader:
+        stats['rows'] += 1
+        values, errors = parse_customer({column: row.get(header) for header, column in mapping.items()})
+        if errors:
+            report(reader.line_num, errors)
+            continue
+        
+        email_key = normalize_email(values['email'])
+        if email_key in known_emails:
+            report(reader.line_num, ['Email sudah terdaftar.'], duplicate=True)
+            continue
+        known_emails.add(email_key)
+        
+        values['email_normalized'] = email_key
+        values['phone_normalized'] = normalize_phone(values['phone'])
+        chunk.append(values)
+        if len(chunk) >= chunk_size:
+            flush()
+    
+    flush()
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    stats['per_second'] = round(stats['rows'] / stats['seconds'], 1) if stats['seconds'] else None
+    return stats
\ No newline at end of file
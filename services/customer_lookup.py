@@ -0,0 +1,33 @@
+from flask import current_app
+from sqlalchemy import select
+from models import db, Customer
+from .cache import TTLCache, invalidate_on_write
+from .query_utils import escape_like
+
+_active_customers = invalidate_on_write(TTLCache(ttl=300), Customer)
+
+def active_customer_choices():
+    """(id, name) rows of active customers, cached until a customer is written"""
+    ttl = current_app.config.get('CUSTOMER_LOOKUP_CACHE_TTL', 300)
+    return _active_customers.get_or_set('active', _load_active_customers, ttl)
+
+def _load_active_customers():
+    return db.session.execute(
+        select(Customer.id, Customer.name)
+        .where(Customer.status == 'active')
+        .order_by(Customer.name)
+    ).all()
+
+def search_customer_names(prefix, limit=10, active_only=False):
+    """(id, name) rows of customers whose name starts with prefix"""
+    query = (
+        select(Customer.id, Customer.name)
+        .where(Customer.name.like(f'{escape_like(prefix)}%', escape='\\'))
+        .order_by(Customer.name)
+        .limit(limit)
+    )
+    
+    if active_only:
+        query = query.where(Customer.status == 'active')
+    
+    return db.session.execute(query).all()
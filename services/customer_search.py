@@ -0,0 +1,73 @@
+import re
+from flask import current_app
+from sqlalchemy import literal_column, or_, select, table, text
+from models import Customer, normalize_email, normalize_phone
+from .query_utils import escape_like
+
+_PHONE_TERM = re.compile(r'^[\d\s+().-]+$')
+
+def _contact_matches(term):
+    """Exact/prefix conditions on the normalized phone and email columns"""
+    conditions = []
+    
+    digits = normalize_phone(term)
+    if len(digits) >= 4 and _PHONE_TERM.match(term):
+        conditions.append(Customer.phone_normalized.like(f'{digits}%'))
+    
+    if '@' in term:
+        email = escape_like(normalize_email(term))
+        conditions.append(Customer.email_normalized.like(f'{email}%', escape='\\'))
+    
+    return conditions
+
+class LikeSearchBackend:
+    """Substring ILIKE over name, email and phone; works everywhere but scans the table"""
+    
+    def filter(self, query, term):
+        pattern = f'%{term}%'
+        return query.filter(or_(
+            Customer.name.ilike(pattern),
+            Customer.email.ilike(pattern),
+            Customer.phone.ilike(pattern)
+        ))
+
+class SQLiteFTSSearchBackend(LikeSearchBackend):
+    """FTS5 trigram table (customers_fts); substring semantics for terms of 3+ characters"""
+    min_length = 3
+    
+    def filter(self, query, term):
+        if len(term) < self.min_length:
+            return super().filter(query, term)
+        
+        phrase = '"' + term.replace('"', '""') + '"'
+        matches = (
+            select(literal_column('rowid'))
+            .select_from(table('customers_fts'))
+            .where(text('customers_fts MATCH :search_phrase').bindparams(search_phrase=phrase))
+        )
+        return query.filter(or_(Customer.id.in_(matches), *_contact_matches(term)))
+
+class MySQLFulltextSearchBackend(LikeSearchBackend):
+    """n-gram FULLTEXT phrase search; substring semantics for terms of 2+ characters"""
+    min_length = 2
+    
+    def filter(self, query, term):
+        if len(term) < self.min_length:
+            return super().filter(query, term)
+        
+        phrase = '"' + term.replace('"', ' ') + '"'
+        match = text(
+            'MATCH (customers.name, customers.email, customers.phone) '
+            'AGAINST (:search_phrase IN BOOLEAN MODE)'
+        ).bindparams(search_phrase=phrase)
+        return query.filter(or_(match, *_contact_matches(term)))
+
+SEARCH_BACKENDS = {
+    'like': LikeSearchBackend,
+    'fts5': SQLiteFTSSearchBackend,
+    'fulltext': MySQLFulltextSearchBackend
+}
+
+def get_search_backend():
+    """Search backend selected by CUSTOMER_SEARCH_BACKEND"""
+    return SEARCH_BACKENDS[current_app.config.get('CUSTOMER_SEARCH_BACKEND', 'like')]()
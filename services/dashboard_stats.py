@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, select, true
+from models import db, Customer, Invoice, Payment, to_money
+from .cache import TTLCache, invalidate_on_write
+
+OPEN_STATUSES = ('unpaid', 'partial')
+
+_stats_cache = invalidate_on_write(TTLCache(), Customer, Invoice, Payment)
+
+def month_bounds(day):
+    """Return the half-open [first day, first day of next month) range of day's month"""
+    first_day = datetime(day.year, day.month, 1)
+    next_month = (first_day + timedelta(days=32)).replace(day=1)
+    return first_day, next_month
+
+def compute_dashboard_stats(today):
+    """Compute the dashboard counters with two aggregate queries; amounts stay Decimal"""
+    first_day, next_month = month_bounds(today)
+    
+    # Query 1: per-status invoice counts and outstanding amount
+    status_rows = db.session.execute(
+        select(
+            Invoice.status,
+            func.count(Invoice.id),
+            func.coalesce(func.sum(Invoice.remaining), 0)
+        ).group_by(Invoice.status)
+    ).all()
+    
+    total_invoices = 0
+    unpaid_invoices = 0
+    total_unpaid = to_money(0)
+    for status, count, remaining in status_rows:
+        total_invoices += count
+        if status in OPEN_STATUSES:
+            unpaid_invoices += count
+            total_unpaid += remaining
+    
+    # Query 2: customer count, overdue count (indexed flag, see services.overdue) and this month's activity
+    total_customers, overdue_invoices, monthly_invoices, monthly_payments = db.session.execute(
+        select(
+            select(func.count(Customer.id)).scalar_subquery(),
+            select(func.count(Invoice.id)).where(Invoice.is_overdue == true()).scalar_subquery(),
+            select(func.count(Invoice.id)).where(
+                Invoice.date >= first_day,
+                Invoice.date < next_month
+            ).scalar_subquery(),
+            select(func.coalesce(func.sum(Payment.amount), 0)).where(
+                Payment.payment_date >= first_day,
+                Payment.payment_date < next_month
+            ).scalar_subquery()
+        )
+    ).one()
+    
+    return {
+        'total_customers': total_customers,
+        'total_invoices': total_invoices,
+        'monthly_invoices': monthly_invoices,
+        'monthly_payments': monthly_payments,
+        'unpaid_invoices': unpaid_invoices,
+        'total_unpaid': total_unpaid,
+        'overdue_invoices': overdue_invoices
+    }
+
+def get_dashboard_stats():
+    """Return dashboard counters, cached for DASHBOARD_CACHE_TTL seconds"""
+    today = datetime.utcnow().date()
+    ttl = current_app.config.get('DASHBOARD_CACHE_TTL', 30)
+    stats = _stats_cache.get_or_set(today, lambda: compute_dashboard_stats(today), ttl)
+    return dict(stats)
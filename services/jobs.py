@@ -0,0 +1,264 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from models import db, Job
+
+logger = logging.getLogger(__name__)
+
+# Task name -> callable(job, **params); see job_task
+_tasks = {}
+
+def job_task(name):
+    """Register a function as a background task: fn(job, **params) -> JSON-serializable result"""
+    def decorator(f):
+        _tasks[name] = f
+        return f
+    return decorator
+
+def registered_tasks():
+    return sorted(_tasks)
+
+def enqueue(name, params=None, max_attempts=None, run_after=None, created_by=None):
+    """Queue a registered task and commit; returns the Job"""
+    if name not in _tasks:
+        raise ValueError(f'Unknown job task: {name}')
+    
+    job = Job(
+        name=name,
+        params=params or {},
+        max_attempts=max_attempts or current_app.config.get('JOB_MAX_ATTEMPTS', 3),
+        run_after=run_after or datetime.utcnow(),
+        created_by=created_by
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'name': job.name,
+        'params': job.params,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'progress': {'done': job.progress_done, 'total': job.progress_total, 'percent': job.percent},
+        'message': job.message,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+class JobContext:
+    """Handle passed to a running task for progress reporting"""
+    
+    def __init__(self, job_id, min_interval=1.0):
+        self.id = job_id
+        self.min_interval = min_interval
+        self._last_report = 0.0
+    
+    def progress(self, done, total=None, message=None, force=False):
+        """Record progress on its own connection, so it is visible before the task commits
+
+        SQLite locks the whole database: a second connection cannot commit
+        while the task's connection still reads (yield_per exports). There
+        the UPDATE goes through the task's session instead and becomes
+        visible with the task's next commit.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_report < self.min_interval and (total is None or done < total):
+            return
+        self._last_report = now
+        
+        values = {'progress_done': done, 'heartbeat_at': datetime.utcnow()}
+        if total is not None:
+            values['progress_total'] = total
+        if message is not None:
+            values['message'] = message[:255]
+        update = Job.__table__.update().where(Job.__table__.c.id == self.id).values(**values)
+        if not _row_locking(db.engine):
+            db.session.execute(update)
+            return
+        with db.engine.begin() as connection:
+            connection.execute(update)
+
+def _row_locking(engine):
+    """Whether writers lock rows, not the database (so a second connection can commit)"""
+    return engine.dialect.name != 'sqlite'
+
+def _update_job(job_id, **values):
+    jobs = Job.__table__
+    db.session.execute(jobs.update().where(jobs.c.id == job_id).values(**values))
+    db.session.commit()
+
+def claim_next(worker, batch=10):
+    """Atomically move one due queued job to running for worker; returns its id or None"""
+    jobs = Job.__table__
+    now = datetime.utcnow()
+    candidates = db.session.execute(
+        select(jobs.c.id)
+        .where(jobs.c.status == 'queued', jobs.c.run_after <= now)
+        .order_by(jobs.c.run_after, jobs.c.id)
+        .limit(batch)
+    ).scalars().all()
+    
+    for job_id in candidates:
+        # The status condition makes the claim a compare-and-set: of several
+        # workers racing for the same row exactly one UPDATE matches
+        result = db.session.execute(
+            jobs.update()
+            .where(jobs.c.id == job_id, jobs.c.status == 'queued')
+            .values(
+                status='running',
+                worker=worker,
+                attempts=jobs.c.attempts + 1,
+                started_at=now,
+                heartbeat_at=now,
+                error=None
+            )
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return job_id
+    return None
+
+def requeue_stale_jobs(stale_after):
+    """Return running jobs whose worker stopped sending heartbeats to the queue
+
+    A job that has used up its attempts is failed instead, so a task that
+    kills its worker is not retried forever. Returns (requeued, failed).
+    """
+    jobs = Job.__table__
+    now = datetime.utcnow()
+    stale = (jobs.c.status == 'running', jobs.c.heartbeat_at < now - timedelta(seconds=stale_after))
+    requeued = db.session.execute(
+        jobs.update()
+        .where(*stale, jobs.c.attempts < jobs.c.max_attempts)
+        .values(status='queued', worker=None, message='Dijadwalkan ulang: worker tidak merespons.')
+    )
+    failed = db.session.execute(
+        jobs.update()
+        .where(*stale)
+        .values(
+            status='failed',
+            worker=None,
+            message='Gagal: worker tidak merespons dan batas percobaan tercapai.',
+            error='Worker stopped sending heartbeats on the last attempt',
+            finished_at=now
+        )
+    )
+    db.session.commit()
+    return requeued.rowcount, failed.rowcount
+
+def run_job(job_id):
+    """Execute a claimed job in the current app context and record the outcome"""
+    job = db.session.get(Job, job_id)
+    name, params = job.name, job.params or {}
+    attempts, max_attempts = job.attempts, job.max_attempts
+    task = _tasks.get(name)
+    
+    try:
+        if task is None:
+            raise LookupError(f'Unknown job task: {name}')
+        result = task(JobContext(job_id), **params)
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Job %s (%s) failed on attempt %s', job_id, name, attempts)
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        
+        if task is not None and attempts < max_attempts:
+            delay = current_app.config.get('JOB_RETRY_DELAY', 30) * 2 ** (attempts - 1)
+            _update_job(
+                job_id,
+                status='queued',
+                worker=None,
+                error=error,
+                run_after=datetime.utcnow() + timedelta(seconds=delay)
+            )
+        else:
+            _update_job(job_id, status='failed', error=error, finished_at=datetime.utcnow())
+        return False
+    
+    _update_job(job_id, status='succeeded', result=result, finished_at=datetime.utcnow())
+    return True
+
+def _heartbeat(job_ids):
+    jobs = Job.__table__
+    db.session.execute(
+        jobs.update()
+        .where(jobs.c.id.in_(job_ids), jobs.c.status == 'running')
+        .values(heartbeat_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+class Worker:
+    """Poll the jobs table and run claimed jobs on a thread pool
+
+    Claims are atomic, so any number of worker processes can share one queue.
+    """
+    
+    def __init__(self, app, concurrency=4, poll_interval=1.0, stale_after=None, name=None):
+        self.app = app
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after or app.config.get('JOB_STALE_AFTER', 600)
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self._stopping = threading.Event()
+    
+    def stop(self):
+        """Finish the running jobs, then return from run()"""
+        self._stopping.set()
+    
+    def _run_in_context(self, job_id):
+        with self.app.app_context():
+            return run_job(job_id)
+    
+    def run(self, burst=False):
+        """Process jobs until stop(); with burst, return once the queue is drained"""
+        running = {}
+        processed = 0
+        
+        with self.app.app_context(), ThreadPoolExecutor(self.concurrency, thread_name_prefix='job') as executor:
+            while True:
+                for future in [future for future in running if future.done()]:
+                    running.pop(future)
+                    processed += 1
+                
+                claimed = failed = False
+                try:
+                    if running:
+                        # Keep our jobs from being taken for stale by other workers
+                        _heartbeat(list(running.values()))
+                    requeue_stale_jobs(self.stale_after)
+                    
+                    while not self._stopping.is_set() and len(running) < self.concurrency:
+                        job_id = claim_next(self.name)
+                        if job_id is None:
+                            break
+                        claimed = True
+                        running[executor.submit(self._run_in_context, job_id)] = job_id
+                except DBAPIError as e:
+                    # Database locked (SQLite) or unreachable: keep the running jobs, retry next poll
+                    db.session.rollback()
+                    logger.warning('Job queue housekeeping failed, retrying in %ss: %s', self.poll_interval, e)
+                    failed = True
+                
+                if not running and (self._stopping.is_set() or (burst and not claimed and not failed)):
+                    break
+                
+                if running:
+                    wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                elif not claimed:
+                    self._stopping.wait(self.poll_interval)
+        
+        return processed
\ No newline at end of file
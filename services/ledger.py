@@ -0,0 +1,179 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import and_, case, func, insert, literal, or_, select, type_coerce, union_all
+from models import db, BalanceCheckpoint, Invoice, LedgerEntry, Money, post_invoice_entries, post_payment_entries
+
+def backfill_ledger():
+    """Creation entries for invoices and payments that predate the ledger (or were bulk loaded)"""
+    connection = db.session.connection()
+    invoices = post_invoice_entries(connection)
+    payments = post_payment_entries(connection)
+    db.session.commit()
+    return {'invoices': invoices, 'payments': payments}
+
+def _net(column_a, column_b):
+    # Arithmetic on Money columns yields plain integers (cents); keep the Money type
+    return type_coerce(column_a - column_b, Money)
+
+def _last_run():
+    """The latest checkpoint run (its customer_id NULL marker row), or None"""
+    return db.session.execute(
+        select(BalanceCheckpoint)
+        .where(BalanceCheckpoint.customer_id.is_(None))
+        .order_by(BalanceCheckpoint.as_of.desc())
+        .limit(1)
+    ).scalar()
+
+def _latest_balances(customer_ids, chunk_size=500):
+    """{customer_id: balance} of each customer's newest checkpoint"""
+    balances = {}
+    customer_ids = list(customer_ids)
+    for start in range(0, len(customer_ids), chunk_size):
+        chunk = customer_ids[start:start + chunk_size]
+        newest = (
+            select(BalanceCheckpoint.customer_id, func.max(BalanceCheckpoint.as_of).label('as_of'))
+            .where(BalanceCheckpoint.customer_id.in_(chunk))
+            .group_by(BalanceCheckpoint.customer_id)
+            .subquery()
+        )
+        balances.update(db.session.execute(
+            select(BalanceCheckpoint.customer_id, BalanceCheckpoint.balance).join(newest, and_(
+                BalanceCheckpoint.customer_id == newest.c.customer_id,
+                BalanceCheckpoint.as_of == newest.c.as_of
+            ))
+        ).all())
+    return balances
+
+def checkpoint_balances(as_of=None):
+    """Checkpoint the balance as of a moment (default: start of today, UTC) for customers with new entries
+
+    Reads only the entries since the previous run: those effective in
+    [previous as_of, as_of), plus late ones (id above the previous run's last
+    entry) effective before the previous as_of. Customers without such entries
+    keep their older checkpoint, which is still their balance.
+    """
+    as_of = as_of or datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    previous = _last_run()
+    if previous is not None and as_of <= previous.as_of:
+        if as_of == previous.as_of:
+            return {'as_of': as_of.isoformat(), 'customers': 0, 'entries_to': previous.last_entry_id}
+        raise ValueError(f'Checkpoint {as_of} is older than the last one ({previous.as_of}).')
+    
+    # Entries appended while this runs are left to the next run as late entries
+    last_entry_id = db.session.execute(select(func.coalesce(func.max(LedgerEntry.id), 0))).scalar()
+    delta_sources = [
+        select(LedgerEntry.customer_id, _net(LedgerEntry.debit, LedgerEntry.credit).label('amount'))
+        .where(LedgerEntry.id <= last_entry_id, LedgerEntry.effective_at < as_of)
+    ]
+    if previous is not None:
+        window, late = delta_sources[0], delta_sources[0]
+        delta_sources = [
+            window.where(LedgerEntry.effective_at >= previous.as_of),
+            late.where(LedgerEntry.id > previous.last_entry_id, LedgerEntry.effective_at < previous.as_of)
+        ]
+    
+    entries = union_all(*delta_sources).subquery()
+    deltas = dict(db.session.execute(
+        select(entries.c.customer_id, func.sum(entries.c.amount)).group_by(entries.c.customer_id)
+    ).all())
+    
+    balances = _latest_balances(deltas)
+    now = datetime.utcnow()
+    rows = [{
+        'customer_id': customer_id,
+        'as_of': as_of,
+        'balance': balances.get(customer_id, Decimal(0)) + delta,
+        'last_entry_id': last_entry_id,
+        'created_at': now
+    } for customer_id, delta in deltas.items()]
+    rows.append({
+        'customer_id': None,
+        'as_of': as_of,
+        'balance': (previous.balance if previous is not None else Decimal(0)) + sum(deltas.values(), Decimal(0)),
+        'last_entry_id': last_entry_id,
+        'created_at': now
+    })
+    
+    for start in range(0, len(rows), 1000):
+        db.session.execute(insert(BalanceCheckpoint), rows[start:start + 1000])
+    db.session.commit()
+    return {'as_of': as_of.isoformat(), 'customers': len(deltas), 'entries_to': last_entry_id}
+
+def customer_balance(customer_id, at=None):
+    """What the customer owed at a moment (default now): one checkpoint plus the entries after it"""
+    at = at or datetime.utcnow()
+    checkpoint = db.session.execute(
+        select(BalanceCheckpoint)
+        .where(BalanceCheckpoint.customer_id == customer_id, BalanceCheckpoint.as_of <= at)
+        .order_by(BalanceCheckpoint.as_of.desc())
+        .limit(1)
+    ).scalar()
+    
+    entries = select(_net(LedgerEntry.debit, LedgerEntry.credit).label('amount')).where(
+        LedgerEntry.customer_id == customer_id,
+        LedgerEntry.effective_at < at
+    )
+    if checkpoint is not None:
+        # Two sargable ranges: the window after the checkpoint and late entries before it
+        entries = union_all(
+            entries.where(LedgerEntry.effective_at >= checkpoint.as_of),
+            entries.where(LedgerEntry.id > checkpoint.last_entry_id, LedgerEntry.effective_at < checkpoint.as_of)
+        )
+    entries = entries.subquery()
+    amount, count = db.session.execute(
+        select(func.coalesce(func.sum(entries.c.amount), literal(0, Money)), func.count())
+    ).one()
+    balance = amount + (checkpoint.balance if checkpoint is not None else 0)
+    
+    return {
+        'customer_id': customer_id,
+        'at': at.isoformat(),
+        'balance': balance,
+        'checkpoint': checkpoint.as_of.isoformat() if checkpoint is not None else None,
+        'entries_read': count
+    }
+
+def check_invoice_ledger():
+    """Invoices whose stored amount, paid total or status disagrees with the ledger
+
+    Returns rows of (id, invoice_number, status, amount, paid_total,
+    ledger_amount, ledger_paid, ledger_status).
+    """
+    per_invoice = (
+        select(
+            LedgerEntry.invoice_id,
+            func.sum(case((LedgerEntry.source == 'invoice', _net(LedgerEntry.debit, LedgerEntry.credit)), else_=0))
+            .label('amount'),
+            func.sum(case((LedgerEntry.source == 'payment', _net(LedgerEntry.credit, LedgerEntry.debit)), else_=0))
+            .label('paid')
+        )
+        .group_by(LedgerEntry.invoice_id)
+        .subquery()
+    )
+    ledger_amount = func.coalesce(per_invoice.c.amount, literal(0, Invoice.amount.type))
+    ledger_paid = func.coalesce(per_invoice.c.paid, literal(0, Invoice.amount.type))
+    ledger_status = case(
+        (ledger_paid <= 0, 'unpaid'),
+        (ledger_paid < ledger_amount, 'partial'),
+        else_='paid'
+    )
+    
+    return db.session.execute(
+        select(
+            Invoice.id,
+            Invoice.invoice_number,
+            Invoice.status,
+            Invoice.amount,
+            Invoice.paid_total,
+            ledger_amount.label('ledger_amount'),
+            ledger_paid.label('ledger_paid'),
+            ledger_status.label('ledger_status')
+        )
+        .outerjoin(per_invoice, per_invoice.c.invoice_id == Invoice.id)
+        .where(or_(
+            Invoice.amount != ledger_amount,
+            Invoice.paid_total != ledger_paid,
+            Invoice.status != ledger_status
+        ))
+        .order_by(Invoice.id)
+    ).all()
\ No newline at end of file
@@ -0,0 +1,95 @@
+import threading
+import time
+from flask import g, request
+from sqlalchemy import event
+from models import db
+from .query_counter import current_query_count, current_sql_time
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class EndpointMetrics:
+    """Per-endpoint latency histogram and SQL/ORM counters for this process"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+    
+    def observe(self, endpoint, seconds, sql_count, sql_seconds, rows_loaded):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    'buckets': [0] * len(LATENCY_BUCKETS),
+                    'count': 0,
+                    'sum': 0.0,
+                    'sql_count': 0,
+                    'sql_seconds': 0.0,
+                    'rows_loaded': 0
+                }
+            for i, upper in enumerate(LATENCY_BUCKETS):
+                if seconds <= upper:
+                    stats['buckets'][i] += 1
+            stats['count'] += 1
+            stats['sum'] += seconds
+            stats['sql_count'] += sql_count
+            stats['sql_seconds'] += sql_seconds
+            stats['rows_loaded'] += rows_loaded
+    
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(stats, buckets=list(stats['buckets']))
+                    for endpoint, stats in self._endpoints.items()}
+    
+    def render_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        snapshot = sorted(self.snapshot().items())
+        lines = [
+            '# HELP billing_request_duration_seconds Request latency by endpoint.',
+            '# TYPE billing_request_duration_seconds histogram'
+        ]
+        for endpoint, stats in snapshot:
+            for upper, count in zip(LATENCY_BUCKETS, stats['buckets']):
+                lines.append(f'billing_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{upper}"}} {count}')
+            lines.append(f'billing_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {stats["count"]}')
+            lines.append(f'billing_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats["sum"]:.6f}')
+            lines.append(f'billing_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats["count"]}')
+        
+        for name, key, help_text in (
+            ('billing_sql_queries_total', 'sql_count', 'SQL statements executed by endpoint.'),
+            ('billing_sql_duration_seconds_total', 'sql_seconds', 'Time spent in SQL by endpoint.'),
+            ('billing_orm_rows_loaded_total', 'rows_loaded', 'ORM instances loaded by endpoint.')
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for endpoint, stats in snapshot:
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {round(stats[key], 6)}')
+        
+        return '\n'.join(lines) + '\n'
+
+metrics = EndpointMetrics()
+
+@event.listens_for(db.Model, 'load', propagate=True)
+def _count_loaded_row(target, context):
+    g.rows_loaded = g.get('rows_loaded', 0) + 1
+
+def init_metrics(app):
+    """Record latency, SQL and ORM load metrics for every request"""
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.rows_loaded = 0
+    
+    @app.teardown_request
+    def record_request_metrics(exc):
+        started = g.get('request_started')
+        if started is None:
+            return
+        endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        metrics.observe(
+            endpoint,
+            time.perf_counter() - started,
+            current_query_count(),
+            current_sql_time(),
+            g.get('rows_loaded', 0)
+        )
@@ -0,0 +1,57 @@
+from sqlalchemy import false, or_, true
+from models import db, Invoice, SweepState, overdue_cutoff
+from .cache import mark_written
+from .dashboard_stats import OPEN_STATUSES
+
+SWEEP_NAME = 'overdue'
+
+def sweep_overdue(today=None, full=False):
+    """Flag open invoices that fell due since the last sweep, with one set-based UPDATE
+    
+    Writes keep is_overdue current as of their own time, so only the passage of
+    time needs sweeping: invoices with due_date in [last cutoff, today's cutoff).
+    full rescans every open invoice and clears stale flags.
+    """
+    cutoff = overdue_cutoff(today)
+    state = db.session.get(SweepState, SWEEP_NAME)
+    since = None if full or state is None else state.last_cutoff
+    invoices = Invoice.__table__
+    
+    flag = (
+        invoices.update()
+        .where(
+            invoices.c.status.in_(OPEN_STATUSES),
+            invoices.c.is_overdue == false(),
+            invoices.c.due_date < cutoff
+        )
+        .values(is_overdue=True, overdue_since=invoices.c.due_date, version_id=invoices.c.version_id + 1)
+    )
+    if since is not None:
+        flag = flag.where(invoices.c.due_date >= since)
+    flagged = db.session.execute(flag).rowcount
+    
+    cleared = 0
+    if full:
+        cleared = db.session.execute(
+            invoices.update()
+            .where(
+                invoices.c.is_overdue == true(),
+                or_(invoices.c.status.notin_(OPEN_STATUSES), invoices.c.due_date >= cutoff)
+            )
+            .values(is_overdue=False, overdue_since=None, version_id=invoices.c.version_id + 1)
+        ).rowcount
+    
+    if state is None:
+        state = SweepState(name=SWEEP_NAME, last_cutoff=cutoff)
+        db.session.add(state)
+    elif full or cutoff > state.last_cutoff:
+        state.last_cutoff = cutoff
+    
+    mark_written(db.session, Invoice)
+    db.session.commit()
+    return {
+        'since': since.isoformat() if since else None,
+        'cutoff': cutoff.isoformat(),
+        'flagged': flagged,
+        'cleared': cleared
+    }
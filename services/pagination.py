@@ -0,0 +1,89 @@
+import base64
+import json
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, or_
+from .cache import TTLCache
+
+_count_cache = TTLCache(ttl=60)
+
+class KeysetPage:
+    """One page of a query paginated on (created_at, id), newest first"""
+    
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def encode_cursor(direction, item):
+    """Build an opaque cursor pointing before ('prev') or after ('next') item"""
+    payload = [direction, item.created_at.isoformat(), item.id]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Return (direction, created_at, id) from a cursor; raise ValueError if invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, created_at, item_id = json.loads(raw)
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(created_at), int(item_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {token!r}') from e
+
+def keyset_paginate(query, model, cursor=None, per_page=10, with_total=False):
+    """Paginate query on (created_at, id) descending without OFFSET or COUNT(*)"""
+    base_query = query
+    direction = 'next'
+    if cursor:
+        direction, created_at, item_id = decode_cursor(cursor)
+        if direction == 'next':
+            query = query.filter(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < item_id)
+            ))
+        else:
+            query = query.filter(or_(
+                model.created_at > created_at,
+                and_(model.created_at == created_at, model.id > item_id)
+            ))
+    
+    if direction == 'next':
+        ordered = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        ordered = query.order_by(model.created_at.asc(), model.id.asc())
+    
+    # One extra row tells whether another page exists in this direction
+    items = ordered.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    
+    if direction == 'next':
+        has_next, has_prev = has_more, bool(cursor)
+    else:
+        items.reverse()
+        has_next, has_prev = True, has_more
+    
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor('next', items[-1]) if has_next and items else None,
+        prev_cursor=encode_cursor('prev', items[0]) if has_prev and items else None,
+        total=cached_count(base_query) if with_total else None
+    )
+
+def cached_count(query):
+    """Approximate COUNT(*) of query, reused for LISTING_COUNT_CACHE_TTL seconds"""
+    compiled = query.statement.compile()
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    ttl = current_app.config.get('LISTING_COUNT_CACHE_TTL', 60)
+    return _count_cache.get_or_set(key, lambda: query.order_by(None).count(), ttl)
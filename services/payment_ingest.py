@@ -0,0 +1,113 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import insert, select
+from models import (
+    db, Invoice, Payment, PAYMENT_METHODS, apply_payment_deltas, parse_money, post_payment_entries,
+    refresh_invoice_statuses
+)
+from .cache import mark_written
+
+def parse_payment(data, partial=False):
+    """Validate payment fields from a form/JSON mapping; return (values, errors)"""
+    values = {}
+    errors = []
+    
+    if not partial or 'invoice_id' in data:
+        try:
+            values['invoice_id'] = int(data.get('invoice_id'))
+        except (TypeError, ValueError):
+            errors.append('ID tagihan tidak valid.')
+    
+    if not partial or 'amount' in data:
+        try:
+            amount = parse_money(data.get('amount'))
+        except (TypeError, ValueError):
+            errors.append('Nominal tidak valid.')
+        else:
+            if amount <= 0:
+                errors.append('Nominal harus lebih dari 0.')
+            else:
+                values['amount'] = amount
+    
+    if not partial or 'method' in data:
+        method = data.get('method')
+        if method not in PAYMENT_METHODS:
+            errors.append(f'Metode pembayaran harus salah satu dari: {", ".join(PAYMENT_METHODS)}.')
+        else:
+            values['method'] = method
+    
+    if data.get('payment_date'):
+        try:
+            values['payment_date'] = datetime.fromisoformat(str(data['payment_date']))
+        except ValueError:
+            errors.append('Format tanggal tidak valid.')
+    elif not partial:
+        values['payment_date'] = datetime.utcnow()
+    
+    if not partial or 'note' in data:
+        values['note'] = data.get('note') or None
+    
+    return values, errors
+
+def _existing_invoice_ids(invoice_ids, chunk_size=500):
+    invoice_ids = list(invoice_ids)
+    existing = set()
+    for start in range(0, len(invoice_ids), chunk_size):
+        chunk = invoice_ids[start:start + chunk_size]
+        existing.update(db.session.execute(select(Invoice.id).where(Invoice.id.in_(chunk))).scalars())
+    return existing
+
+def ingest_payments(rows, batch_size=1000):
+    """Validate and insert many payments in one transaction; return one result per row"""
+    # Invalid rows are reported and skipped; invoice totals and statuses are
+    # updated once per affected invoice rather than once per payment
+    results = [None] * len(rows)
+    valid = []
+    
+    # Single validation pass; invoice existence is checked with a few IN queries
+    for index, data in enumerate(rows):
+        if not isinstance(data, dict):
+            results[index] = {'row': index, 'status': 'error', 'errors': ['Baris harus berupa objek.']}
+            continue
+        values, errors = parse_payment(data)
+        if errors:
+            results[index] = {'row': index, 'status': 'error', 'errors': errors}
+        else:
+            valid.append((index, values))
+    
+    existing = _existing_invoice_ids({values['invoice_id'] for _, values in valid})
+    # Whole seconds, so the batch can be found again on MySQL DATETIME columns
+    now = datetime.utcnow().replace(microsecond=0)
+    to_insert = []
+    deltas = defaultdict(Decimal)
+    
+    for index, values in valid:
+        if values['invoice_id'] not in existing:
+            results[index] = {'row': index, 'status': 'error', 'errors': ['Tagihan tidak ditemukan.']}
+            continue
+        values['created_at'] = now
+        to_insert.append(values)
+        deltas[values['invoice_id']] += values['amount']
+        results[index] = {'row': index, 'status': 'created', 'invoice_id': values['invoice_id']}
+    
+    if not to_insert:
+        return results
+    
+    try:
+        for start in range(0, len(to_insert), batch_size):
+            db.session.execute(insert(Payment.__table__), to_insert[start:start + batch_size])
+        
+        connection = db.session.connection()
+        apply_payment_deltas(connection, deltas)
+        refresh_invoice_statuses(connection, deltas.keys())
+        # The batch shares created_at; entries already posted are skipped
+        post_payment_entries(connection, Payment.__table__.c.created_at == now)
+        
+        mark_written(db.session, Payment, Invoice)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return results
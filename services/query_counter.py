@@ -0,0 +1,60 @@
+import logging
+import time
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+class QueryBudgetExceeded(RuntimeError):
+    """A route issued more SQL statements than its budget allows"""
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.sql_query_count = g.get('sql_query_count', 0) + 1
+        # On the execution context, not the connection: a statement that
+        # raises never reaches after_cursor_execute, and its context is dropped
+        context._query_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _time_statement(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is not None and has_app_context():
+        g.sql_time = g.get('sql_time', 0.0) + time.perf_counter() - started
+
+def query_budget(limit):
+    """Declare the maximum number of SQL statements a view may issue per request"""
+    def decorator(f):
+        f.query_budget = limit
+        return f
+    return decorator
+
+def current_query_count():
+    return g.get('sql_query_count', 0)
+
+def current_sql_time():
+    """Seconds spent executing SQL in this app context"""
+    return g.get('sql_time', 0.0)
+
+def init_query_counter(app):
+    """Expose per-request SQL counts in X-Query-Count and enforce query budgets"""
+    @app.before_request
+    def reset_query_count():
+        g.sql_query_count = 0
+        g.sql_time = 0.0
+    
+    @app.after_request
+    def check_query_budget(response):
+        count = current_query_count()
+        response.headers['X-Query-Count'] = str(count)
+        
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', current_app.config.get('SQL_QUERY_BUDGET'))
+        if budget is not None and count > budget:
+            message = f'{request.endpoint} issued {count} SQL statements (budget {budget})'
+            if current_app.config.get('SQL_QUERY_BUDGET_RAISE'):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        
+        return response
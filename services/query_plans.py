@@ -0,0 +1,87 @@
+import re
+from datetime import datetime, time, timedelta
+from sqlalchemy import false, func, select, true
+from models import db, Customer, Invoice, Payment
+from .dashboard_stats import OPEN_STATUSES, month_bounds
+
+_SQLITE_FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+# Walks a whole index in its order: fine for ORDER BY ... LIMIT, a full scan when filtering
+_SQLITE_INDEX_SCAN = re.compile(r'^SCAN (TABLE )?\w+ USING (COVERING )?INDEX \w+$')
+
+def hot_queries(today=None):
+    """Return the index-dependent queries issued by the listings and the dashboard"""
+    today = today or datetime.utcnow().date()
+    first_day, next_month = month_bounds(today)
+    start_of_today = datetime.combine(today, time.min)
+    
+    return {
+        'dashboard.monthly_invoices': select(func.count(Invoice.id)).where(
+            Invoice.date >= first_day,
+            Invoice.date < next_month
+        ),
+        'dashboard.monthly_payments': select(func.sum(Payment.amount)).where(
+            Payment.payment_date >= first_day,
+            Payment.payment_date < next_month
+        ),
+        'dashboard.recent_invoices': select(Invoice).order_by(Invoice.created_at.desc()).limit(5),
+        'dashboard.recent_payments': select(Payment).order_by(Payment.created_at.desc()).limit(5),
+        'dashboard.overdue_count': select(func.count(Invoice.id)).where(Invoice.is_overdue == true()),
+        'invoice.list_overdue': select(Invoice).where(
+            Invoice.is_overdue == true()
+        ).order_by(Invoice.created_at.desc()).limit(10),
+        'overdue.sweep': select(Invoice.id).where(
+            Invoice.status.in_(OPEN_STATUSES),
+            Invoice.is_overdue == false(),
+            Invoice.due_date >= start_of_today - timedelta(days=1),
+            Invoice.due_date < start_of_today
+        ),
+        'invoice.list_by_status': select(Invoice).where(
+            Invoice.status == 'unpaid'
+        ).order_by(Invoice.created_at.desc()).limit(10),
+        'invoice.list_by_customer': select(Invoice).where(
+            Invoice.customer_id == 1
+        ).order_by(Invoice.created_at.desc()).limit(10),
+        'invoice.by_customer_api': select(Invoice).where(
+            Invoice.customer_id == 1,
+            Invoice.status != 'paid'
+        ),
+        'invoice.payments': select(Payment).where(Payment.invoice_id == 1),
+        'customer.list': select(Customer).order_by(Customer.created_at.desc()).limit(10)
+    }
+
+def explain(statement):
+    """Return the database's query plan rows for a select statement"""
+    connection = db.session.connection()
+    dialect = connection.dialect
+    compiled = statement.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.construct_params()
+    values = tuple(params[name] for name in compiled.positiontup or ())
+    
+    prefix = 'EXPLAIN QUERY PLAN' if dialect.name == 'sqlite' else 'EXPLAIN'
+    return connection.exec_driver_sql(f'{prefix} {compiled}', values).all()
+
+def is_full_scan(dialect_name, plan_row, filtered=False):
+    """Whether an EXPLAIN row reads a whole table instead of using an index
+    
+    filtered: the query has a WHERE clause, so walking a whole index (the
+    plan SQLite falls back to when the filter's index is gone) counts too.
+    """
+    if dialect_name == 'sqlite':
+        detail = plan_row[-1]
+        return bool(_SQLITE_FULL_SCAN.match(detail) or (filtered and _SQLITE_INDEX_SCAN.match(detail)))
+    if dialect_name == 'mysql':
+        return plan_row._mapping.get('type') == 'ALL'
+    return False
+
+def find_full_scans(today=None):
+    """Return {query name: plan rows} for hot queries that fall back to a full scan"""
+    dialect_name = db.session.connection().dialect.name
+    full_scans = {}
+    
+    for name, statement in hot_queries(today).items():
+        plan = explain(statement)
+        filtered = statement.whereclause is not None
+        if any(is_full_scan(dialect_name, row, filtered) for row in plan):
+            full_scans[name] = plan
+    
+    return full_scans
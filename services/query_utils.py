@@ -0,0 +1,3 @@
+def escape_like(value):
+    """Escape LIKE wildcards in user input, with backslash as the escape character"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
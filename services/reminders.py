@@ -0,0 +1,270 @@
+import abc
+import importlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import islice
+from jinja2 import Environment
+from sqlalchemy import and_, bindparam, or_, select, true
+from models import db, Customer, Invoice, overdue_cutoff
+from .dashboard_stats import OPEN_STATUSES
+from .statements import format_rupiah
+
+logger = logging.getLogger(__name__)
+
+# kind -> (subject, body); rendered with r = one candidate row, days = days overdue / until due
+REMINDER_TEMPLATES = {
+    'due_soon': (
+        'Pengingat: tagihan {{ r.invoice_number }} jatuh tempo {{ r.due_date|tanggal }}',
+        '''Yth. {{ r.name }},
+
+Tagihan {{ r.invoice_number }} sebesar {{ r.remaining|rupiah }} akan jatuh tempo
+{% if days %}dalam {{ days }} hari, pada {% else %}hari ini, {% endif %}{{ r.due_date|tanggal }}.
+Mohon lakukan pembayaran sebelum tanggal tersebut.
+
+Abaikan pesan ini bila pembayaran sudah dilakukan.
+'''
+    ),
+    'overdue': (
+        'Tagihan {{ r.invoice_number }} telah lewat jatuh tempo',
+        '''Yth. {{ r.name }},
+
+Tagihan {{ r.invoice_number }} telah lewat jatuh tempo {{ days }} hari (sejak {{ r.due_date|tanggal }}).
+Sisa yang belum dibayar: {{ r.remaining|rupiah }}.
+Mohon segera lakukan pembayaran.
+
+Abaikan pesan ini bila pembayaran sudah dilakukan.
+'''
+    )
+}
+
+@lru_cache(maxsize=None)
+def _templates():
+    """kind -> (subject, body) compiled on first use, not at import (app startup)"""
+    # Plain text: nothing is escaped
+    environment = Environment(autoescape=False, keep_trailing_newline=True)
+    environment.filters['rupiah'] = format_rupiah
+    environment.filters['tanggal'] = lambda value: value.strftime('%d-%m-%Y')
+    return {
+        kind: (environment.from_string(subject), environment.from_string(body))
+        for kind, (subject, body) in REMINDER_TEMPLATES.items()
+    }
+
+def _remind_conditions(cutoff, days_before, interval_days, now):
+    """Open invoices overdue or due within days_before, not reminded in the last interval_days"""
+    return and_(
+        or_(
+            Invoice.is_overdue == true(),
+            and_(
+                Invoice.status.in_(OPEN_STATUSES),
+                Invoice.due_date >= cutoff,
+                Invoice.due_date < cutoff + timedelta(days=days_before + 1)
+            )
+        ),
+        or_(Invoice.last_reminded_at.is_(None), Invoice.last_reminded_at < now - timedelta(days=interval_days))
+    )
+
+def iter_reminder_candidates(today=None, days_before=3, interval_days=7, now=None, chunk_size=1000):
+    """Invoices due for a reminder with their customer's contact fields, streamed in id order
+    
+    One keyset query per chunk (id > last id seen), so memory stays flat and no
+    read transaction is held open while the caller sends and commits.
+    """
+    now = now or datetime.utcnow()
+    conditions = _remind_conditions(overdue_cutoff(today), days_before, interval_days, now)
+    query = (
+        select(
+            Invoice.id, Invoice.invoice_number, Invoice.due_date, Invoice.remaining, Invoice.is_overdue,
+            Invoice.last_reminded_at, Customer.name, Customer.email, Customer.phone
+        )
+        .join(Customer, Invoice.customer_id == Customer.id)
+        .where(conditions)
+        .order_by(Invoice.id)
+        .limit(chunk_size)
+    )
+    
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(Invoice.id > last_id)).all()
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1].id
+
+def render_reminder(row, today=None):
+    """Message dict (invoice_id, kind, to, name, subject, body) for one candidate row"""
+    cutoff = overdue_cutoff(today)
+    kind = 'overdue' if row.is_overdue else 'due_soon'
+    days = abs((row.due_date.date() - cutoff.date()).days)
+    subject, body = _templates()[kind]
+    return {
+        'invoice_id': row.id,
+        'kind': kind,
+        'to': row.email,
+        'name': row.name,
+        'subject': subject.render(r=row, days=days),
+        'body': body.render(r=row, days=days)
+    }
+
+class ReminderSender(abc.ABC):
+    """Delivers rendered reminders, one batch per call; raise to fail the whole batch
+
+    Subclasses must implement send; one that does not cannot be instantiated.
+    """
+    
+    def __init__(self, config):
+        self.sender_address = config.get('REMINDER_FROM', 'tagihan@example.com')
+    
+    @abc.abstractmethod
+    def send(self, messages):
+        """Deliver a list of {'to', 'subject', 'body', ...} dicts"""
+    
+    def close(self):
+        pass
+
+class OutboxSender(ReminderSender):
+    """Writes each batch as a JSON Lines file into a directory, for local testing"""
+    
+    def __init__(self, config):
+        super().__init__(config)
+        self.directory = config['REMINDER_OUTBOX_DIR']
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def send(self, messages):
+        path = os.path.join(self.directory, f'reminders-{datetime.utcnow():%Y%m%d%H%M%S%f}.jsonl')
+        # Write-then-rename, so a reader of the outbox never sees half a batch
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as output:
+            for message in messages:
+                output.write(json.dumps(dict(message, sender=self.sender_address), ensure_ascii=False) + '\n')
+        os.replace(f'{path}.tmp', path)
+
+SENDERS = {'outbox': OutboxSender}
+
+def get_sender(config):
+    """Sender named by REMINDER_SENDER: a key of SENDERS or 'package.module:Class'"""
+    name = config.get('REMINDER_SENDER', 'outbox')
+    if name in SENDERS:
+        return SENDERS[name](config)
+    module_name, _, class_name = name.partition(':')
+    if not class_name:
+        raise ValueError(f'Unknown reminder sender: {name}')
+    sender_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(sender_class, type) and issubclass(sender_class, ReminderSender)):
+        raise ValueError(f'Reminder sender {name} is not a ReminderSender subclass')
+    # TypeError here when the class leaves send unimplemented
+    return sender_class(config)
+
+class RateLimiter:
+    """Spaces batches so that on average no more than per_second messages go out"""
+    
+    def __init__(self, per_second, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1 / per_second if per_second else 0
+        self.clock = clock
+        self.sleep = sleep
+        self._available_at = 0.0
+    
+    def wait(self, count):
+        if not self.interval:
+            return
+        now = self.clock()
+        if self._available_at > now:
+            self.sleep(self._available_at - now)
+            now = self._available_at
+        self._available_at = now + count * self.interval
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _claim(rows, threshold, claimed_at):
+    """Stamp last_reminded_at on rows nobody reminded since threshold; returns the ids claimed
+    
+    The conditional UPDATE makes a concurrent run (or a resend after a crash
+    between two batches) skip invoices that were already claimed.
+    """
+    invoices = Invoice.__table__
+    ids = [row.id for row in rows]
+    # Bookkeeping only: version_id stays, so edits racing with a reminder do not conflict
+    db.session.execute(
+        invoices.update()
+        .where(
+            invoices.c.id.in_(ids),
+            or_(invoices.c.last_reminded_at.is_(None), invoices.c.last_reminded_at < threshold)
+        )
+        .values(last_reminded_at=claimed_at)
+    )
+    db.session.commit()
+    return set(db.session.execute(
+        select(Invoice.id).where(Invoice.id.in_(ids), Invoice.last_reminded_at == claimed_at)
+    ).scalars())
+
+def _release(rows, claimed_at):
+    """Put back the previous last_reminded_at of claimed rows whose batch was not sent"""
+    invoices = Invoice.__table__
+    db.session.execute(
+        invoices.update()
+        .where(invoices.c.id == bindparam('invoice_id'), invoices.c.last_reminded_at == claimed_at)
+        .values(last_reminded_at=bindparam('previous')),
+        [{'invoice_id': row.id, 'previous': row.last_reminded_at} for row in rows]
+    )
+    db.session.commit()
+
+def send_reminders(sender, today=None, days_before=3, interval_days=7, batch_size=100, rate_limit=0,
+                   limit=None, dry_run=False, progress=None):
+    """Remind customers of overdue and soon-due invoices, one claimed batch at a time
+    
+    Candidates are streamed, so memory is bounded by batch_size whatever the
+    number of invoices. Each batch is claimed (last_reminded_at) and committed
+    before it is handed to the sender; when sending fails the claims are
+    released and the error propagates, so a retry only sends what is left.
+    dry_run renders without claiming or sending.
+    """
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    threshold = now - timedelta(days=interval_days)
+    limiter = RateLimiter(rate_limit)
+    stats = {'candidates': 0, 'sent': 0, 'skipped': 0, 'dry_run': dry_run,
+             'kinds': {kind: 0 for kind in REMINDER_TEMPLATES}}
+    
+    rows = iter_reminder_candidates(today, days_before, interval_days, now=now)
+    if limit:
+        rows = islice(rows, limit)
+    
+    for batch in _batches(rows, batch_size):
+        stats['candidates'] += len(batch)
+        if dry_run:
+            claimed = {row.id for row in batch}
+        else:
+            claimed_at = datetime.utcnow()
+            claimed = _claim(batch, threshold, claimed_at)
+        stats['skipped'] += len(batch) - len(claimed)
+        batch = [row for row in batch if row.id in claimed]
+        messages = [render_reminder(row, today) for row in batch]
+        
+        if messages and not dry_run:
+            limiter.wait(len(messages))
+            try:
+                sender.send(messages)
+            except Exception:
+                logger.exception('Sending %d reminders failed; releasing their claims', len(messages))
+                _release(batch, claimed_at)
+                raise
+        
+        stats['sent'] += len(messages)
+        for message in messages:
+            stats['kinds'][message['kind']] += 1
+        if progress:
+            progress(stats)
+    
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    stats['per_second'] = round(stats['sent'] / stats['seconds'], 1) if stats['seconds'] else None
+    return stats
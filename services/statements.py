@@ -0,0 +1,294 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from jinja2 import Environment, select_autoescape
+from sqlalchemy import func, literal, select, union_all
+from models import db, Customer, Invoice, Payment
+
+STATEMENT_FORMATS = ('html', 'pdf')
+# Part of every cache key: bump when the template or the line layout changes
+STATEMENT_TEMPLATE_VERSION = 1
+
+STATEMENT_TEMPLATE = '''<!DOCTYPE html>
+<html lang="id">
+<head>
+<meta charset="utf-8">
+<title>Rekening Koran {{ s.customer.name }} {{ s.period }}</title>
+<style>
+body { font-family: sans-serif; font-size: 11px; }
+table { width: 100%; border-collapse: collapse; }
+th, td { padding: 3px 6px; border-bottom: 1px solid #ddd; text-align: left; }
+td.num, th.num { text-align: right; }
+</style>
+</head>
+<body>
+<h1>Rekening Koran</h1>
+<p>{{ s.customer.name }}<br>{{ s.customer.email }}{% if s.customer.address %}<br>{{ s.customer.address }}{% endif %}</p>
+<p>Periode {{ s.period }} ({{ s.start|tanggal }} s.d. {{ s.last_day|tanggal }})</p>
+<table>
+<thead>
+<tr><th>Tanggal</th><th>Keterangan</th><th>Referensi</th>
+<th class="num">Tagihan</th><th class="num">Pembayaran</th><th class="num">Saldo</th></tr>
+</thead>
+<tbody>
+<tr><td>{{ s.start|tanggal }}</td><td>Saldo awal</td><td></td><td></td><td></td>
+<td class="num">{{ s.opening_balance|rupiah }}</td></tr>
+{% for line in s.lines %}
+<tr><td>{{ line.date|tanggal }}</td><td>{{ line.description or '' }}</td><td>{{ line.reference }}</td>
+<td class="num">{% if line.debit %}{{ line.debit|rupiah }}{% endif %}</td>
+<td class="num">{% if line.credit %}{{ line.credit|rupiah }}{% endif %}</td>
+<td class="num">{{ line.balance|rupiah }}</td></tr>
+{% endfor %}
+</tbody>
+<tfoot>
+<tr><th colspan="3">Saldo akhir</th><th class="num">{{ s.total_invoiced|rupiah }}</th>
+<th class="num">{{ s.total_paid|rupiah }}</th><th class="num">{{ s.closing_balance|rupiah }}</th></tr>
+</tfoot>
+</table>
+</body>
+</html>
+'''
+
+def format_rupiah(value):
+    """Decimal -> 'Rp 1.234.567,50'"""
+    text = f'{value:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')
+    return f'Rp {text[:-3] if text.endswith(",00") else text}'
+
+@lru_cache(maxsize=None)
+def _template():
+    """Compiled on first use, not at import (app startup)"""
+    # Standalone environment: rendering runs in pool processes without an app context
+    environment = Environment(autoescape=select_autoescape(default=True))
+    environment.filters['rupiah'] = format_rupiah
+    environment.filters['tanggal'] = lambda value: value.strftime('%d-%m-%Y')
+    return environment.from_string(STATEMENT_TEMPLATE)
+
+def period_bounds(period):
+    """'YYYY-MM' -> [start, end) datetimes; raises ValueError when malformed"""
+    start = datetime.strptime(period, '%Y-%m')
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+def _customers_query(customer_ids, start):
+    """Customers with their balance before start: one row each, correlated sums"""
+    invoiced = (
+        select(func.coalesce(func.sum(Invoice.amount), 0))
+        .where(Invoice.customer_id == Customer.id, Invoice.date < start)
+        .scalar_subquery()
+    )
+    paid = (
+        select(func.coalesce(func.sum(Payment.amount), 0))
+        .join(Invoice, Payment.invoice_id == Invoice.id)
+        .where(Invoice.customer_id == Customer.id, Payment.payment_date < start)
+        .scalar_subquery()
+    )
+    return select(
+        Customer.id, Customer.name, Customer.email, Customer.address, Customer.updated_at,
+        invoiced.label('invoiced'), paid.label('paid')
+    ).where(Customer.id.in_(customer_ids))
+
+def _lines_query(customer_ids, start, end):
+    """Invoices and payments of the period in statement order, both kinds in one result"""
+    invoices = select(
+        Invoice.customer_id.label('customer_id'),
+        Invoice.date.label('date'),
+        literal('invoice').label('kind'),
+        Invoice.id.label('id'),
+        Invoice.invoice_number.label('reference'),
+        Invoice.description.label('description'),
+        Invoice.amount.label('amount'),
+        Invoice.updated_at.label('updated_at')
+    ).where(Invoice.customer_id.in_(customer_ids), Invoice.date >= start, Invoice.date < end)
+    payments = select(
+        Invoice.customer_id,
+        Payment.payment_date,
+        literal('payment'),
+        Payment.id,
+        Invoice.invoice_number,
+        Payment.method,
+        Payment.amount,
+        Payment.updated_at
+    ).join(Invoice, Payment.invoice_id == Invoice.id).where(
+        Invoice.customer_id.in_(customer_ids), Payment.payment_date >= start, Payment.payment_date < end
+    )
+    
+    lines = union_all(invoices, payments).subquery()
+    # 'invoice' sorts before 'payment', so a same-day invoice is listed before its payment
+    return select(lines).order_by(lines.c.customer_id, lines.c.date, lines.c.kind, lines.c.id)
+
+def _statement_version(customer, lines):
+    """Digest of everything a rendered statement shows; part of the cache key"""
+    digest = hashlib.sha1(repr((
+        STATEMENT_TEMPLATE_VERSION, customer.name, customer.email, customer.address,
+        customer.updated_at, customer.invoiced, customer.paid
+    )).encode())
+    for line in lines:
+        digest.update(f'{line.kind}:{line.id}:{line.updated_at}:{line.amount};'.encode())
+    return digest.hexdigest()[:16]
+
+def build_statements(customer_ids, period):
+    """Statements for the customers in two queries; customers without any activity are left out
+
+    Returns {customer_id: statement dict}. The running balance is built in a
+    single pass over the period's lines, which arrive ordered per customer.
+    """
+    start, end = period_bounds(period)
+    customers = {row.id: row for row in db.session.execute(_customers_query(customer_ids, start))}
+    lines_by_customer = {customer_id: [] for customer_id in customers}
+    for line in db.session.execute(_lines_query(customer_ids, start, end)):
+        lines_by_customer[line.customer_id].append(line)
+    
+    statements = {}
+    for customer_id, customer in customers.items():
+        lines = lines_by_customer[customer_id]
+        opening = Decimal(customer.invoiced) - Decimal(customer.paid)
+        if not lines and not opening:
+            continue
+        
+        balance, invoiced, paid, entries = opening, Decimal(0), Decimal(0), []
+        for line in lines:
+            if line.kind == 'invoice':
+                balance += line.amount
+                invoiced += line.amount
+            else:
+                balance -= line.amount
+                paid += line.amount
+            entries.append({
+                'date': line.date,
+                'kind': line.kind,
+                'reference': line.reference,
+                'description': line.description if line.kind == 'invoice' else f'Pembayaran ({line.description})',
+                'debit': line.amount if line.kind == 'invoice' else None,
+                'credit': line.amount if line.kind == 'payment' else None,
+                'balance': balance
+            })
+        
+        statements[customer_id] = {
+            'customer': {'id': customer_id, 'name': customer.name, 'email': customer.email,
+                         'address': customer.address},
+            'period': period,
+            'start': start,
+            'last_day': end - timedelta(days=1),
+            'opening_balance': opening,
+            'lines': entries,
+            'total_invoiced': invoiced,
+            'total_paid': paid,
+            'closing_balance': balance,
+            'version': _statement_version(customer, lines)
+        }
+    return statements
+
+def render_statement_html(statement):
+    return _template().render(s=statement)
+
+def render_statement(statement, fmt):
+    """HTML (str) or PDF (bytes); PDF needs the optional weasyprint package"""
+    html = render_statement_html(statement)
+    if fmt == 'html':
+        return html
+    try:
+        from weasyprint import HTML
+    except ImportError:
+        raise RuntimeError('Rekening koran PDF membutuhkan paket weasyprint.')
+    return HTML(string=html).write_pdf()
+
+def pdf_available():
+    try:
+        import weasyprint  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def statement_path(cache_dir, statement, fmt):
+    """Cache file for a statement: keyed by customer, period and data version"""
+    customer_id = statement['customer']['id']
+    return os.path.join(cache_dir, f'statement-{customer_id}-{statement["period"]}-{statement["version"]}.{fmt}')
+
+def write_statement(cache_dir, statement, fmt):
+    """Render into the cache unless this version is there already; returns (path, rendered)"""
+    path = statement_path(cache_dir, statement, fmt)
+    if os.path.exists(path):
+        return path, False
+    
+    document = render_statement(statement, fmt)
+    # Write-then-rename, so readers never see a half-written file
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as output:
+        output.write(document.encode() if isinstance(document, str) else document)
+    os.replace(temp_path, path)
+    
+    # Older versions of the same statement are stale now
+    prefix = f'statement-{statement["customer"]["id"]}-{statement["period"]}-'
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name.endswith(f'.{fmt}') and os.path.join(cache_dir, name) != path:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                pass
+    return path, True
+
+def _statement_customer_ids(period, customer_ids=None):
+    """Customers with an invoice dated before the end of the period"""
+    _, end = period_bounds(period)
+    query = select(Invoice.customer_id).where(Invoice.date < end).group_by(Invoice.customer_id).order_by(Invoice.customer_id)
+    if customer_ids is not None:
+        query = query.where(Invoice.customer_id.in_(customer_ids))
+    return db.session.execute(query).scalars().all()
+
+def generate_statements(period, cache_dir, fmt='pdf', customer_ids=None, workers=None,
+                        batch_size=500, progress=None):
+    """Render statements for every customer with activity, in parallel on a process pool
+
+    The database is read here, one two-query batch at a time. Rendering, the
+    CPU-bound part (especially PDF), runs in worker processes. Statements
+    whose data version is already cached are not rendered again.
+    """
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    
+    if fmt not in STATEMENT_FORMATS:
+        raise ValueError(f'Format harus salah satu dari: {", ".join(STATEMENT_FORMATS)}.')
+    if fmt == 'pdf' and not pdf_available():
+        raise RuntimeError('Rekening koran PDF membutuhkan paket weasyprint.')
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    started = time.perf_counter()
+    ids = _statement_customer_ids(period, customer_ids)
+    stats = {'period': period, 'format': fmt, 'customers': len(ids), 'statements': 0,
+             'rendered': 0, 'cached': 0}
+    workers = workers or os.cpu_count() or 1
+    pending = set()
+    
+    def collect(done):
+        for future in done:
+            _, rendered = future.result()
+            stats['rendered' if rendered else 'cached'] += 1
+        pending.difference_update(done)
+    
+    # spawn rather than fork: this also runs on job worker threads, and the
+    # children only need the template, not the parent's connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        for offset in range(0, len(ids), batch_size):
+            statements = build_statements(ids[offset:offset + batch_size], period)
+            db.session.rollback()  # end the read transaction between batches
+            stats['statements'] += len(statements)
+            
+            for statement in statements.values():
+                if os.path.exists(statement_path(cache_dir, statement, fmt)):
+                    stats['cached'] += 1
+                    continue
+                # Bound the queue so memory stays flat with many customers
+                while len(pending) >= workers * 4:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                pending.add(executor.submit(write_statement, cache_dir, statement, fmt))
+            
+            if progress:
+                progress(min(offset + batch_size, len(ids)), len(ids))
+        
+        collect(wait(pending).done)
+    
+    stats['seconds'] = round(time.perf_counter() - started, 2)
+    return stats
\ No newline at end of file